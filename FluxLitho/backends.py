@@ -0,0 +1,160 @@
+"""
+Lazy-Fassade für die schweren Backends (shapely, trimesh, svgpathtools,
+pcb-tools und die Module, die darauf aufbauen).
+
+lazy(name) liefert einen Stellvertreter, der das Modul erst beim ersten
+Attributzugriff importiert. So startet die GUI ohne die Backends, und ein
+SVG-Import zieht z.B. kein trimesh nach:
+
+    mesh_utils = lazy("mesh_utils")
+    ...
+    mesh_utils.write_negative_stl(...)   # erst hier wird importiert
+
+load_times hält die Importdauer je Backend beim ersten Zugriff.
+
+Import-Report (Kaltstart in einem frischen Interpreter, per -X importtime):
+    python backends.py                       # GUI, batch, benchmark
+    python backends.py svg_utils mesh_utils --top 10
+    python backends.py gui.main_window --json
+"""
+import argparse
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+
+# Importdauer beim ersten Zugriff (Sekunden) je Modulname
+load_times = {}
+
+_modules = {}
+_lock = threading.RLock()
+
+# Einstiegspunkte für den Kaltstart-Report
+DEFAULT_TARGETS = ("gui.main_window", "batch", "benchmark")
+# Diese Pakete sollen beim GUI-Start nicht geladen werden
+HEAVY_PACKAGES = ("shapely", "trimesh", "scipy", "svgpathtools", "networkx", "gerber")
+
+
+class LazyModule:
+    """Modul-Stellvertreter, importiert beim ersten Attributzugriff"""
+
+    __slots__ = ("_name", "_module")
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with _lock:
+                if self._module is None:
+                    t = time.perf_counter()
+                    self._module = importlib.import_module(self._name)
+                    load_times[self._name] = time.perf_counter() - t
+                module = self._module
+        return module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "geladen" if self._module is not None else "nicht geladen"
+        return f"<lazy {self._name} ({state})>"
+
+
+def lazy(name):
+    """Stellvertreter für Modul name (pro Name nur einer)"""
+    with _lock:
+        proxy = _modules.get(name)
+        if proxy is None:
+            proxy = _modules[name] = LazyModule(name)
+        return proxy
+
+
+# --- Import-Report ---
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(target, python=None):
+    """
+    Kaltstart von "import target" in einem frischen Interpreter messen.
+    -> (Gesamtzeit in s, {Modul: (eigene Zeit, kumuliert)} in s)
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    proc = subprocess.run([python or sys.executable, "-X", "importtime", "-c", f"import {target}"],
+                          cwd=here, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {target} fehlgeschlagen:\n{proc.stderr.strip()[-2000:]}")
+    modules = {}
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME.match(line)
+        if m is None:
+            continue
+        own, cumulative, name = int(m.group(1)) / 1e6, int(m.group(2)) / 1e6, m.group(4)
+        modules[name] = (own, cumulative)
+        if m.group(3) == " " and name == target:
+            total = cumulative
+    return total, modules
+
+
+def import_report(target, top=15):
+    """Kaltstart-Report: Gesamtzeit, Kosten je Paket, teuerste Module, geladene Backends"""
+    total, modules = import_profile(target)
+    packages = {}
+    for name, (own, _) in modules.items():
+        pkg = name.split(".")[0]
+        packages[pkg] = packages.get(pkg, 0.0) + own
+    return {
+        "target": target,
+        "total": total,
+        "modules": len(modules),
+        "packages": dict(sorted(packages.items(), key=lambda kv: -kv[1])[:top]),
+        "slowest": {name: {"self": own, "cumulative": cum} for name, (own, cum)
+                    in sorted(modules.items(), key=lambda kv: -kv[1][0])[:top]},
+        "heavy_loaded": [p for p in HEAVY_PACKAGES if p in packages],
+    }
+
+
+def print_report(report, file=sys.stderr):
+    print(f"\nimport {report['target']}: {report['total'] * 1000:.0f} ms, "
+          f"{report['modules']} Module", file=file)
+    heavy = ", ".join(report["heavy_loaded"]) or "keine"
+    print(f"  schwere Backends beim Import: {heavy}", file=file)
+    print("  Pakete (Summe eigene Zeit):", file=file)
+    for pkg, t in report["packages"].items():
+        print(f"    {pkg:<28} {t * 1000:8.1f} ms", file=file)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import-Kosten (Kaltstart) je Modul")
+    ap.add_argument("targets", nargs="*", default=list(DEFAULT_TARGETS),
+                    help="Zu importierende Module (Standard: GUI, batch, benchmark)")
+    ap.add_argument("--top", type=int, default=15, help="Anzahl Pakete/Module im Report")
+    ap.add_argument("--json", action="store_true", help="Report als JSON nach stdout")
+    args = ap.parse_args(argv)
+
+    reports = []
+    for target in args.targets:
+        report = import_report(target, args.top)
+        reports.append(report)
+        if not args.json:
+            print_report(report, sys.stdout)
+    if args.json:
+        print(json.dumps(reports, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
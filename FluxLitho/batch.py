@@ -0,0 +1,319 @@
+"""
+Headless Batch-Konvertierung: Gerber (ZIP/Einzeldatei) und SVG -> STL, 3MF, CTB.
+
+Läuft ohne Qt (PySide6 wird nicht importiert) und verteilt die Jobs auf
+einen ProcessPoolExecutor. Am Ende wird eine JSON-Zusammenfassung mit
+Zeiten und Fehlern pro Job ausgegeben. Bohrdateien (Excellon) im ZIP
+werden aus der Geometrie ausgestanzt, außer mit --no-drills.
+
+CTB-Layer werden mit --supersample N kantengeglättet (N x N Abtastpunkte
+pro Pixel, in Kacheln parallel gerendert) und dann bei --threshold auf
+1 Bit geschnitten oder mit --grayscale als 8-Bit-Graustufen geschrieben.
+
+Mit --trace werden Stufenzeiten, Zählwerte und Cache-Treffer der Pipeline
+aufgezeichnet (siehe trace_utils), als Log nach stderr oder als JSONL-Datei.
+
+Mit --nest werden alle Eingänge (je --copies mal) gemeinsam auf ein Panel
+verteilt und als ein Job "nest" exportiert.
+
+Beispiel:
+    python batch.py boards/*.zip logo.svg -o out -f stl,ctb --exclude "*paste*"
+    python batch.py logo.svg --nest --copies 12 --refine -f ctb
+    python batch.py boards/*.zip -f ctb --trace trace.jsonl
+    python batch.py boards/*.zip -f ctb --supersample 4 --grayscale
+"""
+import argparse
+import contextlib
+import fnmatch
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+FORMATS = ("stl", "3mf", "ctb")
+
+
+def select_layers(names, policy="default", include=(), exclude=()):
+    """
+    Nicht-interaktive Layer-Auswahl wie im DynamicLayerDialog.
+    policy "default" nutzt die Standardauswahl, "all" nimmt alles;
+    include/exclude sind Glob-Muster (ohne Groß-/Kleinschreibung).
+    """
+    from gui.gerber_utils import default_layer_selected
+
+    def matches(name, patterns):
+        return any(fnmatch.fnmatch(name.lower(), p.lower()) for p in patterns)
+
+    selected = []
+    for name in names:
+        on = policy == "all" or default_layer_selected(name) or matches(name, include)
+        if on and not matches(name, exclude):
+            selected.append(name)
+    return selected
+
+
+def _load_gerber(path, job, result):
+    from gui import gerber_cache
+    from gui.gerber_utils import (collect_drill_files, collect_gerber_files,
+                                  load_gerber_files, layer_name)
+
+    before = dict(gerber_cache.stats)
+    files = collect_gerber_files(path)
+    try:
+        if not files:
+            raise ValueError("Keine Gerber gefunden")
+        names = [layer_name(f) for f in files]
+        selected = select_layers(names, job["layers"], job["include"], job["exclude"])
+        if not selected:
+            raise ValueError("Keine Layer ausgewählt")
+        drills = collect_drill_files(path) if job["drills"] else []
+        if drills:
+            result["drills"] = [layer_name(d) for d in drills]
+        geom = load_gerber_files(files, set(selected), use_cache=job["cache"],
+                                 workers=job.get("workers"), drill_files=drills)
+    finally:
+        result["cache"] = {k: v - before[k] for k, v in gerber_cache.stats.items()}
+    return geom, selected
+
+
+def _load_svg(path, job):
+    from shapely import affinity
+    from svg_utils import svg_to_polygon
+
+    geom = svg_to_polygon(path, target_width_mm=job["svg_width"])
+    if geom is None or geom.is_empty:
+        return None, []
+    # Spiegeln + normieren wie BrassEtcherGUI.load_svg
+    geom = affinity.scale(geom, xfact=-1, yfact=-1, origin=(0, 0))
+    minx, miny, _, _ = geom.bounds
+    geom = affinity.translate(geom, xoff=-minx, yoff=-miny)
+    return geom, []
+
+
+def _load_nest(job, result):
+    """Alle Eingänge laden und gemeinsam auf das Panel verteilen"""
+    from nesting import nest
+
+    motifs, layers, cache = [], [], {}
+    for path in job["inputs"]:
+        if path.lower().endswith(".svg"):
+            geom, sel = _load_svg(path, job)
+        else:
+            sub = {}
+            geom, sel = _load_gerber(path, job, sub)
+            for k, v in sub.get("cache", {}).items():
+                cache[k] = cache.get(k, 0) + v
+        if geom is None or geom.is_empty:
+            raise ValueError(f"Keine Geometrie erzeugt: {path}")
+        motifs.extend([geom] * job["copies"])
+        layers.extend(sel)
+    if cache:
+        result["cache"] = cache
+    report = {}
+    geom, placements = nest(motifs, spacing=job["spacing"], refine=job["refine"], report=report)
+    if not placements:
+        raise ValueError("Kein Motiv passt auf das Panel")
+    result["nest"] = dict(report, placements=placements)
+    return geom, layers
+
+
+def run_job(job):
+    """Einen Eingang konvertieren; liefert ein JSON-fähiges Ergebnis-Dict"""
+    result = {"input": job["input"], "ok": False, "outputs": [], "layers": [],
+              "timings": {}, "error": None}
+    t_job = time.perf_counter()
+    # Statusmeldungen der Pipeline nach stderr, stdout bleibt für das JSON
+    from trace_utils import stage
+
+    with contextlib.redirect_stdout(sys.stderr), stage("batch.job", input=Path(job["input"]).name):
+        _run_job(job, result)
+    result["timings"]["total"] = time.perf_counter() - t_job
+    return result
+
+
+def _run_job(job, result):
+    path = job["input"]
+    timings = result["timings"]
+    try:
+        t = time.perf_counter()
+        if job.get("nest"):
+            geom, layers = _load_nest(job, result)
+        elif path.lower().endswith(".svg"):
+            geom, layers = _load_svg(path, job)
+        else:
+            geom, layers = _load_gerber(path, job, result)
+        timings["load"] = time.perf_counter() - t
+        result["layers"] = layers
+        if geom is None or geom.is_empty:
+            raise ValueError("Keine Geometrie erzeugt")
+        from geom_utils import count_vertices
+        result["vertices"] = count_vertices(geom)
+
+        out_dir = Path(job["out_dir"])
+        out_dir.mkdir(parents=True, exist_ok=True)
+        stem = Path(path).stem
+        ox, oy = job["offset_x"], job["offset_y"]
+
+        mesh_formats = [f for f in job["formats"] if f in ("stl", "3mf")]
+        if mesh_formats:
+            import trimesh
+            from mesh_utils import negative_arrays, write_binary_stl
+
+            t = time.perf_counter()
+            vertices, faces = negative_arrays(geom, ox, oy)
+            timings["mesh"] = time.perf_counter() - t
+            for fmt in mesh_formats:
+                out = out_dir / f"{stem}.{fmt}"
+                t = time.perf_counter()
+                if fmt == "stl":
+                    write_binary_stl(str(out), vertices, faces)
+                else:
+                    trimesh.Trimesh(vertices, faces, process=False).export(str(out))
+                timings[fmt] = time.perf_counter() - t
+                result["outputs"].append(str(out))
+
+        if "ctb" in job["formats"]:
+            from export_ctb import write_ctb_from_geometry
+
+            out = out_dir / f"{stem}.ctb"
+            t = time.perf_counter()
+            write_ctb_from_geometry(geom, None, str(out), ox, oy,
+                                    supersample=job["supersample"], grayscale=job["grayscale"],
+                                    threshold=job["threshold"])
+            timings["ctb"] = time.perf_counter() - t
+            result["outputs"].append(str(out))
+
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+
+
+def run_batch(jobs, workers=None):
+    """
+    Alle Jobs im Prozess-Pool ausführen; Ergebnisse in Eingabereihenfolge.
+    Die CPUs werden zwischen den Jobs und dem Layer-Pool je Job aufgeteilt
+    (job["workers"]), damit nicht jeder Job noch einmal alle CPUs belegt.
+    """
+    cpus = os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        # seriell: jeder Job darf alle CPUs für seine Layer nutzen
+        return [run_job(job) for job in jobs]
+    workers = min(workers or cpus, len(jobs))
+    jobs = [dict(job, workers=max(1, cpus // workers)) for job in jobs]
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_job, job): i for i, job in enumerate(jobs)}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            try:
+                results[i] = fut.result()
+            except Exception as e:  # z.B. abgestürzter Worker
+                results[i] = {"input": jobs[i]["input"], "ok": False, "outputs": [],
+                              "layers": [], "timings": {}, "error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="FluxLitho Batch-Konvertierung (ohne GUI)")
+    ap.add_argument("inputs", nargs="+", help="Gerber-ZIPs, Gerber-Dateien oder SVGs")
+    ap.add_argument("-o", "--out-dir", default="out", help="Ausgabeverzeichnis")
+    ap.add_argument("-f", "--formats", default="stl",
+                    help="Kommagetrennt: " + ",".join(FORMATS))
+    ap.add_argument("--layers", choices=("default", "all"), default="default",
+                    help="Layer-Grundauswahl (default = wie im Layer-Dialog)")
+    ap.add_argument("--include", action="append", default=[], metavar="GLOB",
+                    help="Zusätzlich auswählen (mehrfach möglich)")
+    ap.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                    help="Abwählen (mehrfach möglich)")
+    ap.add_argument("--svg-width", type=float, default=40.0, help="Motiv Breite [mm] für SVG")
+    ap.add_argument("--offset-x", type=float, default=0.0, help="Motiv-Position X [mm]")
+    ap.add_argument("--offset-y", type=float, default=0.0, help="Motiv-Position Y [mm]")
+    ap.add_argument("--no-cache", action="store_true", help="Gerber-Layer-Cache nicht nutzen")
+    ap.add_argument("--no-drills", action="store_true",
+                    help="Bohrungen (Excellon im ZIP) nicht ausstanzen")
+    ap.add_argument("--nest", action="store_true",
+                    help="Alle Eingänge gemeinsam auf ein Panel verteilen (ein Job)")
+    ap.add_argument("--copies", type=int, default=1, help="Kopien je Eingang beim Nesting")
+    ap.add_argument("--spacing", type=float, default=None,
+                    help="Abstand beim Nesting [mm] (Standard: NEST_SPACING_MM)")
+    ap.add_argument("--refine", action="store_true",
+                    help="Nesting auf Polygonbasis verdichten (langsamer)")
+    ap.add_argument("--supersample", type=int, default=None, metavar="N",
+                    help="CTB kantengeglättet mit N x N Abtastpunkten pro Pixel "
+                         "(Standard: 1, mit --grayscale RASTER_SUPERSAMPLE)")
+    ap.add_argument("--grayscale", action="store_true",
+                    help="CTB-Layer als 8-Bit-Graustufen (Abdeckung) statt 1 Bit")
+    ap.add_argument("--threshold", type=int, default=None,
+                    help="Schwelle 0-255 für 1-Bit-Layer aus der Abdeckung "
+                         "(Standard: RASTER_THRESHOLD)")
+    ap.add_argument("-j", "--jobs", type=int, default=None, help="Anzahl Prozesse")
+    ap.add_argument("--summary", help="JSON-Zusammenfassung in Datei statt stdout")
+    ap.add_argument("--trace", metavar="ZIEL",
+                    help="Pipeline-Ereignisse aufzeichnen: 'log' (stderr) oder JSONL-Datei")
+    args = ap.parse_args(argv)
+    args.formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in args.formats if f not in FORMATS]
+    if unknown:
+        ap.error(f"Unbekannte Formate: {', '.join(unknown)}")
+    if args.supersample is not None and args.supersample < 1:
+        ap.error("--supersample muss mindestens 1 sein")
+    if args.threshold is not None and not 0 <= args.threshold <= 255:
+        ap.error("--threshold muss zwischen 0 und 255 liegen")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.trace:
+        from trace_utils import configure
+        configure(args.trace)
+    if args.spacing is None:
+        from constants import NEST_SPACING_MM
+        args.spacing = NEST_SPACING_MM
+    if args.threshold is None:
+        from constants import RASTER_THRESHOLD
+        args.threshold = RASTER_THRESHOLD
+    jobs = [{
+        "input": os.path.abspath(p),
+        "out_dir": os.path.abspath(args.out_dir),
+        "formats": args.formats,
+        "layers": args.layers,
+        "include": args.include,
+        "exclude": args.exclude,
+        "svg_width": args.svg_width,
+        "offset_x": args.offset_x,
+        "offset_y": args.offset_y,
+        "cache": not args.no_cache,
+        "drills": not args.no_drills,
+        "supersample": args.supersample,
+        "grayscale": args.grayscale,
+        "threshold": args.threshold,
+    } for p in args.inputs]
+    if args.nest:
+        nest_job = dict(jobs[0], input="nest", nest=True, inputs=[j["input"] for j in jobs],
+                        copies=args.copies, spacing=args.spacing, refine=args.refine,
+                        offset_x=0.0, offset_y=0.0)
+        jobs = [nest_job]
+
+    t = time.perf_counter()
+    results = run_batch(jobs, args.jobs)
+    summary = {
+        "jobs": results,
+        "ok": sum(r["ok"] for r in results),
+        "failed": sum(not r["ok"] for r in results),
+        "wall_time": time.perf_counter() - t,
+    }
+    text = json.dumps(summary, indent=2, ensure_ascii=False)
+    if args.summary:
+        Path(args.summary).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
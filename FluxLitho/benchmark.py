@@ -0,0 +1,375 @@
+"""
+Benchmark der Pipeline-Stufen für die mitgelieferten Boards und für
+synthetische, hochskalierte Boards.
+
+Jede Stufe wird einzeln gemessen (Wandzeit, Speicher-Peak über
+tracemalloc, Vertex-/Dreieckszahlen) und als JSON geschrieben. Gegen eine
+gespeicherte Baseline verglichen, gelten Stufen als Regression, wenn sie
+um mehr als --threshold langsamer werden oder mehr Speicher brauchen;
+geänderte Zählwerte (andere Geometrie) werden gesondert gemeldet.
+
+Stufen: collect, parse (safe_load_layer), convert (gerber_layer_to_shapely),
+union, qpath (shapely_to_qpath, nur mit PySide6), mesh
+(build_and_transform_mesh), stl, 3mf, bitmap (png_to_bitmap), ctb,
+antialias (rasterize_coverage mit RASTER_SUPERSAMPLE).
+
+tracemalloc sieht nur Python-/NumPy-Allokationen, nicht GEOS. Zeiten
+enthalten den tracemalloc-Overhead und sind nur mit Messungen vom selben
+Rechner vergleichbar.
+
+Beispiel:
+    python benchmark.py                          # Boards + synthetisch x1, x2
+    python benchmark.py --synthetic 1,2,4 -o bench.json
+    python benchmark.py --update-baseline        # Baseline neu schreiben
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_BASELINE = HERE / "benchmark_baseline.json"
+DEFAULT_BOARDS = sorted(glob.glob(str(HERE.parent / "Gerber_*.zip")))
+
+# Regression erst ab diesem Zuwachs und nur über dem Messrauschen
+THRESHOLD = 0.25
+MIN_TIME_S = 0.05
+MIN_PEAK_MB = 1.0
+
+# Synthetisches Board: Raster aus Zellen (Pads, Track, Region) pro Skalierung
+SYN_CELLS_X = 12
+SYN_CELLS_Y = 8
+SYN_SIZE_MM = (110.0, 70.0)
+
+
+def _coord(v):
+    """mm -> Gerber-Koordinate im Format 4.6"""
+    return f"{round(v * 1e6):d}"
+
+
+def synthetic_gerber(scale, kind="copper"):
+    """
+    RS-274X-Text für ein synthetisches Board mit (12*scale) x (8*scale)
+    Zellen auf fester Fläche, d.h. scale^2 mal so viele Primitive.
+    copper: runde und eckige Pads, Tracks, Regionen; silk: dünne Linien.
+    """
+    nx, ny = SYN_CELLS_X * scale, SYN_CELLS_Y * scale
+    w, h = SYN_SIZE_MM[0] / nx, SYN_SIZE_MM[1] / ny
+    out = ["%FSLAX46Y46*%", "%MOMM*%", "%LPD*%",
+           f"%ADD10C,{0.5 * w:.4f}*%",
+           f"%ADD11R,{0.3 * w:.4f}X{0.25 * h:.4f}*%",
+           f"%ADD12C,{0.08 * w:.4f}*%",
+           "%ADD13C,0.1200*%",
+           "G01*"]
+    for j in range(ny):
+        for i in range(nx):
+            x0, y0 = i * w, j * h
+            if kind == "silk":
+                out += ["D13*",
+                        f"X{_coord(x0 + 0.1 * w)}Y{_coord(y0 + 0.9 * h)}D02*",
+                        f"X{_coord(x0 + 0.9 * w)}Y{_coord(y0 + 0.9 * h)}D01*"]
+                continue
+            cx, cy = x0 + 0.3 * w, y0 + 0.35 * h
+            rx, ry = x0 + 0.75 * w, y0 + 0.35 * h
+            out += ["D10*", f"X{_coord(cx)}Y{_coord(cy)}D03*",
+                    "D11*", f"X{_coord(rx)}Y{_coord(ry)}D03*",
+                    "D12*", f"X{_coord(cx)}Y{_coord(cy)}D02*",
+                    f"X{_coord(rx)}Y{_coord(cy)}D01*",
+                    f"X{_coord(rx)}Y{_coord(y0 + 0.8 * h)}D01*"]
+            if (i + j) % 3 == 0:
+                out += ["G36*",
+                        f"X{_coord(x0 + 0.05 * w)}Y{_coord(y0 + 0.7 * h)}D02*",
+                        f"X{_coord(x0 + 0.35 * w)}Y{_coord(y0 + 0.7 * h)}D01*",
+                        f"X{_coord(x0 + 0.35 * w)}Y{_coord(y0 + 0.95 * h)}D01*",
+                        f"X{_coord(x0 + 0.05 * w)}Y{_coord(y0 + 0.95 * h)}D01*",
+                        f"X{_coord(x0 + 0.05 * w)}Y{_coord(y0 + 0.7 * h)}D01*",
+                        "G37*"]
+    out.append("M02*")
+    return "\n".join(out) + "\n"
+
+
+def synthetic_board(scale, out_dir):
+    """Schreibt ein synthetisches Gerber-ZIP (Kupfer + Silk oben) und liefert den Pfad"""
+    path = os.path.join(out_dir, f"synthetic-x{scale}.zip")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("synthetic_top_copper.gtl", synthetic_gerber(scale, "copper"))
+        zf.writestr("synthetic_top_silk.gto", synthetic_gerber(scale, "silk"))
+    return path
+
+
+# Ausgabe-Stufen, die per --skip entfallen dürfen (die übrigen bauen aufeinander auf)
+OPTIONAL_STAGES = ("qpath", "stl", "3mf", "bitmap", "ctb", "antialias")
+
+
+class StageTimer:
+    """Misst eine Stufe: Zeit, Speicher-Peak und frei eintragbare Zählwerte"""
+
+    def __init__(self, stages, skip=()):
+        self.stages = stages
+        self.skip = set(skip)
+
+    @contextlib.contextmanager
+    def __call__(self, name):
+        rec = {}
+        if name in self.skip:
+            yield None
+            return
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        t = time.perf_counter()
+        yield rec
+        rec["time"] = time.perf_counter() - t
+        rec["peak_mb"] = (tracemalloc.get_traced_memory()[1] - base) / 2**20
+        self.stages[name] = rec
+
+
+def _primitive_count(layer):
+    """GerberLayer zählt selbst, pcb-tools-Layer (Fallback) über primitives"""
+    try:
+        return len(layer)
+    except TypeError:
+        return len(getattr(layer, "primitives", []))
+
+
+def _qpath_builder():
+    """shapely_to_qpath oder None ohne PySide6 (Import nicht in der Messung)"""
+    try:
+        import PySide6.QtGui  # noqa: F401
+        from svg_utils import shapely_to_qpath
+    except ImportError:
+        return None
+    return shapely_to_qpath
+
+
+def bench_board(path, out_dir, skip=(), layers="default"):
+    """Alle Stufen für ein Gerber-ZIP nacheinander messen -> {stage: record}"""
+    from shapely import affinity
+
+    from batch import select_layers
+    from export_ctb import png_to_bitmap, write_ctb
+    from geom_utils import count_vertices, tiled_union
+    from gui.gerber_utils import (collect_gerber_files, gerber_layer_to_shapely,
+                                  layer_name, safe_load_layer)
+    from mesh_utils import build_and_transform_mesh, write_binary_stl
+    from raster_utils import rasterize_coverage, rasterize_geometry
+
+    stages = {}
+    stage = StageTimer(stages, skip)
+    stem = Path(path).stem
+
+    with stage("collect") as rec:
+        files = collect_gerber_files(path)
+        selected = set(select_layers([layer_name(f) for f in files], layers))
+        files = [f for f in files if layer_name(f) in selected]
+        rec["layers"] = len(files)
+    if not files:
+        raise ValueError(f"Keine Layer ausgewählt: {path}")
+
+    with stage("parse") as rec:
+        parsed = [safe_load_layer(f) for f in files]
+        rec["primitives"] = sum(_primitive_count(l) for l in parsed)
+
+    with stage("convert") as rec:
+        geoms = [g for g in (gerber_layer_to_shapely(l) for l in parsed) if g is not None]
+        rec["vertices"] = sum(count_vertices(g) for g in geoms)
+    del parsed
+
+    with stage("union") as rec:
+        # wie load_gerber_files: vereinigen, normieren, spiegeln
+        geom = tiled_union(geoms)
+        minx, miny, _, _ = geom.bounds
+        geom = affinity.translate(geom, xoff=-minx, yoff=-miny)
+        geom = affinity.scale(geom, xfact=-1, yfact=-1, origin=(0, 0))
+        minx, miny, _, _ = geom.bounds
+        geom = affinity.translate(geom, xoff=-minx, yoff=-miny)
+        rec["vertices"] = count_vertices(geom)
+    del geoms
+
+    to_qpath = _qpath_builder()
+    if to_qpath is not None:
+        with stage("qpath") as rec:
+            if rec is not None:
+                rec["elements"] = to_qpath(geom).elementCount()
+
+    with stage("mesh") as rec:
+        mesh = build_and_transform_mesh(geom, 0.0, 0.0)
+        rec["vertices"] = len(mesh.vertices)
+        rec["triangles"] = len(mesh.faces)
+
+    with stage("stl") as rec:
+        if rec is not None:
+            out = os.path.join(out_dir, f"{stem}.stl")
+            write_binary_stl(out, mesh.vertices, mesh.faces)
+            rec["bytes"] = os.path.getsize(out)
+
+    with stage("3mf") as rec:
+        if rec is not None:
+            out = os.path.join(out_dir, f"{stem}.3mf")
+            mesh.export(out)
+            rec["bytes"] = os.path.getsize(out)
+    del mesh
+
+    mask = rasterize_geometry(geom)
+    with stage("bitmap") as rec:
+        if rec is not None:
+            rec["bytes"] = len(png_to_bitmap(mask))
+
+    with stage("ctb") as rec:
+        if rec is not None:
+            out = os.path.join(out_dir, f"{stem}.ctb")
+            write_ctb(mask, mask, out)
+            rec["bytes"] = os.path.getsize(out)
+
+    with stage("antialias") as rec:
+        if rec is not None:
+            rec["coverage"] = int(rasterize_coverage(geom).sum())
+
+    return stages
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Vergleicht results mit baseline (gleiches Format wie run_benchmarks).
+    Liefert {"regressions": [...], "improvements": [...], "changed": [...], "missing": [...]}.
+    """
+    report = {"regressions": [], "improvements": [], "changed": [], "missing": []}
+    base_cases = baseline.get("cases", {})
+    for case, cur in results["cases"].items():
+        if case not in base_cases:
+            report["missing"].append(case)
+            continue
+        for name, rec in cur.get("stages", {}).items():
+            old = base_cases[case].get("stages", {}).get(name)
+            if old is None:
+                report["missing"].append(f"{case}/{name}")
+                continue
+            for key, floor in (("time", MIN_TIME_S), ("peak_mb", MIN_PEAK_MB)):
+                a, b = old.get(key), rec.get(key)
+                if a is None or b is None or max(a, b) < floor:
+                    continue
+                ratio = b / a if a > 0 else float("inf")
+                entry = {"case": case, "stage": name, "metric": key,
+                         "baseline": a, "current": b, "ratio": ratio}
+                if ratio > 1 + threshold:
+                    report["regressions"].append(entry)
+                elif ratio < 1 / (1 + threshold):
+                    report["improvements"].append(entry)
+            for key in rec.keys() - {"time", "peak_mb"}:
+                if key in old and old[key] != rec[key]:
+                    report["changed"].append({"case": case, "stage": name, "metric": key,
+                                              "baseline": old[key], "current": rec[key]})
+    return report
+
+
+def print_table(results, report, file=sys.stderr):
+    slow = {(r["case"], r["stage"]) for r in report["regressions"]}
+    for case, cur in results["cases"].items():
+        print(f"\n{case}", file=file)
+        if cur.get("error"):
+            print(f"  ❌ {cur['error']}", file=file)
+        for name, rec in cur.get("stages", {}).items():
+            counts = ", ".join(f"{k}={v}" for k, v in rec.items() if k not in ("time", "peak_mb"))
+            flag = "  ⚠ Regression" if (case, name) in slow else ""
+            print(f"  {name:<8} {rec['time'] * 1000:9.1f} ms {rec['peak_mb']:8.1f} MB  {counts}{flag}",
+                  file=file)
+
+
+def run_benchmarks(boards, scales, skip=(), layers="default"):
+    """Alle Fälle messen; Fehler in einem Fall brechen die anderen nicht ab"""
+    import numpy
+    import shapely
+    import trimesh  # noqa: F401  mesh_utils lädt es sonst erst in der Messung (backends.lazy)
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "numpy": numpy.__version__,
+            "shapely": shapely.__version__,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "cases": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="fluxlitho_bench_") as tmp:
+        cases = [(Path(b).stem, b) for b in boards]
+        cases += [(f"synthetic-x{s}", synthetic_board(s, tmp)) for s in scales]
+        tracemalloc.start()
+        try:
+            for name, path in cases:
+                case = {"input": None if path.startswith(tmp) else Path(path).name, "stages": {}}
+                print(f"⏱ {name}", file=sys.stderr)
+                t = time.perf_counter()
+                try:
+                    with contextlib.redirect_stdout(sys.stderr):
+                        case["stages"] = bench_board(path, tmp, skip, layers)
+                except Exception as e:
+                    case["error"] = f"{type(e).__name__}: {e}"
+                case["total"] = time.perf_counter() - t
+                results["cases"][name] = case
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="FluxLitho Benchmark der Pipeline-Stufen")
+    ap.add_argument("boards", nargs="*", default=DEFAULT_BOARDS,
+                    help="Gerber-ZIPs (Standard: mitgelieferte Boards)")
+    ap.add_argument("--synthetic", default="1,2",
+                    help="Skalierungen synthetischer Boards, kommagetrennt (leer = keine)")
+    ap.add_argument("--layers", choices=("default", "all"), default="default",
+                    help="Layer-Grundauswahl wie in batch.py")
+    ap.add_argument("--skip", action="append", default=[], choices=OPTIONAL_STAGES,
+                    help="Ausgabe-Stufe auslassen (mehrfach möglich)")
+    ap.add_argument("-o", "--output", help="Ergebnis-JSON in Datei statt stdout")
+    ap.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline-JSON")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD,
+                    help="Erlaubter Zuwachs je Stufe (0.25 = +25 %%)")
+    ap.add_argument("--update-baseline", action="store_true",
+                    help="Ergebnis als neue Baseline speichern")
+    args = ap.parse_args(argv)
+    args.synthetic = [int(s) for s in args.synthetic.split(",") if s.strip()]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run_benchmarks(args.boards, args.synthetic, args.skip, args.layers)
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n",
+                                 encoding="utf-8")
+        print(f"✅ Baseline geschrieben: {baseline_path}", file=sys.stderr)
+        report = {"regressions": [], "improvements": [], "changed": [], "missing": []}
+    elif baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        report = compare(results, baseline, args.threshold)
+    else:
+        print(f"⚠ Keine Baseline unter {baseline_path}", file=sys.stderr)
+        report = None
+    if report is not None:
+        results["comparison"] = report
+        print_table(results, report)
+
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+    failed = any(c.get("error") for c in results["cases"].values())
+    return 1 if failed or (report and report["regressions"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,27 @@
 PANEL_MM_W = 129.0
 PANEL_MM_H = 80.0
 
+# Druckerparameter (Elegoo Mars 2)
+PANEL_PX_W = 2560
+PANEL_PX_H = 1620
+PX_SIZE_MM = 0.05
+LAYER_HEIGHT_MM = 0.05
+EXPOSURE_TIME = 2.0
+
 # Export-Parameter
 MOTIF_THICKNESS_MM = 0.5
 FRAME_HEIGHT_MM = 0.2
-SVG_SAMPLE_SPACING = 0.6
\ No newline at end of file
+
+# Kantenglättung: Überabtastung je Achse, Kachelgröße (Belichtungspixel)
+# und Schwelle (0-255) für 1-Bit-Layer aus der Abdeckung
+RASTER_SUPERSAMPLE = 4
+RASTER_TILE_PX = 256
+RASTER_THRESHOLD = 128
+
+# Kurven-Diskretisierung: max. Sehnenabweichung (halbes Druckerpixel)
+CHORD_TOLERANCE_MM = PX_SIZE_MM * 0.5
+# Vorschau: max. Abweichung der vereinfachten Anzeige-Geometrie (Bildschirmpixel)
+PREVIEW_TOLERANCE_PX = 0.5
+
+# Nesting: Mindestabstand zwischen Motiven und zum Panelrand
+NEST_SPACING_MM = 2.0
@@ -1,45 +1,160 @@
+import os
 import struct
 import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from PIL import Image
 
-# Druckerparameter (Elegoo Mars 2)
-PANEL_PX_W = 2560
-PANEL_PX_H = 1620
-PX_SIZE_MM = 0.05
-LAYER_HEIGHT_MM = 0.05
-EXPOSURE_TIME = 2.0
-
-
-def png_to_bitmap(png_path):
-    """Lädt PNG und wandelt in 1-Bit Bitmap (schwarz/weiß) um"""
-    img = Image.open(png_path).convert("1")  # 1-bit
-    if img.size != (PANEL_PX_W, PANEL_PX_H):
-        raise ValueError(f"PNG hat falsche Größe {img.size}, erwartet {(PANEL_PX_W, PANEL_PX_H)}")
-    # Pixel in Bytes packen (8 Pixel pro Byte)
-    data = bytearray()
-    pixels = img.load()
-    for y in range(PANEL_PX_H):
-        byte = 0
-        bit_count = 0
-        for x in range(PANEL_PX_W):
-            if pixels[x, y] == 0:  # schwarz = belichtet
-                byte |= (1 << (7 - bit_count))
-            bit_count += 1
-            if bit_count == 8:
-                data.append(byte)
-                byte = 0
-                bit_count = 0
-        if bit_count > 0:
-            data.append(byte)
-    return bytes(data)
-
-
-def write_ctb(front_png, back_png, out_path="test.ctb"):
-    # --- Layers vorbereiten ---
-    layer_bitmaps = [png_to_bitmap(front_png), png_to_bitmap(back_png)]
-    compressed = [zlib.compress(bm) for bm in layer_bitmaps]
-
-    # --- Header bauen ---
+from constants import (PANEL_PX_W, PANEL_PX_H, PX_SIZE_MM, LAYER_HEIGHT_MM, EXPOSURE_TIME,
+                       RASTER_SUPERSAMPLE, RASTER_THRESHOLD)
+from trace_utils import stage
+
+
+def _exposure_mask(source):
+    """Liefert ein bool-Array (H, W), True = belichtet (schwarz).
+
+    source: Pfad, PIL-Image oder ndarray. Ein bool-Array wird direkt als
+    Maske übernommen, alles andere läuft wie bisher über convert("1").
+    """
+    if isinstance(source, np.ndarray) and source.dtype == np.bool_:
+        mask = source
+    else:
+        if isinstance(source, np.ndarray):
+            img = Image.fromarray(source)
+        elif isinstance(source, Image.Image):
+            img = source
+        else:
+            img = Image.open(source)
+        img = img.convert("1")  # 1-bit
+        # Modus "1" als Array: True = weiß
+        mask = ~np.asarray(img, dtype=np.bool_)
+    if mask.shape != (PANEL_PX_H, PANEL_PX_W):
+        size = (mask.shape[1], mask.shape[0]) if mask.ndim == 2 else mask.shape
+        raise ValueError(f"PNG hat falsche Größe {size}, erwartet {(PANEL_PX_W, PANEL_PX_H)}")
+    return mask
+
+
+def pack_mask(mask):
+    """Packt eine bool-Maske zeilenweise in Bytes (8 Pixel pro Byte, MSB zuerst)"""
+    return np.packbits(mask, axis=1).tobytes()
+
+
+def png_to_bitmap(source):
+    """Lädt PNG (oder Image/ndarray) und wandelt in 1-Bit Bitmap (schwarz/weiß) um"""
+    return pack_mask(_exposure_mask(source))
+
+
+def png_to_graymap(source):
+    """
+    Lädt PNG (oder Image/ndarray) als 8-Bit-Layer: ein Byte pro Pixel,
+    255 = voll belichtet (schwarz im Bild). Für Abdeckungen aus
+    raster_utils.rasterize_coverage (schon 255 = belichtet) direkt
+    coverage.tobytes() verwenden.
+    """
+    if isinstance(source, np.ndarray):
+        img = Image.fromarray(source)
+    elif isinstance(source, Image.Image):
+        img = source
+    else:
+        img = Image.open(source)
+    gray = 255 - np.asarray(img.convert("L"), dtype=np.uint8)
+    if gray.shape != (PANEL_PX_H, PANEL_PX_W):
+        raise ValueError(f"PNG hat falsche Größe {gray.shape[::-1]}, erwartet {(PANEL_PX_W, PANEL_PX_H)}")
+    return gray.tobytes()
+
+
+# Layer-Kodierung (Header-Feld nach dem LayerTable-Offset, 0 = zlib wie bisher)
+ENCODING_ZLIB = 0
+ENCODING_RLE = 1
+ENCODINGS = {"zlib": ENCODING_ZLIB, "rle": ENCODING_RLE}
+# Bits pro Pixel (Header-Feld nach der Kodierung, 0 in alten Dateien = 1 Bit)
+LAYER_BITS = (1, 8)
+
+
+def rle_encode(bitmap):
+    """
+    Lauflängenkodierung einer gepackten 1-Bit Bitmap.
+
+    Jeder Lauf gleicher Pixel wird als Varint geschrieben: erstes Byte
+    Bit 7 = weiteres Byte folgt, Bit 6 = Farbe, Bit 0-5 = untere 6 Bit der
+    Länge; Folgebytes Bit 7 = weiteres Byte folgt, Bit 0-6 = nächste 7 Bit.
+    Laufgrenzen werden per diff/nonzero gefunden, ohne Pixel-Schleife.
+    """
+    pixels = np.unpackbits(np.frombuffer(bitmap, dtype=np.uint8))
+    if pixels.size == 0:
+        return b""
+    starts = np.concatenate(([0], np.flatnonzero(pixels[1:] != pixels[:-1]) + 1))
+    lengths = np.diff(np.append(starts, pixels.size)).astype(np.uint64)
+    colors = pixels[starts].astype(np.uint8)
+
+    # Bytes pro Lauf: 1 + Anzahl 7-Bit-Gruppen für (Länge >> 6)
+    rest = lengths >> np.uint64(6)
+    nbytes = np.ones(len(lengths), dtype=np.int64)
+    for k in range(0, 64, 7):
+        nbytes += rest >= (np.uint64(1) << np.uint64(k))
+
+    run = np.repeat(np.arange(len(lengths)), nbytes)
+    pos = np.arange(run.size) - np.repeat(np.cumsum(nbytes) - nbytes, nbytes)
+    shift = np.where(pos == 0, 0, 6 + 7 * (pos - 1)).astype(np.uint64)
+    val = lengths[run] >> shift
+    out = np.where(pos == 0,
+                   (val & np.uint64(0x3F)) | (colors[run].astype(np.uint64) << np.uint64(6)),
+                   val & np.uint64(0x7F))
+    out |= np.where(pos < nbytes[run] - 1, 0x80, 0).astype(np.uint64)
+    return out.astype(np.uint8).tobytes()
+
+
+def rle_decode(data, raw_size):
+    """Gegenstück zu rle_encode -> gepackte Bitmap mit raw_size Bytes"""
+    b = np.frombuffer(data, dtype=np.uint8)
+    if b.size == 0:
+        pixels = np.zeros(0, dtype=np.uint8)
+    else:
+        starts = np.concatenate(([True], (b[:-1] & 0x80) == 0))
+        start_idx = np.flatnonzero(starts)
+        run = np.cumsum(starts) - 1
+        pos = np.arange(b.size) - start_idx[run]
+        payload = np.where(pos == 0, b & 0x3F, b & 0x7F).astype(np.int64)
+        shift = np.where(pos == 0, 0, 6 + 7 * (pos - 1))
+        lengths = np.add.reduceat(payload << shift, start_idx)
+        colors = (b[start_idx] >> 6) & 1
+        pixels = np.repeat(colors, lengths)
+    if pixels.size != raw_size * 8:
+        raise ValueError(f"RLE-Daten ergeben {pixels.size} Pixel, erwartet {raw_size * 8}")
+    return np.packbits(pixels).tobytes()
+
+
+def decode_layer(data, raw_size, encoding=ENCODING_ZLIB):
+    """Layer-Daten wieder in eine gepackte Bitmap wandeln"""
+    if encoding == ENCODING_ZLIB:
+        return zlib.decompress(data)
+    if encoding == ENCODING_RLE:
+        return rle_decode(data, raw_size)
+    raise ValueError(f"Unbekannte Layer-Kodierung {encoding}")
+
+
+def read_ctb_layers(path):
+    """
+    Liest eine mit write_ctb_layers geschriebene CTB -> Liste (Bitmap, Belichtung).
+    Bei 8-Bit-Dateien (Header-Feld bei 0x2C) ist "Bitmap" ein Byte pro Pixel.
+    """
+    with open(path, "rb") as f:
+        hdr = f.read(0x200)
+        if hdr[:4] != b"CTB\x00":
+            raise ValueError(f"Keine CTB-Datei: {path}")
+        layer_count, table_offset, encoding = struct.unpack_from("<III", hdr, 32)
+        f.seek(table_offset)
+        table = f.read(layer_count * 16)
+        layers = []
+        for i in range(layer_count):
+            offset, comp_size, raw_size, exposure = struct.unpack_from("<IIIf", table, i * 16)
+            f.seek(offset)
+            layers.append((decode_layer(f.read(comp_size), raw_size, encoding), exposure))
+    return layers
+
+
+def _build_header(layer_count, exposure_time, encoding=ENCODING_ZLIB, bits=1):
     header = b"CTB\x00"              # Magic
     version = struct.pack("<I", 4)   # Version
     header_size = struct.pack("<I", 0x200)  # Header size
@@ -47,8 +162,8 @@ def write_ctb(front_png, back_png, out_path="test.ctb"):
     res_y = struct.pack("<I", PANEL_PX_H)
     px_size = struct.pack("<f", PX_SIZE_MM)
     layer_height = struct.pack("<f", LAYER_HEIGHT_MM)
-    exp_time = struct.pack("<f", EXPOSURE_TIME)
-    layer_count = struct.pack("<I", len(layer_bitmaps))
+    exp_time = struct.pack("<f", exposure_time)
+    count = struct.pack("<I", layer_count)
 
     # Platzhalter für LayerTable-Offset
     offset_layer_table = struct.pack("<I", 0x200)
@@ -56,42 +171,147 @@ def write_ctb(front_png, back_png, out_path="test.ctb"):
     hdr = (
         header + version + header_size +
         res_x + res_y + px_size + layer_height +
-        exp_time + layer_count + offset_layer_table
+        exp_time + count + offset_layer_table +
+        struct.pack("<I", encoding) + struct.pack("<I", bits)
     )
-    hdr = hdr.ljust(0x200, b"\x00")  # auffüllen auf 512 Byte
-
-    # --- LayerTable + Layerdaten ---
-    layer_entries = []
-    layer_data = b""
-    current_offset = len(hdr) + (len(layer_bitmaps) * 16)
-
-    for bm, comp in zip(layer_bitmaps, compressed):
-        entry = struct.pack("<IIIf", current_offset, len(comp), len(bm), EXPOSURE_TIME)
-        layer_entries.append(entry)
-        layer_data += comp
-        current_offset += len(comp)
-
-    layer_table = b"".join(layer_entries)
-
-    # --- Dummy Vorschau ---
-    # Einfach ein kleines 128x128 Graubild
-    preview = Image.new("L", (128, 128), 180)
-    preview_bytes = preview.tobytes()
-    preview_offset = current_offset
-    preview_size = len(preview_bytes)
-
-    # Vorschau Header
-    preview_header = struct.pack("<II", preview_offset, preview_size)
-
-    # --- Datei schreiben ---
-    with open(out_path, "wb") as f:
-        f.write(hdr)
-        f.write(layer_table)
-        f.write(layer_data)
-        f.write(preview_header)
-        f.write(preview_bytes)
-
-    print(f"✅ CTB geschrieben: {out_path} ({len(layer_bitmaps)} Layer + Vorschau)")
+    return hdr.ljust(0x200, b"\x00")  # auffüllen auf 512 Byte
+
+
+def _encode_layer(source, encoding=ENCODING_ZLIB, bits=1):
+    """Bitmap packen (falls nötig) und komprimieren -> (Rohgröße, Daten)"""
+    with stage("ctb.encode") as s:
+        if isinstance(source, (bytes, bytearray)):
+            bm = source
+        else:
+            bm = png_to_graymap(source) if bits == 8 else png_to_bitmap(source)
+        data = rle_encode(bm) if encoding == ENCODING_RLE else zlib.compress(bm)
+        if s:
+            s.update(raw=len(bm), bytes=len(data))
+        return len(bm), data
+
+
+def write_ctb_layers(layers, out_path="test.ctb", layer_count=None,
+                     exposure_time=EXPOSURE_TIME, workers=None, encoding="zlib", bits=1):
+    """
+    Schreibt beliebig viele Layer als Stream in eine CTB.
+
+    layers: Iterator über PNG-Pfade, Images, ndarrays oder fertige Bitmaps.
+    Die LayerTable wird vorab reserviert und am Ende gepatcht; komprimiert
+    wird in einem Thread-Pool (zlib gibt die GIL frei), geschrieben in
+    Layer-Reihenfolge, sobald ein Layer fertig ist. Es sind nie mehr als
+    ~2 * workers Layer gleichzeitig im Speicher.
+    exposure_time: ein Wert für alle Layer oder eine Sequenz pro Layer.
+    encoding: "zlib" (Standard) oder "rle" für die ganze Datei.
+    bits: 1 (gepackte Bitmap) oder 8 (Graustufen, ein Byte pro Pixel,
+    siehe png_to_graymap); 8-Bit-Layer nur mit zlib.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unbekannte Layer-Kodierung {encoding!r}")
+    if bits not in LAYER_BITS:
+        raise ValueError(f"Nicht unterstützte Bittiefe {bits}")
+    if bits == 8 and encoding != "zlib":
+        raise ValueError("RLE gibt es nur für 1-Bit-Layer")
+    encoding = ENCODINGS[encoding]
+    if layer_count is None:
+        try:
+            layer_count = len(layers)
+        except TypeError:
+            raise ValueError("layer_count muss bei Iteratoren angegeben werden") from None
+    if isinstance(exposure_time, (int, float)):
+        exposures = [float(exposure_time)] * layer_count
+    else:
+        exposures = [float(t) for t in exposure_time]
+        if len(exposures) != layer_count:
+            raise ValueError(f"{len(exposures)} Belichtungszeiten für {layer_count} Layer")
+    workers = workers or min(4, os.cpu_count() or 1)
+
+    table_offset = 0x200
+    entries = []
+    # erst unter Zielnamen ablegen, wenn alles geschrieben ist: bei einem Fehler
+    # bleibt keine abgeschnittene CTB liegen, die der Drucker noch annehmen würde
+    tmp = f"{out_path}.tmp"
+    try:
+        with stage("ctb.write", layers=layer_count, encoding=encoding, bits=bits, workers=workers) as s, \
+                open(tmp, "wb") as f, ThreadPoolExecutor(max_workers=workers) as pool:
+            f.write(_build_header(layer_count, exposures[0] if exposures else EXPOSURE_TIME,
+                                  encoding, bits))
+            f.write(b"\x00" * (layer_count * 16))  # LayerTable reservieren
+            current_offset = table_offset + layer_count * 16
+
+            def flush(fut):
+                nonlocal current_offset
+                raw_size, comp = fut.result()
+                i = len(entries)
+                entries.append(struct.pack("<IIIf", current_offset, len(comp), raw_size, exposures[i]))
+                f.write(comp)
+                current_offset += len(comp)
+
+            pending = deque()
+            for source in layers:
+                if len(entries) + len(pending) >= layer_count:
+                    raise ValueError(f"Mehr Layer als angegeben ({layer_count})")
+                pending.append(pool.submit(_encode_layer, source, encoding, bits))
+                while len(pending) >= 2 * workers:
+                    flush(pending.popleft())
+            while pending:
+                flush(pending.popleft())
+            if len(entries) != layer_count:
+                raise ValueError(f"{len(entries)} Layer geliefert, {layer_count} erwartet")
+
+            # --- Dummy Vorschau ---
+            # Einfach ein kleines 128x128 Graubild
+            preview_bytes = Image.new("L", (128, 128), 180).tobytes()
+            f.write(struct.pack("<II", current_offset, len(preview_bytes)))
+            f.write(preview_bytes)
+
+            # LayerTable patchen
+            f.seek(table_offset)
+            f.write(b"".join(entries))
+            if s:
+                s["bytes"] = current_offset + 8 + len(preview_bytes)
+        os.replace(tmp, out_path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+    print(f"✅ CTB geschrieben: {out_path} ({layer_count} Layer + Vorschau)")
+
+
+def write_ctb(front_png, back_png, out_path="test.ctb", encoding="zlib", bits=1):
+    write_ctb_layers([front_png, back_png], out_path, encoding=encoding, bits=bits)
+
+
+def write_ctb_from_geometry(front_geom, back_geom=None, out_path="test.ctb",
+                            offset_x=0.0, offset_y=0.0, encoding="zlib",
+                            supersample=None, grayscale=False, threshold=RASTER_THRESHOLD):
+    """
+    Schreibt eine CTB direkt aus Shapely-Geometrie (ohne PNG-Zwischenschritt).
+    Offset wie bei build_and_transform_mesh; back_geom=None -> wie front_geom.
+
+    supersample > 1: kantengeglättet über raster_utils.rasterize_coverage;
+    die Abdeckung wird als 8-Bit-Layer geschrieben (grayscale=True) oder
+    bei threshold (0-255) auf 1 Bit geschnitten. grayscale ohne supersample
+    nimmt RASTER_SUPERSAMPLE; ohne beides wie bisher direkt 1 Bit.
+    """
+    from raster_utils import coverage_to_mask, rasterize_coverage, rasterize_geometry
+
+    if supersample is None:
+        supersample = RASTER_SUPERSAMPLE if grayscale else 1
+    if supersample <= 1 and not grayscale:
+        def render(geom):
+            return rasterize_geometry(geom, offset_x, offset_y)
+    else:
+        def render(geom):
+            cov = rasterize_coverage(geom, offset_x, offset_y, supersample)
+            return cov.tobytes() if grayscale else pack_mask(coverage_to_mask(cov, threshold))
+
+    with stage("ctb.rasterize", layers=1 if back_geom is None else 2, supersample=supersample):
+        front = render(front_geom)
+        back = front if back_geom is None else render(back_geom)
+    write_ctb(front, back, out_path, encoding=encoding, bits=8 if grayscale else 1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backends import lazy
+from constants import CHORD_TOLERANCE_MM
+from trace_utils import stage
+
+# Die Affin-Helfer brauchen nur NumPy; shapely erst bei Geometrie-Operationen
+shapely = lazy("shapely")
+
+# Zielgröße pro Kachel; darunter lohnt sich die Aufteilung nicht
+UNION_TILE_TARGET = 100
+
+
+def arc_segments(radius, sweep=2 * math.pi, tolerance=CHORD_TOLERANCE_MM):
+    """
+    Segmentanzahl für einen Bogen (sweep in rad), sodass die Sehnen höchstens
+    tolerance (mm) von der Kurve abweichen. Funktioniert auch mit Arrays.
+    """
+    r = np.maximum(np.abs(np.asarray(radius, dtype=np.float64)), 1e-12)
+    # max. Winkel pro Segment: 2 * acos(1 - tol / r)
+    step = 2.0 * np.arccos(np.clip(1.0 - tolerance / r, -1.0, 1.0))
+    n = np.maximum(1, np.ceil(np.abs(sweep) / step)).astype(np.int64)
+    return int(n) if n.ndim == 0 else n
+
+
+def quad_segs(radius, tolerance=CHORD_TOLERANCE_MM):
+    """quad_segs für shapely.buffer (Segmente pro Viertelkreis, mind. 2)"""
+    n = np.maximum(2, -(-np.asarray(arc_segments(radius, 2 * math.pi, tolerance)) // 4))
+    return int(n) if n.ndim == 0 else n
+
+
+def buffer_circles(x, y, radius, tolerance=CHORD_TOLERANCE_MM):
+    """Kreise als Polygone, Segmentanzahl je Radius passend zur Toleranz"""
+    radius = np.asarray(radius, dtype=np.float64)
+    q = quad_segs(radius, tolerance)
+    out = np.empty(len(radius), dtype=object)
+    centers = shapely.points(x, y)
+    for qv in np.unique(q):
+        m = q == qv
+        out[m] = shapely.buffer(centers[m], radius[m], quad_segs=int(qv))
+    return out
+
+
+def count_vertices(geom):
+    """Gesamtzahl Koordinaten (Geometrie oder Liste von Geometrien)"""
+    if geom is None:
+        return 0
+    return int(np.sum(shapely.get_num_coordinates(geom)))
+
+
+def affine_matrix(a=1.0, b=0.0, d=0.0, e=1.0, xoff=0.0, yoff=0.0):
+    """3x3-Matrix zu den shapely-Parametern [a, b, d, e, xoff, yoff]"""
+    return np.array([[a, b, xoff], [d, e, yoff], [0.0, 0.0, 1.0]])
+
+
+def affine_params(m):
+    """3x3-Matrix -> Parameterliste für shapely.affinity.affine_transform"""
+    return [m[0, 0], m[0, 1], m[1, 0], m[1, 1], m[0, 2], m[1, 2]]
+
+
+def affine_scale(m):
+    """mittlerer Längenmaßstab der Matrix"""
+    return math.sqrt(abs(np.linalg.det(m[:2, :2])))
+
+
+def transform_bounds(bounds, m):
+    """
+    Bounding Box nach Anwendung von m, aus den vier Ecken berechnet.
+    Exakt für achsentreue Abbildungen (Spiegeln, 90°-Drehung, Skalieren).
+    """
+    minx, miny, maxx, maxy = bounds
+    corners = np.array([[minx, minx, maxx, maxx], [miny, maxy, miny, maxy], [1, 1, 1, 1]])
+    x, y, _ = m @ corners
+    return x.min(), y.min(), x.max(), y.max()
+
+
+def _as_parts(geoms):
+    """Eingaben als flaches Array einzelner Polygone (Multi-Geometrien zerlegt)"""
+    arr = np.asarray([g for g in geoms if g is not None], dtype=object)
+    if arr.size == 0:
+        return arr
+    arr = shapely.get_parts(arr)
+    return arr[~shapely.is_empty(arr)]
+
+
+def tiled_union(geoms, tile_size=None, workers=None, coverage=False, report=None):
+    """
+    Vereinigung großer Geometriemengen über ein Kachelraster.
+
+    Die Teile werden nach dem Mittelpunkt ihrer Bounding Box Kacheln
+    (Kantenlänge tile_size in mm, None = automatisch) zugeordnet, jede
+    Kachel wird für sich (parallel im Thread-Pool, GEOS gibt die GIL frei)
+    vereinigt, danach werden die Kachel-Ergebnisse zusammengeführt.
+    coverage=True: schneller Pfad für Teile, die sich nicht überlappen
+    (überlappen sie doch, wird normal vereinigt).
+    report: optionales Dict, bekommt Kachelanzahl und Zeiten je Phase.
+    """
+    with stage("union") as s:
+        if s and report is None:
+            report = {}
+        result = _tiled_union(geoms, tile_size, workers, coverage, report)
+        if s:
+            s.update(parts=report["parts"], tiles=report["tiles"],
+                     seam_parts=report.get("seam_parts", 0), coverage=report["coverage"],
+                     vertices=count_vertices(result))
+    return result
+
+
+def _tiled_union(geoms, tile_size, workers, coverage, report):
+    t0 = time.perf_counter()
+    parts = _as_parts(geoms)
+    rep = {"parts": int(parts.size), "tiles": 0, "tile_size": tile_size,
+           "coverage": False, "timings": {}}
+    if report is not None:
+        report.clear()
+        report.update(rep)
+        rep = report
+    timings = rep["timings"]
+
+    if parts.size == 0:
+        return shapely.GeometryCollection()
+
+    # coverage_union_all meldet Überlappungen nicht, sondern liefert dann
+    # ungültige Geometrie -> vorher prüfen, sonst normaler Weg
+    if coverage and shapely.coverage_is_valid(parts):
+        result = shapely.coverage_union_all(parts)
+        rep["coverage"] = True
+        timings["coverage"] = time.perf_counter() - t0
+        return result
+
+    bounds = shapely.bounds(parts)
+    minx, miny = bounds[:, 0].min(), bounds[:, 1].min()
+    maxx, maxy = bounds[:, 2].max(), bounds[:, 3].max()
+    if tile_size is None:
+        n_tiles = parts.size / UNION_TILE_TARGET
+        if n_tiles <= 2:
+            result = shapely.union_all(parts)
+            rep["tiles"] = 1
+            timings["union"] = time.perf_counter() - t0
+            return result
+        tile_size = math.sqrt(max((maxx - minx) * (maxy - miny), 1e-9) / n_tiles)
+    rep["tile_size"] = tile_size
+
+    # Zuordnung zu Kacheln
+    cx = (bounds[:, 0] + bounds[:, 2]) * 0.5
+    cy = (bounds[:, 1] + bounds[:, 3]) * 0.5
+    nx = max(1, int(math.ceil((maxx - minx) / tile_size)))
+    ix = np.minimum(((cx - minx) / tile_size).astype(np.int64), nx - 1)
+    iy = ((cy - miny) / tile_size).astype(np.int64)
+    key = iy * nx + ix
+    order = np.argsort(key, kind="stable")
+    splits = np.flatnonzero(np.diff(key[order])) + 1
+    groups = np.split(parts[order], splits)
+    rep["tiles"] = len(groups)
+    t1 = time.perf_counter()
+    timings["partition"] = t1 - t0
+
+    # Kacheln vereinigen
+    workers = workers or min(len(groups), os.cpu_count() or 1)
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            tiles = list(pool.map(shapely.union_all, groups))
+    else:
+        tiles = [shapely.union_all(g) for g in groups]
+    t2 = time.perf_counter()
+    timings["tiles"] = t2 - t1
+
+    # Zusammenführen: nur Teile, die Teile anderer Kacheln berühren,
+    # werden noch einmal vereinigt, der Rest wird unverändert übernommen
+    result = _merge_tiles(tiles, rep)
+    timings["merge"] = time.perf_counter() - t2
+    return result
+
+
+def _merge_tiles(tiles, rep):
+    tiles = [t for t in tiles if t is not None and not t.is_empty]
+    if not tiles:
+        return shapely.GeometryCollection()
+    parts = [shapely.get_parts(t) for t in tiles]
+    label = np.repeat(np.arange(len(parts)), [len(p) for p in parts])
+    parts = np.concatenate(parts)
+    tree = shapely.STRtree(parts)
+    a, b = tree.query(parts, predicate="intersects")
+    cross = label[a] != label[b]
+    seam = np.zeros(parts.size, dtype=bool)
+    seam[a[cross]] = True
+    rep["seam_parts"] = int(seam.sum())
+
+    keep = list(parts[~seam])
+    if seam.any():
+        keep.extend(shapely.get_parts(shapely.union_all(parts[seam])))
+    keep = [g for g in keep if g.geom_type == "Polygon" and not g.is_empty]
+    if len(keep) == 1:
+        return keep[0]
+    return shapely.MultiPolygon(keep)
@@ -0,0 +1,278 @@
+"""
+Excellon-Bohrdaten (NC Drill) lesen.
+
+Wie gerber_parser zeilenweise aus einem Stream (auch ZIP-Eintrag) und als
+Arrays statt Objekten, alle Maße in mm:
+
+    Bohrungen   hole_xy (N, 2), hole_diameter (N,)
+    Langlöcher  slot_xy (M, 4) = x0, y0, x1, y1, slot_diameter (M,)
+
+Langlöcher entstehen aus G85 und aus Fräswegen (M15, G01/G02/G03 ..., M16/M17);
+Bögen werden wie im Gerber-Parser mit CHORD_TOLERANCE_MM in Sehnen zerlegt.
+"""
+import math
+import re
+
+import numpy as np
+
+from constants import CHORD_TOLERANCE_MM
+from geom_utils import arc_segments
+from .gerber_parser import GerberError
+
+# Standard-Zahlenformat (Vor-, Nachkommastellen), falls die Datei keins angibt
+FORMAT_METRIC = (3, 3)
+FORMAT_INCH = (2, 4)
+
+_TOOL = re.compile(r"T0*(\d+)(.*)$")
+_TOOL_DIA = re.compile(r"C([\d.]+)")
+_XY = re.compile(r"(?:X([+-]?[\d.]+))?(?:Y([+-]?[\d.]+))?")
+_ARC = re.compile(r"(?:A([+-]?[\d.]+))?(?:I([+-]?[\d.]+))?(?:J([+-]?[\d.]+))?")
+_FILE_FORMAT = re.compile(r"FILE_FORMAT=(\d+):(\d+)")
+_UNIT_FORMAT = re.compile(r"(0+)\.(0+)")
+
+
+class DrillLayer:
+    """Ergebnis von parse_excellon (Arrays wie in der Moduldoku, alles in mm)"""
+
+    def __init__(self, name=""):
+        self.name = name
+        self.plated = None  # aus ;TYPE=PLATED / NON_PLATED, sonst unbekannt
+        self.tools = {}     # Werkzeugnummer -> Durchmesser (mm)
+        self.hole_xy = np.empty((0, 2))
+        self.hole_diameter = np.empty(0)
+        self.slot_xy = np.empty((0, 4))
+        self.slot_diameter = np.empty(0)
+
+    def __len__(self):
+        return len(self.hole_diameter) + len(self.slot_diameter)
+
+    def __repr__(self):
+        return (f"DrillLayer({self.name!r}, holes={len(self.hole_diameter)}, "
+                f"slots={len(self.slot_diameter)})")
+
+
+class _Parser:
+    def __init__(self, name):
+        self.layer = DrillLayer(name)
+        self.scale = 1.0
+        self.digits = FORMAT_METRIC
+        self.explicit_format = False
+        self.leading_zeros = True   # LZ: führende Nullen stehen, hintere fehlen ggf.
+        self.incremental = False
+        self.header = False
+        self.tool = None
+        self.rout = False
+        self.down = False
+        self.motion = "G01"  # modal: G00 Eilgang, G01 Gerade, G02/G03 Bogen (CW/CCW)
+        self.x = self.y = 0.0
+        self.holes, self.hole_d = [], []
+        self.slots, self.slot_d = [], []
+
+    def diameter(self):
+        if self.tool is None or self.tool not in self.layer.tools:
+            raise GerberError(f"Bohrung ohne definiertes Werkzeug (T{self.tool})")
+        return self.layer.tools[self.tool]
+
+    def coord(self, s):
+        if "." in s:
+            return float(s) * self.scale
+        int_digits, decimals = self.digits
+        if self.leading_zeros:
+            sign = -1.0 if s[0] == "-" else 1.0
+            s = s.lstrip("+-").ljust(int_digits + decimals, "0")
+            return sign * int(s) * self.scale / 10 ** decimals
+        return int(s) * self.scale / 10 ** decimals
+
+    def position(self, text):
+        """X/Y am Anfang von text -> neue Position (fehlende Achse bleibt)"""
+        m = _XY.match(text)
+        xs, ys = m.groups()
+        if self.incremental:
+            x = self.x + (self.coord(xs) if xs else 0.0)
+            y = self.y + (self.coord(ys) if ys else 0.0)
+        else:
+            x = self.coord(xs) if xs else self.x
+            y = self.coord(ys) if ys else self.y
+        return x, y, text[m.end():]
+
+    def units(self, line):
+        inch = line.startswith("INCH")
+        self.scale = 25.4 if inch else 1.0
+        if "TZ" in line:
+            self.leading_zeros = False
+        elif "LZ" in line:
+            self.leading_zeros = True
+        m = _UNIT_FORMAT.search(line)
+        if m:
+            self.digits = (len(m.group(1)), len(m.group(2)))
+        elif not self.explicit_format:
+            self.digits = FORMAT_INCH if inch else FORMAT_METRIC
+
+    def comment(self, line):
+        m = _FILE_FORMAT.search(line)
+        if m:
+            self.digits = (int(m.group(1)), int(m.group(2)))
+            self.explicit_format = True
+        if "TYPE=NON_PLATED" in line:
+            self.layer.plated = False
+        elif "TYPE=PLATED" in line:
+            self.layer.plated = True
+
+    def tool_line(self, line):
+        m = _TOOL.match(line)
+        num, params = int(m.group(1)), m.group(2)
+        dia = _TOOL_DIA.search(params)
+        if dia:
+            self.layer.tools[num] = float(dia.group(1)) * self.scale
+        if not self.header:
+            self.tool = num if num else None
+
+    def line(self, line):
+        if line.startswith(";"):
+            self.comment(line)
+            return False
+        if line == "M48":
+            self.header = True
+            return False
+        if self.header:
+            if line in ("%", "M95"):
+                self.header = False
+            elif line.startswith(("METRIC", "INCH")):
+                self.units(line)
+            elif line.startswith("ICI"):
+                self.incremental = "OFF" not in line
+            elif line[0] == "T":
+                self.tool_line(line)
+            return False
+
+        if line in ("M30", "M00"):
+            return True
+        if line[0] == "T":
+            self.tool_line(line)
+        elif line == "M71":
+            self.scale = 1.0
+        elif line == "M72":
+            self.scale = 25.4
+        elif line == "G90":
+            self.incremental = False
+        elif line == "G91":
+            self.incremental = True
+        elif line == "G05":
+            self.rout = self.down = False
+        elif line == "M15":
+            self.down = True
+        elif line in ("M16", "M17"):
+            self.down = False
+        elif line.startswith(("G00", "G01", "G02", "G03")):
+            # Fräsweg; die Bewegungsart gilt auch für folgende XY-Zeilen
+            self.rout = True
+            self.motion = line[:3]
+            x, y, rest = self.position(line[3:])
+            if line[3:]:
+                self.route(x, y, rest)
+            self.x, self.y = x, y
+        elif line[0] in "XY":
+            x, y, rest = self.position(line)
+            if rest.startswith("G85"):
+                self.x, self.y = x, y
+                x, y, _ = self.position(rest[3:])
+                self.add_slot(x, y)
+            elif self.rout:
+                self.route(x, y, rest)
+            else:
+                self.holes += (x, y)
+                self.hole_d.append(self.diameter())
+            self.x, self.y = x, y
+        # übrige M-/G-Codes (G93, M47, ...) ignorieren
+        return False
+
+    def route(self, x, y, rest):
+        """Fräsweg von der aktuellen Position nach x, y (nur mit abgesenktem Fräser)"""
+        if not self.down or self.motion == "G00":
+            return
+        if self.motion == "G01":
+            self.add_slot(x, y)
+            return
+        for px, py in self.arc(x, y, rest):
+            self.add_slot(px, py)
+            self.x, self.y = px, py
+
+    def arc(self, x1, y1, rest):
+        """
+        G02/G03 zum Endpunkt -> Sehnen-Endpunkte. Mittelpunkt aus I/J (relativ
+        zum Start, gleiche Start-/Endpunkte = Vollkreis) oder Radius A
+        (positiv: kurzer Bogen, negativ: langer Bogen).
+        """
+        a, i, j = _ARC.match(rest).groups()
+        x0, y0 = self.x, self.y
+        cw = self.motion == "G02"
+        if i or j:
+            cx = x0 + (self.coord(i) if i else 0.0)
+            cy = y0 + (self.coord(j) if j else 0.0)
+            full = True
+        elif a:
+            r = self.coord(a)
+            dx, dy = x1 - x0, y1 - y0
+            d = math.hypot(dx, dy)
+            if d == 0.0 or d > 2 * abs(r) + 1e-6:
+                raise GerberError(f"Bogen mit Radius {abs(r):g} mm passt nicht "
+                                  f"zur Sehne {d:g} mm")
+            h = math.sqrt(max(r * r - d * d / 4, 0.0))
+            # kurzer Bogen: Mittelpunkt links der Sehne bei CCW, rechts bei CW
+            side = 1.0 if (not cw) == (r > 0) else -1.0
+            cx = x0 + dx / 2 - side * h * dy / d
+            cy = y0 + dy / 2 + side * h * dx / d
+            full = False
+        else:
+            raise GerberError(f"{self.motion} ohne Mittelpunkt (I/J) oder Radius (A)")
+        r = 0.5 * (math.hypot(x0 - cx, y0 - cy) + math.hypot(x1 - cx, y1 - cy))
+        sweep = _sweep(cx, cy, x0, y0, x1, y1, cw, full)
+        if sweep == 0.0 or r == 0.0:
+            return [(x1, y1)]
+        n = arc_segments(r, sweep, CHORD_TOLERANCE_MM)
+        angle = math.atan2(y0 - cy, x0 - cx) + sweep * np.arange(1, n) / n
+        pts = list(zip((cx + r * np.cos(angle)).tolist(), (cy + r * np.sin(angle)).tolist()))
+        pts.append((x1, y1))
+        return pts
+
+    def add_slot(self, x, y):
+        self.slots += (self.x, self.y, x, y)
+        self.slot_d.append(self.diameter())
+
+    def finish(self):
+        layer = self.layer
+        layer.hole_xy = np.array(self.holes, dtype=np.float64).reshape(-1, 2)
+        layer.hole_diameter = np.array(self.hole_d, dtype=np.float64)
+        layer.slot_xy = np.array(self.slots, dtype=np.float64).reshape(-1, 4)
+        layer.slot_diameter = np.array(self.slot_d, dtype=np.float64)
+        return layer
+
+
+def _sweep(cx, cy, x0, y0, x1, y1, cw, full):
+    """Überstrichener Winkel (rad, CW negativ); full: gleiche Punkte = Vollkreis"""
+    a0 = math.atan2(y0 - cy, x0 - cx)
+    a1 = math.atan2(y1 - cy, x1 - cx)
+    tau = 2 * math.pi
+    if cw:
+        s = (a0 - a1) % tau
+        return -(tau if full and s < 1e-12 else s)
+    s = (a1 - a0) % tau
+    return tau if full and s < 1e-12 else s
+
+
+def parse_excellon(stream, name=""):
+    """Excellon aus einem (Binär- oder Text-)Stream lesen -> DrillLayer"""
+    p = _Parser(name)
+    seen = False
+    for raw in stream:
+        if isinstance(raw, bytes):
+            raw = raw.decode("latin-1")
+        line = raw.strip()
+        if not line:
+            continue
+        seen = seen or line == "M48"
+        if p.line(line):
+            break
+    if not seen:
+        raise GerberError(f"{name or 'Datei'}: kein Excellon-Kopf (M48) gefunden")
+    return p.finish()
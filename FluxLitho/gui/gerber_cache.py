@@ -0,0 +1,109 @@
+"""
+Inhaltsadressierter Disk-Cache für konvertierte Gerber-Layer.
+
+Schlüssel = SHA-256 über Dateiinhalt + Konvertierungsparameter, Wert = die
+vereinigte Layer-Geometrie als WKB. Die Größe ist begrenzt, bei Überlauf
+werden die am längsten nicht benutzten Einträge gelöscht (LRU über mtime).
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import shapely
+
+CACHE_DIR = Path(os.environ.get("FLUXLITHO_CACHE_DIR")
+                 or Path.home() / ".cache" / "fluxlitho" / "gerber")
+CACHE_MAX_BYTES = int(float(os.environ.get("FLUXLITHO_CACHE_MAX_MB", 256)) * 1024 * 1024)
+
+# Zähler zur Kontrolle (pro Prozess)
+stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+
+def cache_key(data: bytes, params) -> str:
+    h = hashlib.sha256()
+    h.update(repr(params).encode("utf-8"))
+    h.update(b"\0")
+    h.update(data)
+    return h.hexdigest()
+
+
+def _entry(key):
+    return CACHE_DIR / f"{key}.wkb"
+
+
+def get(key):
+    """Geometrie aus dem Cache oder None; ein leerer Layer kommt als leere Geometrie"""
+    path = _entry(key)
+    try:
+        data = path.read_bytes()
+    except OSError:
+        stats["misses"] += 1
+        return None
+    try:
+        geom = shapely.from_wkb(data)
+    except (shapely.errors.GEOSException, ValueError):
+        # Kaputter Eintrag (abgeschnitten o.ä.): löschen, Layer neu parsen lassen
+        path.unlink(missing_ok=True)
+        stats["misses"] += 1
+        return None
+    try:
+        os.utime(path)  # LRU: zuletzt benutzt
+    except OSError:
+        pass
+    stats["hits"] += 1
+    return geom
+
+
+def put(key, geom):
+    """Geometrie (oder None für leere Layer) atomar ablegen und Cache begrenzen"""
+    if geom is None:
+        geom = shapely.GeometryCollection()
+    tmp = None
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(shapely.to_wkb(geom))
+        os.replace(tmp, _entry(key))
+        tmp = None
+        stats["writes"] += 1
+        evict()
+    except OSError as e:
+        print(f"⚠ Cache nicht beschreibbar: {e}")
+    finally:
+        # halb geschriebene Datei (Platte voll, Abbruch, ...) nicht liegen lassen
+        if tmp is not None:
+            try:
+                Path(tmp).unlink(missing_ok=True)
+            except OSError:
+                pass
+
+
+def evict(max_bytes=None):
+    """Älteste Einträge löschen, bis der Cache unter max_bytes liegt"""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    for p in CACHE_DIR.glob("*.wkb"):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, p))
+        total += st.st_size
+    entries.sort()
+    for _, size, p in entries:
+        if total <= max_bytes:
+            break
+        try:
+            p.unlink()
+        except OSError:
+            continue
+        total -= size
+        stats["evictions"] += 1
+
+
+def clear():
+    for p in CACHE_DIR.glob("*.wkb"):
+        p.unlink(missing_ok=True)
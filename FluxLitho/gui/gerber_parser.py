@@ -0,0 +1,538 @@
+"""
+Eigener RS-274X-Parser (ohne pcb-tools).
+
+Liest die Datei blockweise als Stream (auch direkt aus einem ZIP-Eintrag)
+und legt keine Python-Objekte pro Primitiv an, sondern sammelt Arrays
+(structure of arrays, alle Koordinaten in mm):
+
+    Flashes   flash_xy (N, 2), flash_aperture (N,)
+    Tracks    track_xy (M, 4) = x0, y0, x1, y1, track_aperture, track_width
+    Regionen  region_xy (P, 2), region_offsets (R + 1,) = Start je Kontur
+
+Bögen (G02/G03) werden beim Parsen in Sehnen mit höchstens
+CHORD_TOLERANCE_MM Abweichung zerlegt und landen als Tracks bzw. als
+Regionspunkte. Jede Polaritätsebene (%LPD / %LPC) bekommt eine Nummer
+(*_level), levels[i] ist True für dunkel. Die Geometrie baut
+gerber_utils.gerber_layer_to_shapely aus den Arrays.
+"""
+import math
+import re
+from collections import namedtuple
+
+import numpy as np
+
+from constants import CHORD_TOLERANCE_MM
+from geom_utils import arc_segments
+
+CHUNK_SIZE = 1 << 16
+
+# shape: "C", "R", "O", "P" oder "macro"; params in Dateieinheiten (bei
+# "macro" eine Liste von (Primitiv-Code, Werte)); scale = mm pro Dateieinheit
+Aperture = namedtuple("Aperture", "shape params scale")
+
+
+class GerberError(ValueError):
+    """Datei ist kein RS-274X oder nutzt nicht unterstützte Befehle"""
+
+
+_BLOCK = re.compile(r"%([^%]*)%|([^%*]*)\*")
+_WORD = re.compile(r"(?:G0*(\d+))?(?:X([+-]?\d+))?(?:Y([+-]?\d+))?"
+                   r"(?:I([+-]?\d+))?(?:J([+-]?\d+))?(?:D0*(\d+))?(?:M0*(\d+))?$")
+_FS = re.compile(r"FS([LTD]?)([AI])X(\d)(\d)Y(\d)(\d)")
+_AD = re.compile(r"ADD(\d+)([^,]+)(?:,(.*))?$")
+_SR = re.compile(r"SR(?:X(\d+))?(?:Y(\d+))?(?:I([\d.+-]+))?(?:J([\d.+-]+))?$")
+_TOKEN = re.compile(r"\s*(?:(\d+\.?\d*|\.\d+)|\$(\d+)|(\S))")
+_IMAGE_TRANSFORM = re.compile(r"(?:OF|SF)(?:A([\d.+-]+))?(?:B([\d.+-]+))?$")
+
+
+def iter_blocks(stream, chunk_size=CHUNK_SIZE):
+    """
+    Zerlegt den Stream in Blöcke -> (extended, text).
+    extended=True für %...%-Parameterblöcke (text ohne die %), sonst ein
+    Befehl ohne abschließendes *. Zeilenumbrüche werden ignoriert.
+    """
+    rest = ""
+    match = _BLOCK.match
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode("latin-1")
+        buf = rest + chunk.replace("\r", "").replace("\n", "")
+        pos = 0
+        while True:
+            m = match(buf, pos)
+            if m is None:
+                break
+            pos = m.end()
+            ext = m.group(1)
+            if ext is not None:
+                yield True, ext
+            else:
+                yield False, m.group(2)
+        rest = buf[pos:]
+
+
+def _tokens(text):
+    """Makro-Ausdruck -> Liste (Art, Wert) mit Art "num", "var" oder "op"; Ende = ("end", None)"""
+    out = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        num, var, op = m.groups()
+        if num is not None:
+            out.append(("num", float(num)))
+        elif var is not None:
+            out.append(("var", int(var)))
+        elif op in "+-xX/()":
+            out.append(("op", "x" if op == "X" else op))
+        else:
+            raise GerberError(f"Unerwartetes Zeichen {op!r}")
+        pos = m.end()
+    out.append(("end", None))
+    return out
+
+
+class _ExprParser:
+    """
+    Rekursiver Abstieg für Makro-Arithmetik:
+        expr   = term {("+" | "-") term}
+        term   = factor {("x" | "/") factor}
+        factor = ("+" | "-") factor | Zahl | $n | "(" expr ")"
+    """
+
+    def __init__(self, text, variables):
+        self.tokens = _tokens(text)
+        self.pos = 0
+        self.variables = variables
+
+    def peek(self):
+        return self.tokens[self.pos]
+
+    def take(self):
+        tok = self.tokens[self.pos]
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        value = self.expr()
+        if self.peek()[0] != "end":
+            raise GerberError(f"Unerwartetes {self.peek()[1]!r}")
+        return value
+
+    def expr(self):
+        value = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            op = self.take()[1]
+            rhs = self.term()
+            value = value + rhs if op == "+" else value - rhs
+        return value
+
+    def term(self):
+        value = self.factor()
+        while self.peek() in (("op", "x"), ("op", "/")):
+            op = self.take()[1]
+            rhs = self.factor()
+            if op == "x":
+                value *= rhs
+            elif rhs == 0:
+                raise GerberError("Division durch 0")
+            else:
+                value /= rhs
+        return value
+
+    def factor(self):
+        kind, val = self.take()
+        if kind == "num":
+            return val
+        if kind == "var":
+            return float(self.variables.get(val, 0.0))
+        if (kind, val) == ("op", "-"):
+            return -self.factor()
+        if (kind, val) == ("op", "+"):
+            return self.factor()
+        if (kind, val) == ("op", "("):
+            value = self.expr()
+            if self.take() != ("op", ")"):
+                raise GerberError("Fehlende schließende Klammer")
+            return value
+        raise GerberError("Operand erwartet" if kind == "end" else f"Unerwartetes {val!r}")
+
+
+def _expr(text, variables):
+    """Arithmetik aus Blenden-Makros ($n, + - x / Klammern) auswerten"""
+    try:
+        value = _ExprParser(text, variables).parse()
+    except GerberError as e:
+        raise GerberError(f"Ungültiger Makro-Ausdruck {text!r}: {e}") from None
+    except RecursionError:
+        raise GerberError(f"Makro-Ausdruck {text!r} zu tief verschachtelt") from None
+    if not math.isfinite(value):
+        raise GerberError(f"Makro-Ausdruck {text!r} ist nicht endlich")
+    return value
+
+
+def eval_macro(body, args):
+    """Makro-Rumpf (Liste der Anweisungen) mit Parametern -> [(Code, Werte)]"""
+    variables = {i + 1: v for i, v in enumerate(args)}
+    prims = []
+    for stmt in body:
+        stmt = stmt.strip()
+        if not stmt or stmt[0] == "0":  # Kommentar-Primitiv
+            continue
+        if stmt[0] == "$":
+            name, expr = stmt.split("=", 1)
+            variables[int(name[1:])] = _expr(expr, variables)
+            continue
+        code, *fields = stmt.split(",")
+        prims.append((int(code), [_expr(f, variables) for f in fields]))
+    return prims
+
+
+class GerberLayer:
+    """Ergebnis von parse_gerber (Arrays wie in der Moduldoku, alles in mm)"""
+
+    units = "metric"
+
+    def __init__(self, name=""):
+        self.name = name
+        self.apertures = {}
+        self.levels = [True]
+        self.flash_xy = np.empty((0, 2))
+        self.flash_aperture = np.empty(0, dtype=np.int32)
+        self.flash_level = np.empty(0, dtype=np.int32)
+        self.track_xy = np.empty((0, 4))
+        self.track_aperture = np.empty(0, dtype=np.int32)
+        self.track_width = np.empty(0)
+        self.track_level = np.empty(0, dtype=np.int32)
+        self.region_xy = np.empty((0, 2))
+        self.region_offsets = np.zeros(1, dtype=np.int64)
+        self.region_level = np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        """Anzahl Primitive (Flashes + Track-Segmente + Regionskonturen)"""
+        return len(self.flash_aperture) + len(self.track_aperture) + len(self.region_level)
+
+    def __repr__(self):
+        return (f"GerberLayer({self.name!r}, flashes={len(self.flash_aperture)}, "
+                f"tracks={len(self.track_aperture)}, regions={len(self.region_level)})")
+
+
+class _Parser:
+    def __init__(self, name):
+        self.layer = GerberLayer(name)
+        self.macros = {}
+        # Format / Modi
+        self.zeros = "L"
+        self.incremental = False
+        self.decimals = 6
+        self.int_digits = 3
+        self.scale = 1.0         # mm pro Dateieinheit
+        self.interp = 1          # 1 linear, 2 CW, 3 CCW
+        self.multi_quadrant = False
+        self.region = False
+        self.aperture = -1
+        self.dcode = 1
+        self.x = self.y = 0.0
+        self.done = False
+        # gesammelte Daten (flache Listen, am Ende -> Arrays)
+        self.flashes, self.flash_ap, self.flash_lvl = [], [], []
+        self.tracks, self.track_ap, self.track_lvl = [], [], []
+        self.region_pts, self.region_starts, self.region_lvl = [], [], []
+        self.contour = None
+        self.step_repeat = None
+
+    # --- Koordinaten ---
+
+    def coord(self, s):
+        if self.zeros == "T":
+            sign = -1.0 if s[0] == "-" else 1.0
+            digits = s.lstrip("+-").ljust(self.int_digits + self.decimals, "0")
+            return sign * int(digits) * self.scale / 10 ** self.decimals
+        return int(s) * self.scale / 10 ** self.decimals
+
+    # --- Parameterblöcke ---
+
+    def extended(self, text):
+        if text.startswith("AM"):
+            name, *body = text.rstrip("*").split("*")
+            self.macros[name[2:]] = body
+            return
+        for cmd in text.split("*"):
+            cmd = cmd.strip()
+            if not cmd:
+                continue
+            head = cmd[:2]
+            if head == "FS":
+                m = _FS.match(cmd)
+                if m is None:
+                    raise GerberError(f"Ungültiges Format {cmd!r}")
+                self.zeros = m.group(1) or "L"
+                self.incremental = m.group(2) == "I"
+                self.int_digits, self.decimals = int(m.group(3)), int(m.group(4))
+            elif head == "MO":
+                self.scale = 25.4 if cmd[2:4] == "IN" else 1.0
+            elif head == "AD":
+                self.define_aperture(cmd)
+            elif head == "LP":
+                dark = cmd[2:3] != "C"
+                if dark != self.layer.levels[-1]:
+                    self.layer.levels.append(dark)
+            elif head == "SR":
+                self.set_step_repeat(cmd)
+            elif head == "AB":
+                raise GerberError("Blockblenden (%AB) nicht unterstützt")
+            elif head in ("LM", "LR", "LS"):
+                if cmd[2:] not in ("N", "0", "0.0", "1", "1.0"):
+                    raise GerberError(f"Transformation {cmd!r} nicht unterstützt")
+            elif head == "IP" and cmd[2:5] == "NEG":
+                raise GerberError("Negatives Bild (%IPNEG) nicht unterstützt")
+            elif head in ("OF", "SF"):
+                self.check_image_transform(cmd)
+            # TF/TA/TO/TD, IN, ... beeinflussen die Geometrie hier nicht
+
+    @staticmethod
+    def check_image_transform(cmd):
+        """Veraltete %OF/%SF: nur die neutralen Werte (A0B0 bzw. A1B1) sind erlaubt"""
+        m = _IMAGE_TRANSFORM.match(cmd)
+        neutral = 0.0 if cmd[:2] == "OF" else 1.0
+        try:
+            ok = m is not None and all(float(v) == neutral for v in m.groups() if v is not None)
+        except ValueError:
+            ok = False
+        if not ok:
+            raise GerberError(f"Bildverschiebung/-skalierung {cmd!r} nicht unterstützt")
+
+    def define_aperture(self, cmd):
+        m = _AD.match(cmd)
+        if m is None:
+            raise GerberError(f"Ungültige Blende {cmd!r}")
+        num, shape, mods = int(m.group(1)), m.group(2), m.group(3)
+        values = [float(v) for v in mods.split("X")] if mods else []
+        if shape in ("C", "R", "O", "P"):
+            self.layer.apertures[num] = Aperture(shape, values, self.scale)
+        elif shape in self.macros:
+            self.layer.apertures[num] = Aperture(
+                "macro", eval_macro(self.macros[shape], values), self.scale)
+        else:
+            raise GerberError(f"Unbekannte Blende {shape!r}")
+
+    def set_step_repeat(self, cmd):
+        self.close_step_repeat()
+        m = _SR.match(cmd)
+        if m is None:
+            raise GerberError(f"Ungültiges Step&Repeat {cmd!r}")
+        nx, ny = int(m.group(1) or 1), int(m.group(2) or 1)
+        if nx > 1 or ny > 1:
+            dx = float(m.group(3) or 0) * self.scale
+            dy = float(m.group(4) or 0) * self.scale
+            self.step_repeat = (nx, ny, dx, dy, len(self.flash_ap),
+                                len(self.track_ap), len(self.region_lvl))
+
+    def close_step_repeat(self):
+        """Objekte seit %SR...% für alle weiteren Raster-Positionen kopieren"""
+        if self.step_repeat is None:
+            return
+        nx, ny, dx, dy, f0, t0, r0 = self.step_repeat
+        self.step_repeat = None
+        flashes, fap, flvl = self.flashes[2 * f0:], self.flash_ap[f0:], self.flash_lvl[f0:]
+        tracks, tap, tlvl = self.tracks[4 * t0:], self.track_ap[t0:], self.track_lvl[t0:]
+        p0 = self.region_starts[r0] if r0 < len(self.region_starts) else len(self.region_pts) // 2
+        pts, starts, rlvl = self.region_pts[2 * p0:], self.region_starts[r0:], self.region_lvl[r0:]
+        for iy in range(ny):
+            for ix in range(nx):
+                if ix == 0 and iy == 0:
+                    continue
+                ox, oy = ix * dx, iy * dy
+                self.flashes.extend(v + (oy if k & 1 else ox) for k, v in enumerate(flashes))
+                self.flash_ap.extend(fap)
+                self.flash_lvl.extend(flvl)
+                self.tracks.extend(v + (oy if k & 1 else ox) for k, v in enumerate(tracks))
+                self.track_ap.extend(tap)
+                self.track_lvl.extend(tlvl)
+                shift = len(self.region_pts) // 2 - p0
+                self.region_starts.extend(s + shift for s in starts)
+                self.region_pts.extend(v + (oy if k & 1 else ox) for k, v in enumerate(pts))
+                self.region_lvl.extend(rlvl)
+
+    # --- Befehle ---
+
+    def command(self, text):
+        if not text or text.startswith("G04") or text.startswith("G4 "):
+            return
+        m = _WORD.match(text)
+        if m is None:
+            raise GerberError(f"Unbekannter Befehl {text!r}")
+        g, xs, ys, is_, js, d, mcode = m.groups()
+        if g is not None:
+            self.gcode(int(g))
+        if mcode is not None:
+            # Nur M02 beendet die Datei; M00/M01 (Programm-/Optionalstopp) ignorieren
+            self.done = int(mcode) == 2
+            return
+        if d is not None:
+            d = int(d)
+            if d >= 10:
+                self.aperture = d
+                return
+            self.dcode = d
+        elif xs is None and ys is None:
+            return
+        x, y = self.x, self.y
+        if self.incremental:
+            x = x + (self.coord(xs) if xs is not None else 0.0)
+            y = y + (self.coord(ys) if ys is not None else 0.0)
+        else:
+            x = self.coord(xs) if xs is not None else x
+            y = self.coord(ys) if ys is not None else y
+
+        if self.dcode == 1:
+            i = self.coord(is_) if is_ is not None else 0.0
+            j = self.coord(js) if js is not None else 0.0
+            pts = self.interpolate(x, y, i, j)
+            if self.region:
+                if self.contour is None:
+                    self.contour = [self.x, self.y]
+                self.contour.extend(pts)
+            else:
+                self.add_tracks(pts)
+        elif self.dcode == 2:
+            if self.region:
+                self.close_contour()
+        elif self.dcode == 3:
+            self.flashes += (x, y)
+            self.flash_ap.append(self.aperture)
+            self.flash_lvl.append(len(self.layer.levels) - 1)
+        self.x, self.y = x, y
+
+    def gcode(self, g):
+        if g in (1, 2, 3):
+            self.interp = g
+        elif g == 36:
+            self.region = True
+            self.contour = None
+        elif g == 37:
+            self.close_contour()
+            self.region = False
+        elif g == 74:
+            self.multi_quadrant = False
+        elif g == 75:
+            self.multi_quadrant = True
+        elif g == 70:
+            self.scale = 25.4
+        elif g == 71:
+            self.scale = 1.0
+        elif g == 90:
+            self.incremental = False
+        elif g == 91:
+            self.incremental = True
+
+    def add_tracks(self, pts):
+        """Linienzug ab aktueller Position (pts flach x, y, ...) als Segmente"""
+        x0, y0 = self.x, self.y
+        lvl = len(self.layer.levels) - 1
+        for k in range(0, len(pts), 2):
+            x1, y1 = pts[k], pts[k + 1]
+            self.tracks += (x0, y0, x1, y1)
+            x0, y0 = x1, y1
+        n = len(pts) // 2
+        self.track_ap.extend([self.aperture] * n)
+        self.track_lvl.extend([lvl] * n)
+
+    def close_contour(self):
+        c, self.contour = self.contour, None
+        if c is None or len(c) < 6:
+            return
+        self.region_starts.append(len(self.region_pts) // 2)
+        self.region_pts.extend(c)
+        self.region_lvl.append(len(self.layer.levels) - 1)
+
+    def interpolate(self, x1, y1, i, j):
+        """Zielpunkte (flach) für D01: Endpunkt oder Sehnen des Bogens"""
+        if self.interp == 1:
+            return [x1, y1]
+        x0, y0 = self.x, self.y
+        cw = self.interp == 2
+        if self.multi_quadrant:
+            cx, cy = x0 + i, y0 + j
+            sweep = self.sweep(cx, cy, x0, y0, x1, y1, cw, full=True)
+        else:
+            # Einzelquadrant: I/J ohne Vorzeichen -> Mittelpunkt mit Bogen <= 90°
+            best = None
+            for sx in (1.0, -1.0):
+                for sy in (1.0, -1.0):
+                    cx, cy = x0 + sx * abs(i), y0 + sy * abs(j)
+                    sweep = self.sweep(cx, cy, x0, y0, x1, y1, cw, full=False)
+                    if abs(sweep) <= math.pi / 2 + 1e-6:
+                        err = abs(math.hypot(x0 - cx, y0 - cy) - math.hypot(x1 - cx, y1 - cy))
+                        if best is None or err < best[0]:
+                            best = (err, cx, cy, sweep)
+            if best is None:
+                return [x1, y1]
+            _, cx, cy, sweep = best
+        r = 0.5 * (math.hypot(x0 - cx, y0 - cy) + math.hypot(x1 - cx, y1 - cy))
+        if sweep == 0.0 or r == 0.0:
+            return [x1, y1]
+        n = arc_segments(r, sweep, CHORD_TOLERANCE_MM)
+        a = math.atan2(y0 - cy, x0 - cx) + sweep * np.arange(1, n) / n
+        pts = np.empty(2 * n)
+        pts[0:-2:2] = cx + r * np.cos(a)
+        pts[1:-2:2] = cy + r * np.sin(a)
+        pts[-2:] = x1, y1
+        return pts.tolist()
+
+    @staticmethod
+    def sweep(cx, cy, x0, y0, x1, y1, cw, full):
+        """Überstrichener Winkel (rad, CW negativ); full: gleiche Punkte = Vollkreis"""
+        a0 = math.atan2(y0 - cy, x0 - cx)
+        a1 = math.atan2(y1 - cy, x1 - cx)
+        tau = 2 * math.pi
+        if cw:
+            s = (a0 - a1) % tau
+            return -(tau if full and s < 1e-12 else s)
+        s = (a1 - a0) % tau
+        return tau if full and s < 1e-12 else s
+
+    # --- Ergebnis ---
+
+    def finish(self):
+        self.close_step_repeat()
+        layer = self.layer
+        layer.flash_xy = np.array(self.flashes, dtype=np.float64).reshape(-1, 2)
+        layer.flash_aperture = np.array(self.flash_ap, dtype=np.int32)
+        layer.flash_level = np.array(self.flash_lvl, dtype=np.int32)
+        layer.track_xy = np.array(self.tracks, dtype=np.float64).reshape(-1, 4)
+        layer.track_aperture = np.array(self.track_ap, dtype=np.int32)
+        layer.track_level = np.array(self.track_lvl, dtype=np.int32)
+        layer.region_xy = np.array(self.region_pts, dtype=np.float64).reshape(-1, 2)
+        layer.region_offsets = np.array(self.region_starts + [len(layer.region_xy)], dtype=np.int64)
+        layer.region_level = np.array(self.region_lvl, dtype=np.int32)
+        # Strichbreite: Durchmesser runder Blenden, 0 = mit der Blendenform ziehen
+        diameters = {num: ap.params[0] * ap.scale for num, ap in layer.apertures.items()
+                     if ap.shape == "C" and ap.params}
+        ids, inverse = np.unique(layer.track_aperture, return_inverse=True)
+        layer.track_width = np.array([diameters.get(int(a), 0.0) for a in ids])[inverse]
+        return layer
+
+
+def parse_gerber(stream, name=""):
+    """
+    RS-274X aus einem (Binär- oder Text-)Stream lesen -> GerberLayer.
+    GerberError bei Dateien, die kein Gerber sind oder nicht unterstützte
+    Befehle (Blockblenden, Bildtransformationen) nutzen.
+    """
+    p = _Parser(name)
+    seen = False
+    for ext, text in iter_blocks(stream):
+        seen = seen or ext
+        if ext:
+            p.extended(text)
+        else:
+            p.command(text)
+        if p.done:
+            break
+    if not seen:
+        raise GerberError(f"{name or 'Datei'}: keine RS-274X-Parameter gefunden")
+    return p.finish()
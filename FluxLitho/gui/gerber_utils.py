@@ -1,71 +1,213 @@
-import os, zipfile, tempfile, io, builtins, math
+import os, zipfile, io, math, posixpath
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
+from pickle import PicklingError
 
+import builtins
+import importlib
+import multiprocessing
+import threading
+
+import numpy as np
+import shapely
 from shapely import affinity
-from shapely import ops as sops
 from shapely import geometry as sgeom
 
-# --- Monkeypatch: 'rU' Mode für alte pcb-tools abfangen ---
-_orig_io_open = io.open
-_orig_builtin_open = builtins.open
+from constants import CHORD_TOLERANCE_MM
+from geom_utils import tiled_union, arc_segments, quad_segs, buffer_circles, count_vertices
+from trace_utils import Failures, stage
+from . import gerber_cache
+from .excellon_parser import parse_excellon
+from .gerber_parser import GerberError, GerberLayer, parse_gerber
 
-def _patched_open(file, mode='r', *args, **kwargs):
-    if isinstance(mode, str) and 'U' in mode:
-        mode = mode.replace('U', '')
-    return _orig_io_open(file, mode, *args, **kwargs)
+# --- Defaults ---
+DEFAULT_TRACE_WIDTH = 0.25  # mm, falls keine width angegeben
+DEFAULT_PAD_SIZE   = 0.80   # mm, Fallback für Pads ohne Dimensionen
+OUTLINE_PREVIEW_W  = 0.05   # mm, Puffer für Outline-Vorschau
 
-def _patched_builtin_open(file, mode='r', *args, **kwargs):
-    if isinstance(mode, str) and 'U' in mode:
-        mode = mode.replace('U', '')
-    return _orig_builtin_open(file, mode, *args, **kwargs)
+# Version der Konvertierung; erhöhen, wenn sich die Geometrie-Erzeugung ändert
+GEOMETRY_VERSION = 5
 
-io.open = _patched_open
-builtins.open = _patched_builtin_open
 
-# pcb-tools
-try:
-    from gerber import load_layer
-    from gerber.primitives import Region, Circle, Rectangle, Line  # optional
-except Exception:
-    load_layer = None
-    Region = Circle = Rectangle = Line = object
+def default_layer_selected(name: str) -> bool:
+    """Standardauswahl (Top/Bottom, Copper, Mask, Silk) für Layer-Dateinamen"""
+    low = name.lower()
+    keys = ("top", "bottom", "copper", "cu", "mask",
+            "soldermask", "solder_mask", "silk", "legend")
+    return any(k in low for k in keys)
 
-# --- Defaults ---
-DEFAULT_TRACE_WIDTH = 0.25  # mm, falls keine width angegeben
-DEFAULT_PAD_SIZE   = 0.80   # mm, Fallback für Pads ohne Dimensionen
 
+GERBER_EXTENSIONS = (
+    ".gbr", ".ger", ".gtl", ".gbl", ".gto", ".gbo",
+    ".gts", ".gbs", ".gtp", ".gbp", ".gko", ".gml", ".gdl"
+)
+DRILL_EXTENSIONS = (".drl", ".xln", ".exc")
 
-def collect_gerber_files(path: str):
-    """Sammelt alle Gerber-Dateien aus Einzeldatei oder ZIP"""
+
+class ZipMember:
+    """
+    Gerber-Datei in einem ZIP, ohne Entpacken auf die Platte.
+    Picklebar (nur Pfad + Name), damit auch Worker-Prozesse lesen können.
+    """
+    def __init__(self, zip_path, member):
+        self.zip_path = zip_path
+        self.member = member
+
+    @property
+    def name(self):
+        return posixpath.basename(self.member)
+
+    def read_bytes(self):
+        with zipfile.ZipFile(self.zip_path, "r") as zf:
+            return zf.read(self.member)
+
+    def __repr__(self):
+        return f"{self.zip_path}::{self.member}"
+
+
+def layer_name(source):
+    """Anzeigename (Dateiname) für Pfad oder ZipMember"""
+    return source.name if isinstance(source, ZipMember) else Path(source).name
+
+
+def read_layer_bytes(source):
+    if isinstance(source, ZipMember):
+        return source.read_bytes()
+    with open(source, "rb") as fh:
+        return fh.read()
+
+
+@contextmanager
+def open_layer(source):
+    """Binär-Stream auf die Layer-Datei (ZIP-Einträge ohne Entpacken)"""
+    if isinstance(source, ZipMember):
+        with zipfile.ZipFile(source.zip_path, "r") as zf, zf.open(source.member) as fh:
+            yield fh
+    else:
+        with open(source, "rb") as fh:
+            yield fh
+
+
+def _zip_members(path, extensions):
+    """ZipMember für alle Einträge mit passender Endung (nur Inhaltsverzeichnis lesen)"""
     files = []
-    tempdir = None
     try:
-        if path.lower().endswith(".zip"):
-            tempdir = tempfile.mkdtemp(prefix="gerber_")
-            with zipfile.ZipFile(path, "r") as zf:
-                zf.extractall(tempdir)
-            for root, _, fnames in os.walk(tempdir):
-                for fn in fnames:
-                    if fn.lower().endswith((
-                        ".gbr", ".ger", ".gtl", ".gbl", ".gto", ".gbo",
-                        ".gts", ".gbs", ".gtp", ".gbp", ".gko", ".gml", ".gdl"
-                    )):
-                        files.append(os.path.join(root, fn))
-        else:
-            files = [path]
+        with zipfile.ZipFile(path, "r") as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                if posixpath.basename(info.filename).lower().endswith(extensions):
+                    files.append(ZipMember(path, info.filename))
     except Exception as e:
         print(f"❌ ZIP Fehler: {e}")
-    return files, tempdir
+    return files
 
 
-def safe_load_layer(path):
-    """Versucht load_layer() mit/ohne file_format, je nach API-Version"""
-    if load_layer is None:
+def collect_gerber_files(path: str):
+    """
+    Sammelt alle Gerber-Dateien aus Einzeldatei oder ZIP.
+    Bei ZIPs wird nur das Inhaltsverzeichnis gelesen -> Liste von ZipMember.
+    """
+    if path.lower().endswith(".zip"):
+        return _zip_members(path, GERBER_EXTENSIONS)
+    return [path]
+
+
+def collect_drill_files(path: str):
+    """Excellon-Bohrdateien aus ZIP (ZipMember) oder eine einzelne .drl-Datei"""
+    if path.lower().endswith(".zip"):
+        return _zip_members(path, DRILL_EXTENSIONS)
+    return [path] if path.lower().endswith(DRILL_EXTENSIONS) else []
+
+
+# --- pcb-tools (optional) ---
+# Nur noch Fallback für Dateien, die der eigene Parser ablehnt; wird erst beim
+# ersten Fallback importiert.
+_PCBTOOLS_MODULES = ("gerber.common", "gerber.rs274x", "gerber.excellon", "gerber.ipc356")
+_pcbtools = None
+_compat_lock = threading.Lock()
+_compat_depth = 0
+
+
+def pcbtools_available():
+    """pcb-tools importieren (einmalig) -> True, falls installiert"""
+    global _pcbtools
+    if _pcbtools is None:
+        try:
+            from gerber.common import loads
+            from gerber.layers import PCBLayer
+            _pcbtools = (loads, PCBLayer)
+        except Exception:
+            _pcbtools = False
+    return bool(_pcbtools)
+
+
+def _open_compat(file, mode="r", *args, **kwargs):
+    """open() ohne den unter Python 3.11 entfernten Modus 'U'"""
+    if isinstance(mode, str) and "U" in mode:
+        mode = mode.replace("U", "") or "r"
+    return builtins.open(file, mode, *args, **kwargs)
+
+
+@contextmanager
+def pcbtools_compat():
+    """
+    pcb-tools öffnet Dateien mit 'rU'. Solange pcb-tools parst, bekommen nur
+    dessen Module ein open() ohne 'U'; builtins.open bleibt unangetastet.
+    """
+    global _compat_depth
+    modules = [importlib.import_module(m) for m in _PCBTOOLS_MODULES]
+    with _compat_lock:
+        if _compat_depth == 0:
+            for m in modules:
+                m.open = _open_compat
+        _compat_depth += 1
+    try:
+        yield
+    finally:
+        with _compat_lock:
+            _compat_depth -= 1
+            if _compat_depth == 0:
+                for m in modules:
+                    m.__dict__.pop("open", None)
+
+
+def _pcbtools_layer(data, source):
+    """Fallback: Layer mit pcb-tools aus dem Speicher parsen"""
+    if not pcbtools_available():
         raise RuntimeError("pcb-tools nicht installiert.")
+    loads, PCBLayer = _pcbtools
+    with stage("gerber.parse.pcbtools", layer=layer_name(source)), pcbtools_compat():
+        return PCBLayer.from_cam(loads(data.decode("utf-8", errors="replace"), layer_name(source)))
+
+
+def safe_load_layer(path):
+    """
+    Layer mit dem eigenen Parser lesen (Stream direkt aus Datei/ZIP).
+    Lehnt der Parser die Datei ab, wird es mit pcb-tools versucht.
+    """
+    try:
+        with stage("gerber.parse", layer=layer_name(path)), open_layer(path) as fh:
+            return parse_gerber(fh, layer_name(path))
+    except GerberError as e:
+        if not pcbtools_available():
+            raise
+        print(f"⚠ {layer_name(path)}: {e}, versuche pcb-tools.")
+        return _pcbtools_layer(read_layer_bytes(path), path)
+
+
+def _load_layer_data(data, source):
+    """Layer aus den bereits gelesenen Bytes parsen (wie safe_load_layer)"""
     try:
-        return load_layer(path)
-    except TypeError:
-        return load_layer(path, file_format='rs274x')
+        with stage("gerber.parse", layer=layer_name(source), bytes=len(data)):
+            return parse_gerber(io.BytesIO(data), layer_name(source))
+    except GerberError as e:
+        if not pcbtools_available():
+            raise
+        print(f"⚠ {layer_name(source)}: {e}, versuche pcb-tools.")
+        return _pcbtools_layer(data, source)
 
 
 def _rectangle_or_obround_from_bbox(prim, unit_scale):
@@ -111,13 +253,13 @@ def _rectangle_or_obround_from_bbox(prim, unit_scale):
     hole_diam = getattr(prim, "hole_diameter", 0) or 0
     if hole_diam > 0:
         hr = (hole_diam * unit_scale) * 0.5
-        hole = sgeom.Point(cx, cy).buffer(hr, resolution=32)
+        hole = sgeom.Point(cx, cy).buffer(hr, resolution=quad_segs(hr))
         pad = pad.difference(hole)
 
     return pad
 
 
-def _prim_to_geom(prim, unit_scale):
+def _prim_to_geom(prim, unit_scale, failures=None):
     polys = []
     ptype = prim.__class__.__name__
 
@@ -129,12 +271,13 @@ def _prim_to_geom(prim, unit_scale):
             (cx, cy) = prim.position if isinstance(prim.position, tuple) else (prim.position.x, prim.position.y)
             cx, cy = cx * unit_scale, cy * unit_scale
             r = (prim.diameter * unit_scale) * 0.5
-            pad = sgeom.Point(cx, cy).buffer(r, resolution=32)
+            pad = sgeom.Point(cx, cy).buffer(r, resolution=quad_segs(r))
 
             # Loch
             hole_d = getattr(prim, "hole_diameter", 0) or 0
             if hole_d > 0:
-                hole = sgeom.Point(cx, cy).buffer((hole_d * unit_scale) * 0.5, resolution=32)
+                hr = (hole_d * unit_scale) * 0.5
+                hole = sgeom.Point(cx, cy).buffer(hr, resolution=quad_segs(hr))
                 pad = pad.difference(hole)
 
             polys.append(pad)
@@ -184,7 +327,7 @@ def _prim_to_geom(prim, unit_scale):
 
             if end_angle < start_angle:
                 end_angle += 360
-            steps = 48
+            steps = arc_segments(r, math.radians(end_angle - start_angle))
             angles = [math.radians(start_angle + (end_angle - start_angle) * i / steps)
                       for i in range(steps + 1)]
             pts = [(cx * unit_scale + r * math.cos(a), cy * unit_scale + r * math.sin(a))
@@ -195,7 +338,7 @@ def _prim_to_geom(prim, unit_scale):
         # --- AMGroup (verschachtelte Prims) ---
         elif ptype == "AMGroup":
             for sub in getattr(prim, "primitives", []):
-                polys.extend(_prim_to_geom(sub, unit_scale))
+                polys.extend(_prim_to_geom(sub, unit_scale, failures))
 
         # --- Outline (nur zur Vorschau – dünn puffern) ---
         elif ptype == "Outline":
@@ -208,57 +351,568 @@ def _prim_to_geom(prim, unit_scale):
                                  (x2 * unit_scale, y2 * unit_scale)))
             if segs:
                 ml = sgeom.MultiLineString(segs)
-                polys.append(ml.buffer(0.05, cap_style=2, join_style=2))  # 0.05 mm Preview
+                polys.append(ml.buffer(OUTLINE_PREVIEW_W, cap_style=2, join_style=2))  # 0.05 mm Preview
 
         # unbekannte Typen: still ignorieren
     except Exception as e:
-        print(f"⚠ Fehler bei Primitive {prim}: {e}")
+        if failures is None:
+            print(f"⚠ Fehler bei Primitive {prim}: {e}")
+        else:
+            failures.add(ptype, e)
 
     return polys
 
 
-def gerber_layer_to_shapely(layer):
-    polys = []
-    unit_scale = 25.4 if getattr(layer, "units", None) == "inch" else 1.0
+def _flatten_prims(prims):
+    """AMGroups auflösen (wie die Rekursion in _prim_to_geom)"""
+    for prim in prims:
+        if prim.__class__.__name__ == "AMGroup":
+            yield from _flatten_prims(getattr(prim, "primitives", []))
+        else:
+            yield prim
 
-    for prim in getattr(layer, "primitives", []):
-        polys.extend(_prim_to_geom(prim, unit_scale))
 
-    if not polys:
-        print("⚠ Keine Geometrien erzeugt in diesem Layer!")
-        return None
+def _bbox_mm(prim, unit_scale):
+    """Bounding Box wie in _rectangle_or_obround_from_bbox (in mm)"""
+    try:
+        minx, miny, maxx, maxy = prim.bounding_box()
+    except Exception:
+        (cx, cy) = prim.position
+        w = getattr(prim, "width", DEFAULT_PAD_SIZE)
+        h = getattr(prim, "height", DEFAULT_PAD_SIZE)
+        minx, maxx = cx - w/2, cx + w/2
+        miny, maxy = cy - h/2, cy + h/2
+    return minx * unit_scale, miny * unit_scale, maxx * unit_scale, maxy * unit_scale
 
-    return sops.unary_union(polys)
 
+def _punch_holes(pads, cx, cy, hole_d):
+    """Löcher für alle Pads mit hole_diameter > 0 in einem Schritt ausstanzen"""
+    mask = hole_d > 0
+    if mask.any():
+        holes = buffer_circles(cx[mask], cy[mask], hole_d[mask] * 0.5)
+        pads[mask] = shapely.difference(pads[mask], holes)
+    return pads
 
-def load_gerber_files(files, selected_names):
-    """Lädt die ausgewählten Gerber-Dateien in eine kombinierte Shapely-Geometrie"""
-    if load_layer is None:
-        print("❌ pcb-tools nicht installiert.")
-        return None
 
+def _prims_to_geoms_batched(prims, unit_scale, failures=None):
+    """
+    Gebündelte Variante von _prim_to_geom für eine ganze Layer.
+
+    Die Primitive werden nach Typ in Koordinaten-Arrays gesammelt und mit
+    den Array-Konstruktoren von Shapely 2 (points/box/linestrings + buffer)
+    in wenigen Aufrufen erzeugt. Seltene Typen (Region, Arc, gedrehte Pads)
+    laufen weiter einzeln über _prim_to_geom. Ergebnis wie _prim_to_geom.
+    failures: trace_utils.Failures für fehlerhafte Primitive (sonst je Zeile).
+    """
+    circles, rects, tracks, outlines = [], [], [], []
+    single = []
+    for prim in _flatten_prims(prims):
+        ptype = prim.__class__.__name__
+        try:
+            if ptype == "Circle":
+                if hasattr(prim, "flashed") and prim.flashed is False:
+                    continue
+                (cx, cy) = prim.position if isinstance(prim.position, tuple) else (prim.position.x, prim.position.y)
+                circles.append((cx * unit_scale, cy * unit_scale,
+                                prim.diameter * unit_scale,
+                                (getattr(prim, "hole_diameter", 0) or 0) * unit_scale))
+            elif ptype in ("Rectangle", "Obround"):
+                if ptype == "Rectangle" and hasattr(prim, "flashed") and prim.flashed is False:
+                    continue
+                if getattr(prim, "rotation", 0):
+                    single.append(prim)
+                    continue
+                rects.append(_bbox_mm(prim, unit_scale) + (
+                    ptype == "Obround", (getattr(prim, "hole_diameter", 0) or 0) * unit_scale))
+            elif ptype in ("Line", "Track"):
+                (x1, y1) = prim.start
+                (x2, y2) = prim.end
+                width = getattr(prim, "width", None)
+                if not width or width <= 0:
+                    width = DEFAULT_TRACE_WIDTH
+                tracks.append((x1 * unit_scale, y1 * unit_scale,
+                               x2 * unit_scale, y2 * unit_scale, width * unit_scale))
+            elif ptype == "Outline":
+                segs = []
+                for sub in getattr(prim, "primitives", []):
+                    if sub.__class__.__name__ in ("Line", "Track"):
+                        (x1, y1) = sub.start
+                        (x2, y2) = sub.end
+                        segs.append((x1 * unit_scale, y1 * unit_scale,
+                                     x2 * unit_scale, y2 * unit_scale))
+                if segs:
+                    outlines.append(segs)
+            else:
+                single.append(prim)
+        except Exception as e:
+            if failures is None:
+                print(f"⚠ Fehler bei Primitive {prim}: {e}")
+            else:
+                failures.add(ptype, e)
+
+    geoms = []
+    if circles:
+        cx, cy, d, hole_d = np.array(circles, dtype=np.float64).T
+        pads = buffer_circles(cx, cy, d * 0.5)
+        geoms.extend(_punch_holes(pads, cx, cy, hole_d))
+    if rects:
+        arr = np.array(rects, dtype=np.float64)
+        minx, miny, maxx, maxy, obround, hole_d = arr.T
+        pads = shapely.box(minx, miny, maxx, maxy)
+        ob = obround.astype(bool)
+        if ob.any():
+            rad = np.minimum(maxx - minx, maxy - miny)[ob] * 0.5
+            pads[ob] = shapely.buffer(pads[ob], rad, cap_style="flat", join_style="mitre")
+        geoms.extend(_punch_holes(pads, (minx + maxx) * 0.5, (miny + maxy) * 0.5, hole_d))
+    if tracks:
+        arr = np.array(tracks, dtype=np.float64)
+        lines = shapely.linestrings(arr[:, :4].reshape(-1, 2, 2))
+        geoms.extend(shapely.buffer(lines, arr[:, 4] * 0.5, cap_style="flat", join_style="mitre"))
+    if outlines:
+        arr = np.array([seg for segs in outlines for seg in segs], dtype=np.float64)
+        idx = np.repeat(np.arange(len(outlines)), [len(segs) for segs in outlines])
+        mls = shapely.multilinestrings(shapely.linestrings(arr.reshape(-1, 2, 2)), indices=idx)
+        geoms.extend(shapely.buffer(mls, OUTLINE_PREVIEW_W, cap_style="flat", join_style="mitre"))
+    for prim in single:
+        geoms.extend(_prim_to_geom(prim, unit_scale, failures))
+    return geoms
+
+
+def _disk(r, tolerance):
+    return sgeom.Point(0, 0).buffer(r, quad_segs=quad_segs(r, tolerance))
+
+
+def _macro_primitive(code, v, tolerance):
+    """Ein Makro-Primitiv (Dateieinheiten) -> (belichtet, Polygon)"""
+    if code == 1:  # Kreis: exp, d, x, y[, rot]
+        geom = affinity.translate(_disk(v[1] * 0.5, tolerance), v[2], v[3])
+        rot = v[4] if len(v) > 4 else 0.0
+    elif code in (2, 20):  # Vektorlinie: exp, w, x1, y1, x2, y2, rot
+        line = sgeom.LineString([(v[2], v[3]), (v[4], v[5])])
+        geom = line.buffer(v[1] * 0.5, cap_style="flat")
+        rot = v[6]
+    elif code == 21:  # Mittellinie: exp, w, h, x, y, rot
+        geom = sgeom.box(v[3] - v[1] * 0.5, v[4] - v[2] * 0.5, v[3] + v[1] * 0.5, v[4] + v[2] * 0.5)
+        rot = v[5]
+    elif code == 22:  # untere linke Ecke (veraltet): exp, w, h, x, y, rot
+        geom = sgeom.box(v[3], v[4], v[3] + v[1], v[4] + v[2])
+        rot = v[5]
+    elif code == 4:  # Umriss: exp, n, x0, y0, ..., xn, yn, rot
+        n = int(v[1])
+        geom = shapely.make_valid(sgeom.Polygon(np.reshape(v[2:4 + 2 * n], (-1, 2))))
+        rot = v[4 + 2 * n]
+    elif code == 5:  # Vieleck: exp, n, x, y, d, rot
+        n = int(v[1])
+        a = np.radians(360.0 * np.arange(n) / n)
+        geom = sgeom.Polygon(np.c_[v[2] + v[4] * 0.5 * np.cos(a), v[3] + v[4] * 0.5 * np.sin(a)])
+        rot = v[5]
+    elif code == 7:  # Thermal: x, y, d_außen, d_innen, Spalt, rot
+        ring = _disk(v[2] * 0.5, tolerance).difference(_disk(v[3] * 0.5, tolerance))
+        gap = v[4] * 0.5
+        cross = sgeom.box(-v[2], -gap, v[2], gap).union(sgeom.box(-gap, -v[2], gap, v[2]))
+        geom = affinity.translate(ring.difference(cross), v[0], v[1])
+        return True, affinity.rotate(geom, v[5], origin=(0, 0)) if v[5] else geom
+    else:
+        raise ValueError(f"Makro-Primitiv {code} nicht unterstützt")
+    if rot:
+        geom = affinity.rotate(geom, rot, origin=(0, 0))
+    return v[0] != 0, geom
+
+
+def aperture_template(ap, tolerance=CHORD_TOLERANCE_MM):
+    """Blendenform (gerber_parser.Aperture) um (0, 0) als Polygon in mm"""
+    tol = tolerance / ap.scale
+    p = ap.params
+    hole = 0.0
+    if ap.shape == "macro":
+        geom = sgeom.Polygon()
+        for code, values in p:
+            exposed, prim = _macro_primitive(code, values, tol)
+            geom = geom.union(prim) if exposed else geom.difference(prim)
+    elif ap.shape == "C":
+        geom = _disk(p[0] * 0.5, tol) if p and p[0] > 0 else sgeom.Polygon()
+        hole = p[1] if len(p) > 1 else 0.0
+    elif ap.shape == "R":
+        geom = sgeom.box(-p[0] * 0.5, -p[1] * 0.5, p[0] * 0.5, p[1] * 0.5)
+        hole = p[2] if len(p) > 2 else 0.0
+    elif ap.shape == "O":
+        r = min(p[0], p[1]) * 0.5
+        dx, dy = p[0] * 0.5 - r, p[1] * 0.5 - r
+        geom = sgeom.LineString([(-dx, -dy), (dx, dy)]).buffer(r, quad_segs=quad_segs(r, tol))
+        hole = p[2] if len(p) > 2 else 0.0
+    else:  # "P": Außendurchmesser, Ecken[, Drehung[, Loch]]
+        n = int(p[1])
+        a = np.radians((p[2] if len(p) > 2 else 0.0) + 360.0 * np.arange(n) / n)
+        geom = sgeom.Polygon(np.c_[p[0] * 0.5 * np.cos(a), p[0] * 0.5 * np.sin(a)])
+        hole = p[3] if len(p) > 3 else 0.0
+    if hole > 0:
+        geom = geom.difference(_disk(hole * 0.5, tol))
+    if ap.scale != 1.0:
+        geom = affinity.scale(geom, ap.scale, ap.scale, origin=(0, 0))
+    return geom
+
+
+def _polygonal(geoms):
+    """Nur die Polygon-Teile (make_valid kann Linien/Punkte liefern)"""
+    parts = shapely.get_parts(np.asarray(geoms, dtype=object))
+    return parts[(shapely.get_type_id(parts) == 3) & ~shapely.is_empty(parts)]
+
+
+def stamp(template, xy):
+    """Kopien von template (um 0, 0) an allen Punkten xy (N, 2) -> Polygon-Array"""
+    n = len(xy)
+    out = []
+    for poly in _polygonal([template]):
+        rings = []
+        for ring in (poly.exterior, *poly.interiors):
+            c = shapely.get_coordinates(ring)
+            coords = (c[None, :, :] + xy[:, None, :]).reshape(-1, 2)
+            rings.append(shapely.linearrings(coords, indices=np.repeat(np.arange(n), len(c))))
+        holes = np.stack(rings[1:], axis=1) if len(rings) > 1 else None
+        out.append(shapely.polygons(rings[0], holes=holes))
+    return np.concatenate(out) if out else np.empty(0, dtype=object)
+
+
+def _polylines(xy, key):
+    """
+    Aufeinanderfolgende Segmente (N, 4) mit gleichem key, deren Anfang am
+    Ende des Vorgängers liegt, zu Linienzügen verbinden.
+    -> (LineStrings, Index des ersten Segments je Linienzug)
+    """
+    start = np.ones(len(xy), dtype=bool)
+    start[1:] = (key[1:] != key[:-1]) | np.any(xy[1:, :2] != xy[:-1, 2:], axis=1)
+    path = np.cumsum(start) - 1
+    last = np.flatnonzero(np.r_[start[1:], True])
+    coords = np.insert(xy[:, :2], last + 1, xy[last, 2:], axis=0)
+    ids = np.insert(path, last + 1, path[last])
+    return shapely.linestrings(coords, indices=ids), np.flatnonzero(start)
+
+
+def _stroke_tracks(xy, aperture, width, templates):
+    """
+    Tracks ziehen: runde Blenden als gepufferte Linienzüge (runde Enden und
+    Ecken), andere Blenden als konvexe Hülle der Blende an beiden Enden.
+    """
     geoms = []
-    for f in files:
-        if Path(f).name not in selected_names:
+    width = np.where(aperture < 0, DEFAULT_TRACE_WIDTH, width)
+    round_ = width > 0
+    if round_.any():
+        lines, first = _polylines(xy[round_], aperture[round_])
+        r = width[round_][first] * 0.5
+        q = quad_segs(r)
+        for qv in np.unique(q):
+            m = q == qv
+            geoms.append(shapely.buffer(lines[m], r[m], quad_segs=int(qv)))
+    for ap in np.unique(aperture[~round_]):
+        hull = templates.get(int(ap))
+        if hull is None or hull.is_empty:
             continue
+        c = shapely.get_coordinates(hull.convex_hull)
+        seg = xy[~round_ & (aperture == ap)]
+        pts = np.concatenate([seg[:, None, :2] + c, seg[:, None, 2:] + c], axis=1)
+        ids = np.repeat(np.arange(len(seg)), 2 * len(c))
+        geoms.append(shapely.convex_hull(shapely.multipoints(pts.reshape(-1, 2), indices=ids)))
+    return geoms
+
+
+def _regions(xy, offsets):
+    """Konturen (Punkte + Startindizes) -> gültige Polygone"""
+    counts = np.diff(offsets)
+    ok = counts >= 3
+    if not ok.any():
+        return []
+    keep = np.repeat(ok, counts)
+    ids = np.repeat(np.arange(ok.sum()), counts[ok])
+    polys = shapely.polygons(shapely.linearrings(xy[keep], indices=ids))
+    bad = ~shapely.is_valid(polys)
+    if bad.any():
+        polys[bad] = shapely.make_valid(polys[bad])
+    return [polys]
+
+
+def _native_levels(layer):
+    """GerberLayer -> [(dunkel, Polygon-Array)] je Polaritätsebene"""
+    templates = {}
+    failures = Failures("Blenden")
+    for num, ap in layer.apertures.items():
         try:
-            layer = safe_load_layer(f)
-            geom = gerber_layer_to_shapely(layer)
-            if geom:
-                geoms.append(geom)
+            templates[num] = aperture_template(ap)
         except Exception as e:
-            print(f"⚠ Fehler {f}: {e}")
+            failures.add(ap.shape, e)
+    failures.report(layer.name)
+
+    levels = []
+    for lvl, dark in enumerate(layer.levels):
+        geoms = []
+        f = layer.flash_level == lvl
+        for ap in np.unique(layer.flash_aperture[f]):
+            if int(ap) in templates:
+                geoms.append(stamp(templates[int(ap)], layer.flash_xy[f & (layer.flash_aperture == ap)]))
+        t = layer.track_level == lvl
+        if t.any():
+            geoms.extend(_stroke_tracks(layer.track_xy[t], layer.track_aperture[t],
+                                        layer.track_width[t], templates))
+        r = np.flatnonzero(layer.region_level == lvl)
+        if r.size:
+            # Konturen einer Ebene liegen nicht zwingend zusammenhängend
+            starts, ends = layer.region_offsets[r], layer.region_offsets[r + 1]
+            idx = np.concatenate([np.arange(a, b) for a, b in zip(starts, ends)])
+            offsets = np.r_[0, np.cumsum(ends - starts)]
+            geoms.extend(_regions(layer.region_xy[idx], offsets))
+        if geoms:
+            levels.append((dark, _polygonal(np.concatenate(geoms))))
+    return levels
+
+
+def _native_to_shapely(layer):
+    """Ebenen nacheinander anwenden: dunkel vereinigen, klar abziehen"""
+    geom, pending = None, []
+    for dark, polys in _native_levels(layer):
+        if dark:
+            pending.append(polys)
+            continue
+        if geom is not None:
+            pending.append([geom])
+        if pending:
+            geom = tiled_union(np.concatenate(pending)).difference(tiled_union(polys))
+            pending = []
+    if pending:
+        if geom is not None:
+            pending.append([geom])
+        geom = tiled_union(np.concatenate(pending))
+    if geom is None or geom.is_empty:
+        return None
+    return geom
+
+
+def _primitive_counts(layer):
+    """Primitive je Typ (für die Aufzeichnung)"""
+    if isinstance(layer, GerberLayer):
+        return {"flashes": len(layer.flash_aperture), "tracks": len(layer.track_aperture),
+                "regions": len(layer.region_level)}
+    counts = {}
+    for prim in _flatten_prims(getattr(layer, "primitives", [])):
+        ptype = prim.__class__.__name__
+        counts[ptype] = counts.get(ptype, 0) + 1
+    return counts
+
+
+def gerber_layer_to_shapely(layer):
+    name = getattr(layer, "name", "") or ""
+    with stage("gerber.convert", layer=name) as s:
+        if s:
+            s["primitives"] = _primitive_counts(layer)
+        if isinstance(layer, GerberLayer):
+            geom = _native_to_shapely(layer)
+        else:
+            # pcb-tools-Layer (Fallback)
+            unit_scale = 25.4 if getattr(layer, "units", None) == "inch" else 1.0
+            failures = Failures("Primitive")
+            polys = _prims_to_geoms_batched(getattr(layer, "primitives", []), unit_scale, failures)
+            failures.report(name)
+            geom = tiled_union(polys) if polys else None
+        if s and geom is not None:
+            s["vertices"] = count_vertices(geom)
+
+    if geom is None:
+        print("⚠ Keine Geometrien erzeugt in diesem Layer!")
+    return geom
+
+
+def load_drill_file(source):
+    """Excellon-Datei (Pfad oder ZipMember) als Stream parsen -> DrillLayer"""
+    with open_layer(source) as fh:
+        return parse_excellon(fh, layer_name(source))
+
 
+def drill_holes(layers, tolerance=CHORD_TOLERANCE_MM):
+    """
+    Alle Bohrungen und Langlöcher der DrillLayer als eine Geometrie.
+    Kreise werden je Durchmesser auf einmal gestanzt, Langlöcher gebündelt
+    gepuffert; vereinigt wird nur einmal am Ende.
+    """
+    layers = list(layers)
+    if not layers:
+        return None
+    xy = np.concatenate([l.hole_xy for l in layers])
+    d = np.concatenate([l.hole_diameter for l in layers])
+    slots = np.concatenate([l.slot_xy for l in layers])
+    slot_d = np.concatenate([l.slot_diameter for l in layers])
+    with stage("drill.holes", holes=len(d), slots=len(slot_d)):
+        return _drill_union(xy, d, slots, slot_d, tolerance)
+
+
+def _drill_union(xy, d, slots, slot_d, tolerance):
+    """Kreise je Durchmesser stanzen, Langlöcher puffern, einmal vereinigen"""
+    geoms = []
+    for dv in np.unique(d[d > 0]):
+        geoms.append(stamp(_disk(dv * 0.5, tolerance), xy[d == dv]))
+    if len(slots):
+        lines = shapely.linestrings(slots.reshape(-1, 2, 2))
+        r = slot_d * 0.5
+        q = quad_segs(r, tolerance)
+        for qv in np.unique(q):
+            m = q == qv
+            geoms.append(shapely.buffer(lines[m], r[m], quad_segs=int(qv)))
     if not geoms:
         return None
+    return tiled_union(np.concatenate(geoms))
 
-    combined = sops.unary_union(geoms)
 
-    # Auf (0,0) normalisieren und spiegeln wie zuvor
-    minx, miny, _, _ = combined.bounds
-    combined = affinity.translate(combined, xoff=-minx, yoff=-miny)
-    combined = affinity.scale(combined, xfact=-1, yfact=-1, origin=(0, 0))
-    minx, miny, _, _ = combined.bounds
-    combined = affinity.translate(combined, xoff=-minx, yoff=-miny)
+def load_drill_holes(sources):
+    """Bohrdateien laden und zu einer Loch-Geometrie vereinigen (None = keine)"""
+    layers = []
+    for src in sources:
+        try:
+            with stage("drill.parse", file=layer_name(src)):
+                layers.append(load_drill_file(src))
+        except Exception as e:
+            print(f"⚠ Fehler {src}: {e}")
+    return drill_holes(layers)
 
-    return combined
\ No newline at end of file
+
+def conversion_params():
+    """Alle Parameter, die die Layer-Geometrie beeinflussen (Teil des Cache-Schlüssels)"""
+    return (GEOMETRY_VERSION, DEFAULT_TRACE_WIDTH, DEFAULT_PAD_SIZE,
+            CHORD_TOLERANCE_MM, OUTLINE_PREVIEW_W)
+
+
+def load_layer_geometry(path, use_cache=True):
+    """
+    Einzelnen Layer laden und vereinigen. Mit Cache wird das Parsen bei
+    unverändertem Dateiinhalt komplett übersprungen.
+    """
+    with stage("gerber.layer", layer=layer_name(path)) as s:
+        data = read_layer_bytes(path)
+        key = None
+        if use_cache:
+            key = gerber_cache.cache_key(data, conversion_params())
+            geom = gerber_cache.get(key)
+            s["cache"] = "miss" if geom is None else "hit"
+            if geom is not None:
+                return None if geom.is_empty else geom
+
+        geom = gerber_layer_to_shapely(_load_layer_data(data, path))
+        if key is not None:
+            gerber_cache.put(key, geom)
+        return geom
+
+
+def _load_layer_wkb(path, use_cache):
+    """Worker für den Prozess-Pool: Layer-Geometrie als WKB + Cache-Zähler"""
+    before = dict(gerber_cache.stats)
+    try:
+        geom = load_layer_geometry(path, use_cache)
+        wkb, error = (shapely.to_wkb(geom) if geom else None), None
+    except Exception as e:
+        wkb, error = None, str(e)
+    delta = {k: v - before[k] for k, v in gerber_cache.stats.items()}
+    return wkb, error, delta
+
+
+def _report(progress, stage, done=0, total=0):
+    if progress is not None:
+        progress(stage, done, total)
+
+
+def _pool_context():
+    """
+    Startmethode für den Layer-Pool: nie fork, weil der Aufrufer (GUI-Task,
+    Batch-Thread) mehrere Threads hat und ein geforktes Kind gehaltene Locks
+    erben kann. forkserver wo vorhanden, sonst spawn.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _load_layers_parallel(paths, use_cache, workers, progress=None):
+    """Layer im Prozess-Pool laden; bei Pool-Problemen None (-> seriell)"""
+    results = [None] * len(paths)
+    pool = None
+    try:
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context())
+        futures = {pool.submit(_load_layer_wkb, p, use_cache): i for i, p in enumerate(paths)}
+        for done, fut in enumerate(as_completed(futures), 1):
+            results[futures[fut]] = fut.result()
+            _report(progress, "Layer laden", done, len(paths))
+    except (BrokenProcessPool, OSError, PicklingError) as e:
+        print(f"⚠ Paralleles Laden fehlgeschlagen ({e}), lade seriell.")
+        return None
+    finally:
+        # bei Abbruch (Exception aus progress) nicht auf laufende Layer warten
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    geoms = []
+    for path, (wkb, error, delta) in zip(paths, results):
+        for k, v in delta.items():
+            gerber_cache.stats[k] += v
+        if error:
+            print(f"⚠ Fehler {path}: {error}")
+        elif wkb:
+            geoms.append(shapely.from_wkb(wkb))
+    return geoms
+
+
+def load_gerber_files(files, selected_names, use_cache=True, workers=None, progress=None,
+                      drill_files=()):
+    """
+    Lädt die ausgewählten Gerber-Dateien in eine kombinierte Shapely-Geometrie.
+
+    Die Layer sind unabhängig und werden bei mehreren Dateien parallel in
+    einem Prozess-Pool geparst und vereinigt (workers=None -> CPU-Anzahl,
+    workers=1 -> seriell). Im Elternprozess bleiben nur die Vereinigung
+    über alle Layer und Spiegeln/Normieren.
+    drill_files: Excellon-Dateien (siehe collect_drill_files), deren
+    Bohrungen in einem Schritt aus der Vereinigung ausgestanzt werden.
+    progress(stage, done, total) wird pro Layer und Stufe aufgerufen; eine
+    Exception daraus bricht das Laden ab.
+    """
+    paths = [f for f in files if layer_name(f) in selected_names]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(paths))
+
+    _report(progress, "Layer laden", 0, len(paths))
+    cache_before = dict(gerber_cache.stats)
+    with stage("gerber.load", layers=len(paths), workers=workers, drills=len(drill_files)) as s:
+        geoms = None
+        with stage("gerber.layers"):
+            if workers > 1:
+                geoms = _load_layers_parallel(paths, use_cache, workers, progress)
+            if geoms is None:
+                geoms = []
+                for done, f in enumerate(paths, 1):
+                    try:
+                        geom = load_layer_geometry(f, use_cache)
+                        if geom:
+                            geoms.append(geom)
+                    except Exception as e:
+                        print(f"⚠ Fehler {f}: {e}")
+                    _report(progress, "Layer laden", done, len(paths))
+
+        if not geoms:
+            return None
+
+        _report(progress, "Vereinigen")
+        combined = tiled_union(geoms)
+        if drill_files:
+            _report(progress, "Bohrungen")
+            with stage("gerber.drills"):
+                holes = load_drill_holes(drill_files)
+                if holes is not None:
+                    combined = combined.difference(holes)
+        _report(progress, "Normieren")
+
+        # Auf (0,0) normalisieren und spiegeln wie zuvor
+        with stage("gerber.normalize"):
+            minx, miny, _, _ = combined.bounds
+            combined = affinity.translate(combined, xoff=-minx, yoff=-miny)
+            combined = affinity.scale(combined, xfact=-1, yfact=-1, origin=(0, 0))
+            minx, miny, _, _ = combined.bounds
+            combined = affinity.translate(combined, xoff=-minx, yoff=-miny)
+
+        if s:
+            s["vertices"] = count_vertices(combined)
+            s["cache"] = {k: v - cache_before[k] for k, v in gerber_cache.stats.items()}
+        return combined
\ No newline at end of file
@@ -2,28 +2,31 @@ from PySide6.QtWidgets import (
     QDialog, QDialogButtonBox, QVBoxLayout as QVLayout, QCheckBox
 )
 
+from .gerber_utils import default_layer_selected
+
 
 class DynamicLayerDialog(QDialog):
     """Dialog mit dynamischen Checkboxen für Gerber-Layer-Dateien"""
-    def __init__(self, layer_display_names, parent=None):
+    def __init__(self, layer_display_names, parent=None, drill_names=()):
         super().__init__(parent)
         self.setWindowTitle("Gerber-Layer auswählen")
         layout = QVLayout(self)
         self.checks = []
 
-        # Standardauswahl (Top/Bottom, Copper, Mask, Silk)
-        def default_on(name: str) -> bool:
-            low = name.lower()
-            keys = ("top", "bottom", "copper", "cu", "mask",
-                    "soldermask", "solder_mask", "silk", "legend")
-            return any(k in low for k in keys)
-
         for name in layer_display_names:
             cb = QCheckBox(name)
-            cb.setChecked(default_on(name))
+            cb.setChecked(default_layer_selected(name))
             layout.addWidget(cb)
             self.checks.append(cb)
 
+        # Bohrdateien nicht einzeln, sondern gemeinsam ausstanzen
+        self.drill_check = None
+        if drill_names:
+            self.drill_check = QCheckBox(f"Bohrungen ausstanzen ({len(drill_names)} Dateien)")
+            self.drill_check.setToolTip("\n".join(drill_names))
+            self.drill_check.setChecked(True)
+            layout.addWidget(self.drill_check)
+
         btns = QDialogButtonBox.Ok | QDialogButtonBox.Cancel
         buttonBox = QDialogButtonBox(btns)
         buttonBox.accepted.connect(self.accept)
@@ -31,4 +34,7 @@ class DynamicLayerDialog(QDialog):
         layout.addWidget(buttonBox)
 
     def selected_names(self):
-        return [cb.text() for cb in self.checks if cb.isChecked()]
\ No newline at end of file
+        return [cb.text() for cb in self.checks if cb.isChecked()]
+
+    def punch_drills(self):
+        return self.drill_check is not None and self.drill_check.isChecked()
\ No newline at end of file
@@ -2,21 +2,27 @@ from PySide6.QtWidgets import (
     QMainWindow, QFileDialog, QMenu,
     QGraphicsView, QGraphicsScene, QGraphicsRectItem,
     QVBoxLayout, QWidget, QHBoxLayout, QLabel, QLineEdit, QGraphicsPathItem,
-    QToolBar, QDialog
+    QToolBar, QDialog, QProgressBar, QPushButton, QInputDialog
 )
-from PySide6.QtCore import Qt, QRectF, QPointF, QTimer
-from PySide6.QtGui import QPen, QColor, QIcon, QAction, QKeySequence
+from PySide6.QtCore import Qt, QRectF, QPointF, QTimer, QEvent
+from PySide6.QtGui import QPen, QColor, QIcon, QAction, QKeySequence, QTransform
 
-from shapely import affinity
+import math
 
-from constants import PANEL_MM_W, PANEL_MM_H
-from svg_utils import svg_to_polygon, shapely_to_qpath
-from mesh_utils import build_and_transform_mesh
+from backends import lazy, load_times
+from constants import PANEL_MM_W, PANEL_MM_H, CHORD_TOLERANCE_MM, PREVIEW_TOLERANCE_PX
+from geom_utils import affine_matrix, affine_params, affine_scale, transform_bounds
 
-from .layer_dialog import DynamicLayerDialog
-from .gerber_utils import collect_gerber_files, load_gerber_files
+from . import worker
 
-from pathlib import Path
+# Backends erst bei Bedarf laden (schneller Start, SVG-Import ohne trimesh usw.)
+shapely = lazy("shapely")
+affinity = lazy("shapely.affinity")
+svg_utils = lazy("svg_utils")
+mesh_utils = lazy("mesh_utils")
+nesting = lazy("nesting")
+gerber_utils = lazy("gui.gerber_utils")
+layer_dialog = lazy("gui.layer_dialog")
 
 class BrassEtcherGUI(QMainWindow):
     def __init__(self):
@@ -61,6 +67,7 @@ class BrassEtcherGUI(QMainWindow):
         act_mirror_v = QAction(QIcon("icons/mirror_v.svg"), "Vertikal spiegeln (V)", self)
         act_rotate_90 = QAction(QIcon("icons/rotate.svg"), "90° drehen (R)", self)
         act_center = QAction(QIcon("icons/center.svg"), "Zentrieren (Z)", self)
+        act_nest = QAction("Verteilen… (N)", self)
 
         # Menü für Import
         import_menu = QMenu()
@@ -80,6 +87,7 @@ class BrassEtcherGUI(QMainWindow):
         tb.addAction(act_rotate_90)
         tb.addSeparator()
         tb.addAction(act_center)
+        tb.addAction(act_nest)
 
         # Shortcuts
         act_save.setShortcut(QKeySequence("Ctrl+S"))
@@ -87,18 +95,53 @@ class BrassEtcherGUI(QMainWindow):
         act_mirror_v.setShortcut(QKeySequence("V"))
         act_rotate_90.setShortcut(QKeySequence("R"))
         act_center.setShortcut(QKeySequence("Z"))
+        act_nest.setShortcut(QKeySequence("N"))
+
+        # Debug-Anzeige (nur per Shortcut, nicht in der Toolbar)
+        act_debug = QAction("Debug-Anzeige (F12)", self)
+        act_debug.setCheckable(True)
+        act_debug.setShortcut(QKeySequence("F12"))
+        act_debug.toggled.connect(self.set_debug_overlay)
+        self.addAction(act_debug)
+
+        # Fortschritt (Import/Export im Hintergrund)
+        self.progress_label = QLabel()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.cancel_button = QPushButton("Abbrechen")
+        self.cancel_button.clicked.connect(self.cancel_tasks)
+        for w in (self.progress_label, self.progress_bar, self.cancel_button):
+            self.statusBar().addPermanentWidget(w)
+            w.hide()
 
         # State
-        self.motif_geom = None
-        self.motif_qpath = None
+        self.motif_geom = None   # importierte Geometrie, wird nie überschrieben
+        self.motif_matrix = affine_matrix()  # Spiegeln/Drehen/Skalieren, erst beim Export angewandt
+        self.motif_qpath = None  # Anzeige-Pfad (vereinfacht), Export nutzt motif_geom + motif_matrix
+        self._motif_lod = {}     # Detailstufe -> QPainterPath
         self.motif_item: QGraphicsPathItem | None = None
         self.panel_item = None
         self.rohteil_item = None
+        self._tasks = {}     # "import"/"export" -> laufender worker.Task
+        self._stale = set()  # abgebrochene Tasks, bis sie sich zurückmelden
+        self.mesh_cache = None  # MotifMeshCache, beim ersten Export angelegt
 
-        # Timer
+        # Refits zusammenfassen: höchstens einer pro Frame
         self._refit_timer = QTimer(self)
         self._refit_timer.setSingleShot(True)
         self._refit_timer.setInterval(16)
+        self._refit_timer.timeout.connect(self.refit_view)
+
+        # Zähler für die Debug-Anzeige
+        self._stats = {"refits": 0, "repaints": 0}
+        self.debug_label = QLabel(self.view)
+        self.debug_label.setStyleSheet("background: rgba(255, 255, 255, 200); padding: 2px;")
+        self.debug_label.move(4, 4)
+        self.debug_label.hide()
+        self._stats_timer = QTimer(self)
+        self._stats_timer.setInterval(1000)
+        self._stats_timer.timeout.connect(self.update_debug_overlay)
+        self.view.viewport().installEventFilter(self)
 
         # Events
         act_save.triggered.connect(self.save_dialog)
@@ -106,24 +149,19 @@ class BrassEtcherGUI(QMainWindow):
         act_mirror_v.triggered.connect(self.mirror_vertical)
         act_rotate_90.triggered.connect(self.rotate_90)
         act_center.triggered.connect(self.center_svg)
+        act_nest.triggered.connect(self.nest_copies)
 
         self.width_edit.editingFinished.connect(self.update_display)
         self.height_edit.editingFinished.connect(self.update_display)
         self.svg_width_edit.editingFinished.connect(self.rescale_svg_only)
         self.scene.changed.connect(self.schedule_refit)
 
-        self.update_display()
+        self.build_scene()
         QTimer.singleShot(0, self.refit_view)
 
     # ===== Anzeige =====
-    def update_display(self):
-        last_pos = QPointF(0, 0)
-        if self.motif_item:
-            last_pos = self.motif_item.pos()
-
-        self.scene.clear()
-        self.motif_item = None
-
+    def build_scene(self):
+        """Panel und Rohling einmalig anlegen; danach nur noch in-place ändern"""
         panel_rect = QGraphicsRectItem(QRectF(0, 0, PANEL_MM_W, PANEL_MM_H))
         panel_rect.setBrush(QColor(220, 220, 220))
         panel_rect.setPen(QPen(Qt.black))
@@ -131,51 +169,155 @@ class BrassEtcherGUI(QMainWindow):
         self.scene.addItem(panel_rect)
         self.panel_item = panel_rect
 
-        try:
-            w = float(self.width_edit.text())
-            h = float(self.height_edit.text())
-        except ValueError:
-            w, h = 50, 30
-        brass = QGraphicsRectItem(QRectF(0, 0, w, h))
+        brass = QGraphicsRectItem()
         brass.setBrush(QColor(255, 230, 200))
         brass.setPen(QPen(QColor("red")))
         brass.setZValue(-1)
         self.scene.addItem(brass)
         self.rohteil_item = brass
+        self.update_display()
 
-        if self.motif_qpath:
-            item = QGraphicsPathItem(self.motif_qpath)
-            item.setPen(QPen(QColor("blue"), 0))
-            item.setBrush(QColor(100, 100, 255, 90))
-            item.setZValue(5)
-            item.setFlags(QGraphicsPathItem.ItemIsMovable | QGraphicsPathItem.ItemIsSelectable)
-            self.scene.addItem(item)
-            item.setPos(last_pos)
-            self.motif_item = item
-
-        self.refit_view()
+    def update_display(self):
+        try:
+            w = float(self.width_edit.text())
+            h = float(self.height_edit.text())
+        except ValueError:
+            w, h = 50, 30
+        self.rohteil_item.setRect(QRectF(0, 0, w, h))
+        self.schedule_refit()
 
     def refit_view(self):
         if not self.panel_item:
             return
+        self._stats["refits"] += 1
         rect = self.panel_item.rect()
         expanded = rect.adjusted(-10, -10, 10, 10)
         self.scene.setSceneRect(expanded)
         self.view.fitInView(expanded, Qt.KeepAspectRatio)
         self.view.centerOn(rect.center())
+        self.update_motif_lod()
+
+    def preview_path(self):
+        """
+        Anzeige-Pfad des Motivs passend zum aktuellen View-Maßstab: die
+        Geometrie wird auf PREVIEW_TOLERANCE_PX Bildschirmpixel vereinfacht.
+        Stufen sind Zweierpotenzen (in Einheiten von motif_geom) und werden
+        bis zur nächsten Geometrieänderung zwischengespeichert.
+        """
+        scale = (abs(self.view.transform().m11()) or 1.0) * affine_scale(self.motif_matrix)
+        tol = PREVIEW_TOLERANCE_PX / scale
+        # feiner als die Import-Toleranz bringt die Vereinfachung nichts
+        level = math.floor(math.log2(tol)) if tol > CHORD_TOLERANCE_MM else None
+        path = self._motif_lod.get(level)
+        if path is None:
+            geom = self.motif_geom
+            if level is not None:
+                geom = shapely.simplify(geom, 2.0 ** level, preserve_topology=True)
+            path = svg_utils.shapely_to_qpath(geom)
+            self._motif_lod[level] = path
+        return path
+
+    def update_motif_lod(self):
+        if not self.motif_item or not self.motif_geom:
+            return
+        path = self.preview_path()
+        if path is not self.motif_qpath:
+            self.motif_qpath = path
+            self.motif_item.setPath(path)
 
     def schedule_refit(self, *args):
-        self._refit_timer.stop()
-        self._refit_timer.timeout.connect(self.refit_view)
-        self._refit_timer.start()
+        if not self._refit_timer.isActive():
+            self._refit_timer.start()
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        self.refit_view()
+        self.schedule_refit()
 
     def showEvent(self, event):
         super().showEvent(event)
-        self.refit_view()
+        self.schedule_refit()
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            self._stats["repaints"] += 1
+        return super().eventFilter(obj, event)
+
+    def set_debug_overlay(self, on):
+        self.debug_label.setVisible(on)
+        if on:
+            self._stats_timer.start()
+            self.update_debug_overlay()
+        else:
+            self._stats_timer.stop()
+
+    def update_debug_overlay(self):
+        """Refits und Repaints der letzten Sekunde anzeigen, Zähler zurücksetzen"""
+        text = f"Refits/s: {self._stats['refits']}  Repaints/s: {self._stats['repaints']}"
+        if load_times:
+            text += "\nGeladen: " + ", ".join(
+                f"{name} {t * 1000:.0f} ms" for name, t in load_times.items())
+        self.debug_label.setText(text)
+        self.debug_label.adjustSize()
+        self._stats = {"refits": 0, "repaints": 0}
+
+    # ===== Hintergrund-Tasks =====
+    def run_task(self, kind, fn, on_done):
+        """
+        fn(progress) im Thread-Pool starten. Ein noch laufender Task gleicher
+        Art wird abgebrochen, sein Ergebnis verworfen.
+        """
+        old = self._tasks.get(kind)
+        if old:
+            old.cancel()
+            self._stale.add(old)
+        task = worker.Task(kind, fn)
+        task.on_done = on_done
+        task.signals.progress.connect(self._task_progress)
+        task.signals.finished.connect(self._task_finished)
+        task.signals.failed.connect(self._task_failed)
+        task.signals.cancelled.connect(self._task_cancelled)
+        self._tasks[kind] = task
+        self._task_progress(task, "Start", 0, 0)
+        worker.start(task)
+
+    def cancel_tasks(self):
+        for task in self._tasks.values():
+            task.cancel()
+
+    def _is_current(self, task):
+        return self._tasks.get(task.kind) is task
+
+    def _task_done(self, task):
+        """True, wenn task noch aktuell war (sonst Ergebnis verwerfen)"""
+        if not self._is_current(task):
+            self._stale.discard(task)
+            return False
+        del self._tasks[task.kind]
+        if not self._tasks:
+            for w in (self.progress_label, self.progress_bar, self.cancel_button):
+                w.hide()
+        return True
+
+    def _task_progress(self, task, stage, done, total):
+        if not self._is_current(task) or task.cancelled:
+            return
+        self.progress_label.setText(f"{stage} {done}/{total}" if total else stage)
+        self.progress_bar.setRange(0, total)  # total = 0 -> Laufbalken
+        self.progress_bar.setValue(done)
+        for w in (self.progress_label, self.progress_bar, self.cancel_button):
+            w.show()
+
+    def _task_finished(self, task, result):
+        if self._task_done(task):
+            task.on_done(result)
+
+    def _task_failed(self, task, error):
+        if self._task_done(task):
+            print(f"❌ Fehlgeschlagen: {error}")
+
+    def _task_cancelled(self, task):
+        if self._task_done(task):
+            print("❌ Abbruch.")
 
     # ===== Import =====
     def load_svg(self):
@@ -186,43 +328,62 @@ class BrassEtcherGUI(QMainWindow):
             target_w = float(self.svg_width_edit.text())
         except ValueError:
             target_w = 40
-        geom = svg_to_polygon(path, target_width_mm=target_w)
-        if not geom or geom.is_empty:
-            print("⚠ Keine gültige Geometrie im SVG.")
-            return
-        geom = affinity.scale(geom, xfact=-1, yfact=-1, origin=(0, 0))
-        minx, miny, _, _ = geom.bounds
-        geom = affinity.translate(geom, xoff=-minx, yoff=-miny)
-        self.motif_geom = geom
-        self.update_motif_item(keep_pos=False)
-        print("✅ SVG geladen.")
-        self.refit_view()
+
+        def load(progress):
+            progress("SVG einlesen")
+            geom = svg_utils.svg_to_polygon(path, target_width_mm=target_w)
+            if not geom or geom.is_empty:
+                return None
+            progress("Normieren")
+            geom = affinity.scale(geom, xfact=-1, yfact=-1, origin=(0, 0))
+            minx, miny, _, _ = geom.bounds
+            return affinity.translate(geom, xoff=-minx, yoff=-miny)
+
+        def done(geom):
+            if geom is None:
+                print("⚠ Keine gültige Geometrie im SVG.")
+                return
+            self.set_motif(geom)
+            print("✅ SVG geladen.")
+
+        self.run_task("import", load, done)
 
     def load_gerber(self):
         path, _ = QFileDialog.getOpenFileName(self, "Gerber auswählen", "", "Gerber/ZIP (*.gbr *.ger *.zip)")
         if not path:
             return
-        files, tempdir = collect_gerber_files(path)
+        files = gerber_utils.collect_gerber_files(path)
         if not files:
             print("⚠ Keine Gerber gefunden.")
             return
 
-        display_names = [Path(f).name for f in files]
-        dlg = DynamicLayerDialog(display_names, self)
+        drills = gerber_utils.collect_drill_files(path)
+        display_names = [gerber_utils.layer_name(f) for f in files]
+        dlg = layer_dialog.DynamicLayerDialog(
+            display_names, self, drill_names=[gerber_utils.layer_name(d) for d in drills])
         if dlg.exec() != QDialog.Accepted:
             print("❌ Abbruch.")
             return
         selected = set(dlg.selected_names())
+        drill_files = drills if dlg.punch_drills() else ()
 
-        combined = load_gerber_files(files, selected)
-        if not combined:
-            print("⚠ Keine Geometrie erzeugt.")
-            return
+        def done(combined):
+            if not combined:
+                print("⚠ Keine Geometrie erzeugt.")
+                return
+            self.set_motif(combined)
+            print("✅ Gerber importiert.")
 
-        self.motif_geom = combined
+        self.run_task("import",
+                      lambda progress: gerber_utils.load_gerber_files(
+                          files, selected, progress=progress, drill_files=drill_files),
+                      done)
+
+    def set_motif(self, geom):
+        self.motif_geom = geom
+        self.motif_matrix = affine_matrix()
         self.update_motif_item(keep_pos=False)
-        print("✅ Gerber importiert.")
-        self.refit_view()
+        self.schedule_refit()
 
     # ===== Motiv =====
     def rescale_svg_only(self):
@@ -232,75 +393,112 @@ class BrassEtcherGUI(QMainWindow):
             target_w = float(self.svg_width_edit.text())
         except ValueError:
             return
-        minx, _, maxx, _ = self.motif_geom.bounds
+        minx, _, maxx, _ = self.motif_bounds()
         width = max(maxx - minx, 1e-6)
         scale = target_w / width
-        base = affinity.translate(self.motif_geom, xoff=-minx, yoff=0)
-        base = affinity.scale(base, xfact=scale, yfact=scale, origin=(0, 0))
-        self.motif_geom = base
-        self.update_motif_item(keep_pos=False)
+        self.transform_motif(affine_matrix(a=scale, e=scale), keep_pos=False)
         print("✅ Neu skaliert.")
-        self.refit_view()
+        self.schedule_refit()
 
     def center_svg(self):
-        if not self.motif_item or not self.rohteil_item or not self.motif_qpath:
+        if not self.motif_item or not self.rohteil_item or not self.motif_geom:
             return
         brass_rect = self.rohteil_item.rect()
-        b = self.motif_qpath.boundingRect()
-        x = brass_rect.x() + (brass_rect.width() - b.width()) / 2
-        y = brass_rect.y() + (brass_rect.height() - b.height()) / 2
+        minx, miny, maxx, maxy = self.motif_bounds()
+        x = brass_rect.x() + (brass_rect.width() - (maxx - minx)) / 2
+        y = brass_rect.y() + (brass_rect.height() - (maxy - miny)) / 2
         self.motif_item.setPos(x, y)
         print("✅ Zentriert.")
-        self.refit_view()
+        self.schedule_refit()
+
+    def nest_copies(self):
+        """N Kopien des Motivs auf dem Panel verteilen; das Ergebnis wird das neue Motiv"""
+        if not self.motif_geom:
+            return
+        n, ok = QInputDialog.getInt(self, "Verteilen", "Anzahl Kopien:", 4, 1, 500)
+        if not ok:
+            return
+        geom, params = self.motif_geom, affine_params(self.motif_matrix)
+
+        def run(progress):
+            progress("Verteilen")
+            motif = affinity.affine_transform(geom, params)
+            report = {}
+            combined, _ = nesting.nest([motif] * n, refine=True, report=report)
+            return combined, report
+
+        def done(result):
+            combined, report = result
+            if combined is None:
+                print("⚠ Motiv passt nicht auf das Panel.")
+                return
+            self.set_motif(combined)
+            print(f"✅ {report['placed']} von {n} Kopien verteilt.")
+
+        self.run_task("import", run, done)
+
+    def motif_bounds(self):
+        """Bounds des Motivs mit aktueller Matrix, ohne die Geometrie zu transformieren"""
+        return transform_bounds(self.motif_geom.bounds, self.motif_matrix)
+
+    def motif_qtransform(self):
+        a, b, d, e, xoff, yoff = affine_params(self.motif_matrix)
+        return QTransform(a, d, b, e, xoff, yoff)
 
     def update_motif_item(self, keep_pos=True):
         if not self.motif_geom:
             return
-        last_pos = QPointF(0, 0)
-        if keep_pos and self.motif_item:
-            last_pos = self.motif_item.pos()
-        self.motif_qpath = shapely_to_qpath(self.motif_geom)
-        if self.motif_item:
-            self.scene.removeItem(self.motif_item)
-        item = QGraphicsPathItem(self.motif_qpath)
-        item.setPen(QPen(QColor("blue"), 0))
-        item.setBrush(QColor(100, 100, 255, 90))
-        item.setZValue(5)
-        item.setFlags(QGraphicsPathItem.ItemIsMovable | QGraphicsPathItem.ItemIsSelectable)
-        self.scene.addItem(item)
-        self.motif_item = item
-        self.motif_item.setPos(last_pos if keep_pos else QPointF(0, 0))
+        self._motif_lod = {}
+        self.motif_qpath = self.preview_path()
+        if self.motif_item is None:
+            item = QGraphicsPathItem()
+            item.setPen(QPen(QColor("blue"), 0))
+            item.setBrush(QColor(100, 100, 255, 90))
+            item.setZValue(5)
+            item.setFlags(QGraphicsPathItem.ItemIsMovable | QGraphicsPathItem.ItemIsSelectable)
+            self.scene.addItem(item)
+            self.motif_item = item
+        self.motif_item.setPath(self.motif_qpath)
+        self.motif_item.setTransform(self.motif_qtransform())
+        if not keep_pos:
+            self.motif_item.setPos(QPointF(0, 0))
+
+    def transform_motif(self, m, keep_pos=True):
+        """
+        Matrix m vor die Motiv-Matrix setzen und das Ergebnis wieder an den
+        Ursprung schieben. Die Anzeige bekommt nur eine neue QTransform.
+        """
+        m = m @ self.motif_matrix
+        minx, miny, _, _ = transform_bounds(self.motif_geom.bounds, m)
+        self.motif_matrix = affine_matrix(xoff=-minx, yoff=-miny) @ m
+        if not self.motif_item:
+            return
+        self.motif_item.setTransform(self.motif_qtransform())
+        if not keep_pos:
+            self.motif_item.setPos(QPointF(0, 0))
+        self.update_motif_lod()
 
     # ===== Spiegeln & Rotieren =====
     def mirror_vertical(self):
         if not self.motif_geom:
             return
-        self.motif_geom = affinity.scale(self.motif_geom, xfact=-1, yfact=1, origin=(0, 0))
-        minx, miny, _, _ = self.motif_geom.bounds
-        self.motif_geom = affinity.translate(self.motif_geom, xoff=-minx, yoff=-miny)
-        self.update_motif_item(True)
+        self.transform_motif(affine_matrix(a=-1))
         print("🔄 Vertikal gespiegelt.")
-        self.refit_view()
+        self.schedule_refit()
 
     def mirror_horizontal(self):
         if not self.motif_geom:
             return
-        self.motif_geom = affinity.scale(self.motif_geom, xfact=1, yfact=-1, origin=(0, 0))
-        minx, miny, _, _ = self.motif_geom.bounds
-        self.motif_geom = affinity.translate(self.motif_geom, xoff=-minx, yoff=-miny)
-        self.update_motif_item(True)
+        self.transform_motif(affine_matrix(e=-1))
         print("🔄 Horizontal gespiegelt.")
-        self.refit_view()
+        self.schedule_refit()
 
     def rotate_90(self):
         if not self.motif_geom:
             return
-        self.motif_geom = affinity.rotate(self.motif_geom, 90, origin=(0, 0))
-        minx, miny, _, _ = self.motif_geom.bounds
-        self.motif_geom = affinity.translate(self.motif_geom, xoff=-minx, yoff=-miny)
-        self.update_motif_item(True)
+        self.transform_motif(affine_matrix(a=0, b=-1, d=1, e=0))
         print("🔄 90° gedreht.")
-        self.refit_view()
+        self.schedule_refit()
 
 
     # ===== Export =====
@@ -316,10 +514,24 @@ class BrassEtcherGUI(QMainWindow):
         if not out:
             return
         fmt = "stl" if out.lower().endswith(".stl") else "3mf"
-        try:
-            pos = self.motif_item.pos() if self.motif_item else QPointF(0, 0)
-            mesh = build_and_transform_mesh(self.motif_geom, pos.x(), pos.y())
-            mesh.export(out)
-            print(f"✅ {fmt.upper()} exportiert: {out}")
-        except Exception as e:
-            print(f"❌ Export fehlgeschlagen: {e}")
\ No newline at end of file
+        # Zustand beim Klick festhalten, Motiv kann währenddessen weiter bearbeitet werden
+        geom, params = self.motif_geom, affine_params(self.motif_matrix)
+        pos = self.motif_item.pos() if self.motif_item else QPointF(0, 0)
+        x, y = pos.x(), pos.y()
+        if self.mesh_cache is None:
+            # Export an neuer Position ohne Neutriangulieren
+            self.mesh_cache = mesh_utils.MotifMeshCache()
+        cache = self.mesh_cache
+
+        def export(progress):
+            progress("Mesh erzeugen")
+            if fmt == "stl":
+                mesh_utils.write_negative_stl(geom, x, y, out, params, cache)
+            else:
+                mesh = mesh_utils.build_and_transform_mesh(geom, x, y, params, cache)
+                progress("Schreiben")
+                mesh.export(out)
+            return out
+
+        self.run_task("export", export,
+                      lambda path: print(f"✅ {fmt.upper()} exportiert: {path}"))
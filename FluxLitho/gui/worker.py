@@ -0,0 +1,63 @@
+"""
+Hintergrund-Tasks für die GUI.
+
+Import und Export laufen als Task im QThreadPool; Fortschritt, Ergebnis
+und Fehler kommen per Signal in den Hauptthread zurück. Die Task-Funktion
+bekommt einen progress(stage, done, total)-Callback, der nach cancel()
+mit TaskCancelled abbricht (also zwischen zwei Stufen bzw. Layern).
+Jeder Task ist eine Stufe "gui.<kind>" in trace_utils.
+"""
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from trace_utils import stage
+
+
+class TaskCancelled(Exception):
+    """Task wurde über cancel() abgebrochen"""
+
+
+class TaskSignals(QObject):
+    progress = Signal(object, str, int, int)  # task, Stufe, erledigt, gesamt (0 = unbestimmt)
+    finished = Signal(object, object)         # task, Ergebnis
+    failed = Signal(object, str)              # task, Fehlermeldung
+    cancelled = Signal(object)                # task
+
+
+class Task(QRunnable):
+    def __init__(self, kind, fn):
+        super().__init__()
+        # Referenz hält der Aufrufer (BrassEtcherGUI), nicht der Pool
+        self.setAutoDelete(False)
+        self.kind = kind
+        self.fn = fn
+        self.signals = TaskSignals()
+        self._cancelled = False
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        self._cancelled = True
+
+    def progress(self, stage, done=0, total=0):
+        if self._cancelled:
+            raise TaskCancelled(stage)
+        self.signals.progress.emit(self, stage, done, total)
+
+    def run(self):
+        try:
+            with stage(f"gui.{self.kind}"):
+                result = self.fn(self.progress)
+            if self._cancelled:
+                raise TaskCancelled()
+        except TaskCancelled:
+            self.signals.cancelled.emit(self)
+        except Exception as e:
+            self.signals.failed.emit(self, f"{type(e).__name__}: {e}")
+        else:
+            self.signals.finished.emit(self, result)
+
+
+def start(task):
+    QThreadPool.globalInstance().start(task)
@@ -1,7 +1,36 @@
 import math
-import trimesh
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import shapely
 from shapely.geometry import Polygon, MultiPolygon
+
+from backends import lazy
 from constants import PANEL_MM_W, PANEL_MM_H, FRAME_HEIGHT_MM
+from trace_utils import event, stage
+
+try:
+    from mapbox_earcut import triangulate_float64
+except ImportError:
+    triangulate_float64 = None  # -> extrude_with_engine über trimesh
+
+# trimesh nur für den Fallback ohne mapbox_earcut und für 3MF
+trimesh = lazy("trimesh")
+
+# Dreiecke pro Schreibblock beim STL-Export
+STL_CHUNK = 1 << 16
+# Löcher pro Streifen beim Triangulieren großer Deckflächen
+CAP_BAND_HOLES = 200
+# Punkte näher als das gelten als identisch (Streifengrenzen)
+MERGE_TOLERANCE_MM = 1e-9
+# Mindestabstand der Streifengrenzen zu vorhandenen Punkten
+SEAM_CLEARANCE_MM = 1e-6
+# Rand um das Motiv für die positionsunabhängige Triangulierung
+MOTIF_MARGIN_MM = 0.5
+
+_STL_DTYPE = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)),
+                       ("attr", "<u2")])
 
 def extrude_with_engine(geom, height: float):
     kwargs = {"engine": "earcut"}
@@ -22,14 +51,262 @@ def extrude_with_engine(geom, height: float):
     else:
         raise ValueError("Geometrie ist weder Polygon noch MultiPolygon")
 
-def build_and_transform_mesh(geom, offset_x, offset_y):
+def _polygon_parts(geom):
+    parts = shapely.get_parts(geom)
+    return parts[(shapely.get_type_id(parts) == shapely.GeometryType.POLYGON)
+                 & ~shapely.is_empty(parts)]
+
+def _earcut(parts):
+    """earcut je Polygon -> coords (n, 2) aller Ringpunkte, faces (m, 3) CCW"""
+    rings, poly_idx = shapely.get_rings(parts, return_index=True)
+    coords, ring_idx = shapely.get_coordinates(rings, return_index=True)
+    ring_end = np.cumsum(np.bincount(ring_idx, minlength=len(rings)))
+    first_ring = np.flatnonzero(np.r_[True, poly_idx[1:] != poly_idx[:-1]])
+    last_ring = np.r_[first_ring[1:], len(rings)] - 1
+
+    faces = []
+    for r0, r1 in zip(first_ring, last_ring):
+        v0 = ring_end[r0 - 1] if r0 else 0
+        ends = (ring_end[r0:r1 + 1] - v0).astype(np.uint32)
+        f = triangulate_float64(coords[v0:ring_end[r1]], ends)
+        faces.append(np.asarray(f, dtype=np.int64).reshape(-1, 3) + v0)
+    faces = np.concatenate(faces)
+    a, b, c = coords[faces[:, 0]], coords[faces[:, 1]], coords[faces[:, 2]]
+    cw = ((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1])
+          - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])) < 0
+    faces[cw] = faces[cw][:, ::-1]
+    return coords, faces
+
+def _triangulate_raw(geom, band_holes=CAP_BAND_HOLES):
+    """
+    earcut über alle Polygone -> coords, faces, seams (x der Schnittlinien).
+
+    earcut verbindet jedes Loch einzeln mit dem Außenring (Aufwand etwa
+    Löcher x Punkte); bei mehr als band_holes Löchern wird die Fläche
+    deshalb in senkrechte Streifen geschnitten und streifenweise
+    trianguliert. Die Schnittlinien halten SEAM_CLEARANCE_MM Abstand zu
+    allen vorhandenen Punkten.
+    """
+    parts = _polygon_parts(geom)
+    if parts.size == 0:
+        raise ValueError("Geometrie ist weder Polygon noch MultiPolygon")
+    seams = np.empty(0)
+    holes = int(shapely.get_num_interior_rings(parts).sum())
+    if holes > band_holes:
+        minx, miny, maxx, maxy = shapely.total_bounds(parts)
+        xs = shapely.get_coordinates(parts)[:, 0]
+        seams = np.linspace(minx, maxx, holes // band_holes + 2)[1:-1]
+        for k, c in enumerate(seams):
+            while (np.abs(xs - c) < SEAM_CLEARANCE_MM).any():
+                c += 2 * SEAM_CLEARANCE_MM
+            seams[k] = c
+        seams = seams[seams < maxx]
+        edges_x = np.r_[minx, seams, maxx]
+        parts = _polygon_parts(np.concatenate([
+            shapely.get_parts(shapely.clip_by_rect(geom, x0, miny, x1, maxy))
+            for x0, x1 in zip(edges_x[:-1], edges_x[1:])]))
+    coords, faces = _earcut(parts)
+    return coords, faces, seams
+
+def _merge_points(coords, faces):
+    """
+    Gleiche Punkte zusammenführen (auch beidseits von Schnittlinien) und
+    ungenutzte verwerfen (earcut lässt Duplikate und Kollineare aus).
+    """
+    key = np.round(coords / MERGE_TOLERANCE_MM).astype(np.int64)
+    _, first, inverse = np.unique(key, axis=0, return_index=True, return_inverse=True)
+    used, faces = np.unique(inverse.ravel()[faces], return_inverse=True)
+    return coords[first[used]], faces.reshape(-1, 3)
+
+def _boundary_edges(coords, faces, seams):
+    """
+    Randkanten: Kanten, die nur ein Dreieck hat, ohne Kanten auf einer
+    Schnittlinie. So passen Wände und Deckel überall zusammen; die Richtung
+    aus den CCW-Dreiecken lässt die Wände nach außen zeigen.
+    """
+    directed = np.concatenate((faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]))
+    key = directed.min(axis=1) * len(coords) + directed.max(axis=1)
+    _, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+    edges = directed[counts[inverse] == 1]
+    if len(seams):
+        seam = np.full(len(coords), -1)
+        for k, c in enumerate(seams):
+            seam[np.abs(coords[:, 0] - c) < MERGE_TOLERANCE_MM] = k
+        s0, s1 = seam[edges[:, 0]], seam[edges[:, 1]]
+        edges = edges[(s0 < 0) | (s0 != s1)]
+    return edges
+
+def _cap_edges(coords, faces, seams):
+    coords, faces = _merge_points(coords, faces)
+    return coords, faces, _boundary_edges(coords, faces, seams)
+
+def triangulate_cap(geom, band_holes=CAP_BAND_HOLES):
+    """
+    Deckfläche einmal triangulieren (earcut, große Flächen in Streifen).
+    Liefert die genutzten Punkte coords (n, 2), faces (m, 3) gegen den
+    Uhrzeigersinn und die nach außen gerichteten Randkanten edges (k, 2).
+    """
+    return _cap_edges(*_triangulate_raw(geom, band_holes))
+
+def extrude_arrays(coords, faces, edges, height):
+    """Prisma aus einer triangulierten Deckfläche: vertices (2n, 3), faces"""
+    n = len(coords)
+    vertices = np.zeros((2 * n, 3))
+    vertices[:n, :2] = coords
+    vertices[n:, :2] = coords
+    vertices[n:, 2] = height
+    e0, e1 = edges[:, 0], edges[:, 1]
+    faces = np.concatenate((
+        faces + n,                               # oben
+        faces[:, ::-1],                          # unten
+        np.column_stack((e0, e1, e1 + n)),       # Wände
+        np.column_stack((e0, e1 + n, e0 + n)),
+    ))
+    return vertices, faces
+
+class MotifCap:
+    """
+    Positionsunabhängige Triangulierung für ein Motiv (Motiv-Koordinaten).
+
+    Das Negativ wird in zwei Teile zerlegt: Rechteck R (Bounding Box +
+    MOTIF_MARGIN_MM) minus Motiv, einmal mit earcut trianguliert, und der
+    Rahmenring Panel minus R als Rechteckgitter, dessen Linien durch die
+    Ecken von R und die Schnittlinien laufen. Die Punkte auf dem Rand von R
+    werden auf die Gitterpunkte abgebildet; damit stehen Dreiecke und
+    Randkanten fest, beim Verschieben ändern sich nur die Koordinaten.
+    """
+    def __init__(self, motif, margin=MOTIF_MARGIN_MM):
+        minx, miny, maxx, maxy = motif.bounds
+        self.motif = motif
+        self.bounds = x0, y0, x1, y1 = (minx - margin, miny - margin, maxx + margin, maxy + margin)
+        coords, faces, self.seams = _triangulate_raw(shapely.box(*self.bounds).difference(motif))
+        coords, faces = _merge_points(coords, faces)
+
+        # Punkte auf dem Rand von R -> Gitterpunkte (Spalte, Zeile)
+        tol = MERGE_TOLERANCE_MM
+        inner = np.r_[x0, self.seams, x1]
+        self.nx = nx = len(inner) + 2
+        x, y = coords[:, 0], coords[:, 1]
+        col = np.clip(np.searchsorted(inner, x - tol), 0, len(inner) - 1)
+        row = np.where(np.abs(y - y0) < tol, 1, np.where(np.abs(y - y1) < tol, 2, 0))
+        on_grid = (np.abs(inner[col] - x) < tol) & (row > 0)
+        on_edge = ((np.abs(x - x0) < tol) | (np.abs(x - x1) < tol)
+                   | (np.abs(y - y0) < tol) | (np.abs(y - y1) < tol))
+        self.valid = not (on_edge & ~on_grid).any()
+        if not self.valid:
+            return
+
+        rest = ~on_grid
+        index = np.empty(len(coords), dtype=np.int64)
+        index[on_grid] = row[on_grid] * nx + col[on_grid] + 1
+        index[rest] = 4 * nx + np.arange(rest.sum())
+        self.points = coords[rest]
+        self.faces = np.concatenate((_ring_faces(nx), index[faces]))
+        # Randkanten hängen nur von der Topologie ab (Panel hier nur Platzhalter)
+        local = self.coords(0.0, 0.0, (x0 - 1, y0 - 1, x1 + 1, y1 + 1))
+        self.edges = _boundary_edges(local, self.faces, self.seams)
+
+    def coords(self, offset_x, offset_y, panel=(0.0, 0.0, PANEL_MM_W, PANEL_MM_H)):
+        """Punkte (Gitter + Motiv-Umgebung) für eine Position"""
+        x0, y0, x1, y1 = self.bounds
+        px0, py0, px1, py1 = panel
+        xs = np.r_[px0, np.r_[x0, self.seams, x1] + offset_x, px1]
+        ys = np.array([py0, y0 + offset_y, y1 + offset_y, py1])
+        gx, gy = np.meshgrid(xs, ys)
+        return np.concatenate((np.column_stack((gx.ravel(), gy.ravel())),
+                               self.points + (offset_x, offset_y)))
+
+def _ring_faces(nx):
+    """Dreiecke des 3 x (nx-1)-Rechteckgitters ohne die mittleren Zellen (= R)"""
+    i, j = np.meshgrid(np.arange(nx - 1), np.arange(3))
+    i, j = i.ravel(), j.ravel()
+    keep = ~((j == 1) & (i >= 1) & (i < nx - 2))
+    a = (j * nx + i)[keep]
+    b, c, d = a + 1, a + nx + 1, a + nx
+    return np.concatenate((np.column_stack((a, b, c)), np.column_stack((a, c, d))))
+
+class MotifMeshCache:
+    """
+    MotifCap je (Geometrie, Transformation), LRU mit maxsize Einträgen.
+    Die Geometrie zählt über ihre Identität, wird im Eintrag gehalten
+    (damit die id nicht neu vergeben wird) und nie verändert.
+    """
+    def __init__(self, maxsize=4):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, geom, params=None):
+        from shapely import affinity
+        key = (id(geom), None if params is None else tuple(float(p) for p in params))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is geom:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                event("cache", store="mesh", result="hit")
+                return entry[1]
+            self.misses += 1
+        event("cache", store="mesh", result="miss")
+        with stage("mesh.cap") as s:
+            motif = geom if params is None else affinity.affine_transform(geom, params)
+            cap = MotifCap(motif)
+            if s:
+                s["valid"] = cap.valid
+                if cap.valid:
+                    s["triangles"] = len(cap.faces)
+        with self._lock:
+            self._entries[key] = (geom, cap)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return cap
+
+def negative_arrays(geom, offset_x, offset_y, params=None, cache=None):
+    """
+    Negativ-Rahmen wie build_and_transform_mesh, aber direkt als NumPy-Arrays.
+    Die 270°-Drehung (x, y) -> (y, -x) und das Normieren auf (0, 0) werden
+    vor dem Extrudieren auf die 2D-Punkte angewandt.
+
+    params: optionale affine Transformation (shapely-Parameter) des Motivs.
+    cache: MotifMeshCache; liegt das Motiv samt Rand im Panel, wird dann
+    nur der Rahmenring neu trianguliert.
+    """
+    with stage("mesh.negative") as s:
+        vertices, faces = _negative_arrays(geom, offset_x, offset_y, params, cache)
+        if s:
+            s["vertices"] = len(vertices)
+            s["triangles"] = len(faces)
+        return vertices, faces
+
+def _negative_arrays(geom, offset_x, offset_y, params, cache):
     from shapely import affinity
-    frame_poly = Polygon([
-        (0, 0), (PANEL_MM_W, 0),
-        (PANEL_MM_W, PANEL_MM_H), (0, PANEL_MM_H)
-    ])
+    if cache is not None and triangulate_float64 is not None:
+        cap = cache.lookup(geom, params)
+        x0, y0, x1, y1 = cap.bounds
+        if (cap.valid and 0 < x0 + offset_x and x1 + offset_x < PANEL_MM_W
+                and 0 < y0 + offset_y and y1 + offset_y < PANEL_MM_H):
+            coords = cap.coords(offset_x, offset_y)
+            coords = np.column_stack((coords[:, 1], PANEL_MM_W - coords[:, 0]))
+            return extrude_arrays(coords, cap.faces, cap.edges, FRAME_HEIGHT_MM)
+        geom = cap.motif
+    elif params is not None:
+        geom = affinity.affine_transform(geom, params)
+
+    frame_poly = shapely.box(0, 0, PANEL_MM_W, PANEL_MM_H)
     geom = affinity.translate(geom, xoff=offset_x, yoff=offset_y)
     negative = frame_poly.difference(geom)
+    if triangulate_float64 is None:
+        mesh = _extrude_negative_trimesh(negative)
+        return mesh.vertices, mesh.faces
+    coords, faces, edges = triangulate_cap(negative)
+    _, miny, maxx, _ = negative.bounds
+    coords = np.column_stack((coords[:, 1] - miny, maxx - coords[:, 0]))
+    return extrude_arrays(coords, faces, edges, FRAME_HEIGHT_MM)
+
+def _extrude_negative_trimesh(negative):
+    """Ohne mapbox_earcut: über trimesh extrudieren, drehen und verschieben"""
     mesh = extrude_with_engine(negative, FRAME_HEIGHT_MM)
 
     # Drehung + Verschiebung
@@ -38,4 +315,27 @@ def build_and_transform_mesh(geom, offset_x, offset_y):
     mesh.apply_transform(rot270)
     xmin, ymin, zmin = mesh.bounds[0]
     mesh.apply_translation([-xmin, -ymin, -zmin])
-    return mesh
\ No newline at end of file
+    return mesh
+
+def write_binary_stl(path, vertices, faces, chunk=STL_CHUNK):
+    """Binäres STL blockweise schreiben (ohne trimesh-Objekt)"""
+    with stage("mesh.stl", triangles=len(faces)), open(path, "wb") as f:
+        f.write(b"FluxLitho".ljust(80, b" "))
+        f.write(np.uint32(len(faces)).tobytes())
+        for s in range(0, len(faces), chunk):
+            tri = vertices[faces[s:s + chunk]]
+            normal = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+            length = np.linalg.norm(normal, axis=1, keepdims=True)
+            rec = np.zeros(len(tri), dtype=_STL_DTYPE)
+            rec["normal"] = np.divide(normal, length, out=np.zeros_like(normal),
+                                      where=length > 0)
+            rec["vertices"] = tri
+            f.write(rec.tobytes())
+
+def write_negative_stl(geom, offset_x, offset_y, path, params=None, cache=None):
+    """Negativ-Rahmen direkt als binäres STL schreiben"""
+    write_binary_stl(path, *negative_arrays(geom, offset_x, offset_y, params, cache))
+
+def build_and_transform_mesh(geom, offset_x, offset_y, params=None, cache=None):
+    vertices, faces = negative_arrays(geom, offset_x, offset_y, params, cache)
+    return trimesh.Trimesh(vertices, faces, process=False)
@@ -0,0 +1,227 @@
+"""
+Nesting: mehrere Motive (oder N Kopien eines Motivs) auf dem Panel verteilen.
+
+Erst packt ein Skyline-Packer (Bottom-Left) die Bounding Boxes, wahlweise
+um 90° gedreht, mit Mindestabstand zueinander und zum Panelrand. Die
+optionale Verfeinerung arbeitet auf den Polygonen: Teile werden Richtung
+Ursprung geschoben, solange sie über STRtree-Abfragen (dwithin) keinen
+Nachbarn verletzen, danach werden übrig gebliebene Teile in Lücken gesetzt.
+Das Ergebnis ist eine einzige Geometrie in Panel-Koordinaten (Offset 0),
+die direkt an build_and_transform_mesh bzw. write_ctb_from_geometry geht.
+"""
+import numpy as np
+import shapely
+from shapely import affinity
+
+from constants import PANEL_MM_W, PANEL_MM_H, NEST_SPACING_MM
+
+# Schrittweite (mm) beim Schieben und beim Suchen freier Plätze
+NEST_STEP_MM = 1.0
+
+
+def pack_boxes(sizes, width=PANEL_MM_W, height=PANEL_MM_H,
+               spacing=NEST_SPACING_MM, rotate=True):
+    """
+    Bottom-Left-Skyline-Packer für Rechtecke sizes = [(w, h), ...].
+
+    Liefert je Rechteck (x, y, gedreht) der linken unteren Ecke oder None,
+    wenn es nicht mehr passt. Größte Fläche zuerst; gewählt wird die Lage
+    mit der niedrigsten Oberkante, dann die am weitesten links.
+    """
+    # Boxen um spacing vergrößert in einem um spacing verkleinerten Feld:
+    # ergibt spacing zwischen Teilen und zum Rand
+    area_w, area_h = width - spacing, height - spacing
+    skyline = [(0.0, 0.0, area_w)]  # (x, y, Breite)
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][0] * sizes[i][1],
+                                                     -max(sizes[i])))
+    result = [None] * len(sizes)
+    for i in order:
+        best = None
+        for rot in ((False, True) if rotate else (False,)):
+            w, h = sizes[i][::-1] if rot else sizes[i]
+            w, h = w + spacing, h + spacing
+            for k, (x, _, _) in enumerate(skyline):
+                y = _skyline_fit(skyline, k, w, area_w)
+                if y is None or y + h > area_h + 1e-9:
+                    continue
+                score = (y + h, x)
+                if best is None or score < best[0]:
+                    best = (score, k, x, y, w, h, rot)
+        if best is None:
+            continue
+        _, k, x, y, w, h, rot = best
+        _skyline_add(skyline, x, y + h, w)
+        result[i] = (x + spacing, y + spacing, rot)
+    return result
+
+
+def _skyline_fit(skyline, k, w, area_w):
+    """Höhe, auf der eine Box der Breite w ab Segment k aufliegt (None = zu breit)"""
+    x = skyline[k][0]
+    if x + w > area_w + 1e-9:
+        return None
+    y = 0.0
+    for sx, sy, sw in skyline[k:]:
+        if sx >= x + w - 1e-9:
+            break
+        y = max(y, sy)
+    return y
+
+
+def _skyline_add(skyline, x, top, w):
+    """Segment [x, x+w] auf Höhe top eintragen, überdeckte Segmente kürzen"""
+    end = x + w
+    out = []
+    for sx, sy, sw in skyline:
+        se = sx + sw
+        if se <= x + 1e-9 or sx >= end - 1e-9:
+            out.append((sx, sy, sw))
+            continue
+        if sx < x:
+            out.append((sx, sy, x - sx))
+        if se > end:
+            out.append((end, sy, se - end))
+    out.append((x, top, w))
+    out.sort()
+    # gleich hohe Nachbarn zusammenfassen
+    merged = [out[0]]
+    for sx, sy, sw in out[1:]:
+        px, py, pw = merged[-1]
+        if abs(py - sy) < 1e-9:
+            merged[-1] = (px, py, pw + sw)
+        else:
+            merged.append((sx, sy, sw))
+    skyline[:] = merged
+
+
+def _normalized(geom, rot):
+    """Motiv (ggf. um 90° gedreht) mit Bounding Box ab (0, 0)"""
+    if rot:
+        geom = affinity.rotate(geom, 90, origin=(0, 0))
+    minx, miny, _, _ = geom.bounds
+    return affinity.translate(geom, xoff=-minx, yoff=-miny)
+
+
+def nest(motifs, spacing=NEST_SPACING_MM, rotate=True, refine=False,
+         width=PANEL_MM_W, height=PANEL_MM_H, report=None):
+    """
+    Motive (Liste von Geometrien, Kopien = dasselbe Objekt mehrfach) auf
+    das Panel verteilen.
+
+    Liefert (Geometrie, Platzierungen); eine Platzierung ist ein Dict mit
+    motif (Index in motifs), rotated, x, y (linke untere Ecke der
+    Bounding Box). Nicht platzierbare Teile fehlen; report bekommt
+    placed/unplaced und die Packdichte.
+    """
+    shapes = {}
+
+    def shape(i, rot):
+        key = (id(motifs[i]), rot)
+        if key not in shapes:
+            shapes[key] = _normalized(motifs[i], rot)
+        return shapes[key]
+
+    sizes = []
+    for i in range(len(motifs)):
+        minx, miny, maxx, maxy = shape(i, False).bounds
+        sizes.append((maxx - minx, maxy - miny))
+    boxes = pack_boxes(sizes, width, height, spacing, rotate)
+
+    placements = [{"motif": i, "rotated": b[2], "x": b[0], "y": b[1]}
+                  for i, b in enumerate(boxes) if b is not None]
+    missing = [i for i, b in enumerate(boxes) if b is None]
+    if refine:
+        _refine(placements, missing, shape, spacing, rotate, width, height)
+
+    parts = [affinity.translate(shape(p["motif"], p["rotated"]), p["x"], p["y"])
+             for p in placements]
+    geom = shapely.union_all(parts) if parts else None
+    if report is not None:
+        used = sum(shapely.area(shape(p["motif"], p["rotated"])) for p in placements)
+        report.update({"placed": len(placements), "unplaced": len(motifs) - len(placements),
+                       "density": float(used / (width * height))})
+    return geom, placements
+
+
+def _refine(placements, missing, shape, spacing, rotate, width, height):
+    """
+    Polygonbasierte Verdichtung: jedes Teil nach links/unten schieben, bis
+    es einem Nachbarn näher als spacing käme; dann fehlende Teile auf dem
+    ersten freien Platz (Raster NEST_STEP_MM, zeilenweise) einsetzen.
+    """
+    def placed_geom(p):
+        return affinity.translate(shape(p["motif"], p["rotated"]), p["x"], p["y"])
+
+    geoms = [placed_geom(p) for p in placements]
+    tree = [None]
+
+    def update(k, g):
+        if k == len(geoms):
+            geoms.append(g)
+        else:
+            geoms[k] = g
+        tree[0] = None
+
+    def free(g, skip=-1):
+        minx, miny, maxx, maxy = g.bounds
+        if minx < spacing - 1e-9 or miny < spacing - 1e-9:
+            return False
+        if maxx > width - spacing + 1e-9 or maxy > height - spacing + 1e-9:
+            return False
+        if not geoms:
+            return True
+        if tree[0] is None:
+            tree[0] = shapely.STRtree(geoms)
+        hits = tree[0].query(g, predicate="dwithin", distance=spacing)
+        return not (hits != skip).any()
+
+    def slide(k, dx, dy):
+        """Teil k in Richtung (dx, dy) schieben; True, wenn es sich bewegt hat"""
+        p = placements[k]
+        base = shape(p["motif"], p["rotated"])
+        moved = 0.0
+        step = NEST_STEP_MM
+        while step > 0.01:
+            g = affinity.translate(base, p["x"] + dx * (moved + step), p["y"] + dy * (moved + step))
+            if free(g, skip=k):
+                moved += step
+            else:
+                step /= 2
+        if moved <= 0:
+            return False
+        p["x"] += dx * moved
+        p["y"] += dy * moved
+        update(k, placed_geom(p))
+        return True
+
+    order = sorted(range(len(placements)), key=lambda k: (placements[k]["y"], placements[k]["x"]))
+    for _ in range(4):
+        moved = False
+        for k in order:
+            moved |= slide(k, 0, -1)
+            moved |= slide(k, -1, 0)
+        if not moved:
+            break
+
+    # Platz wird nur weniger: was für ein Motiv nicht passte, passt auch später nicht
+    failed = set()
+    for i in missing:
+        for rot in ((False, True) if rotate else (False,)):
+            base = shape(i, rot)
+            if id(base) in failed:
+                continue
+            _, _, w, h = base.bounds
+            spot = None
+            for y in np.arange(spacing, height - spacing - h + 1e-9, NEST_STEP_MM):
+                for x in np.arange(spacing, width - spacing - w + 1e-9, NEST_STEP_MM):
+                    if free(affinity.translate(base, x, y)):
+                        spot = (float(x), float(y))
+                        break
+                if spot is not None:
+                    break
+            if spot is None:
+                failed.add(id(base))
+                continue
+            placements.append({"motif": i, "rotated": rot, "x": spot[0], "y": spot[1]})
+            update(len(geoms), placed_geom(placements[-1]))
+            break
@@ -0,0 +1,196 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import shapely
+from shapely.geometry import Polygon, MultiPolygon
+
+from constants import (PANEL_MM_W, PANEL_PX_W, PANEL_PX_H, PX_SIZE_MM,
+                       RASTER_SUPERSAMPLE, RASTER_TILE_PX, RASTER_THRESHOLD)
+from trace_utils import stage
+
+
+def geometry_edges(geom):
+    """Alle Ring-Kanten (Außen- und Innenringe) als Arrays x0, y0, x1, y1"""
+    if isinstance(geom, Polygon):
+        polys = [geom]
+    elif isinstance(geom, MultiPolygon):
+        polys = list(geom.geoms)
+    else:
+        raise ValueError("Geometrie ist weder Polygon noch MultiPolygon")
+    rings = shapely.get_rings(np.asarray(polys, dtype=object))
+    coords, ring_idx = shapely.get_coordinates(rings, return_index=True)
+    # Kante i -> i+1 nur innerhalb desselben (geschlossenen) Rings
+    same = ring_idx[:-1] == ring_idx[1:]
+    start = coords[:-1][same]
+    end = coords[1:][same]
+    return start[:, 0], start[:, 1], end[:, 0], end[:, 1]
+
+
+def panel_edges_px(geom, offset_x=0.0, offset_y=0.0, px_size=PX_SIZE_MM):
+    """
+    Kanten in Pixelkoordinaten (Spalte, Zeile) des Belichtungsbildes.
+
+    Wie build_and_transform_mesh: erst um den Offset verschieben, dann
+    270° drehen und auf (0,0) normieren -> (u, v) = (y, PANEL_MM_W - x).
+    Die lange Achse v läuft entlang der 2560 Spalten, u entlang der Zeilen.
+    """
+    x0, y0, x1, y1 = geometry_edges(geom)
+    col0 = (PANEL_MM_W - (x0 + offset_x)) / px_size
+    col1 = (PANEL_MM_W - (x1 + offset_x)) / px_size
+    row0 = (y0 + offset_y) / px_size
+    row1 = (y1 + offset_y) / px_size
+    return col0, row0, col1, row1
+
+
+def scanline_fill(x0, y0, x1, y1, width, height):
+    """
+    Even-Odd-Scanline-Füllung über eine Kantentabelle.
+
+    Ein Pixel gilt als gesetzt, wenn sein Mittelpunkt innen liegt. Pro Kante
+    werden alle geschnittenen Zeilen auf einmal berechnet, die Schnittpunkte
+    je Zeile sortiert und paarweise als Spannen eingetragen (Löcher ergeben
+    sich durch die Even-Odd-Regel von selbst).
+    """
+    spans = scanline_spans(x0, y0, x1, y1, width, height)
+    if spans is None:
+        return np.zeros((height, width), dtype=np.bool_)
+    return _fill_spans(*spans, width, height) > 0
+
+
+def scanline_spans(x0, y0, x1, y1, width, height):
+    """Gefüllte Spannen (Zeile, Startspalte, Endspalte exkl.) wie scanline_fill; None = keine"""
+    x0 = np.asarray(x0, dtype=np.float64)
+    y0 = np.asarray(y0, dtype=np.float64)
+    x1 = np.asarray(x1, dtype=np.float64)
+    y1 = np.asarray(y1, dtype=np.float64)
+
+    # Zeilen r mit Mittelpunkt r+0.5 in [ymin, ymax)
+    ymin = np.minimum(y0, y1)
+    ymax = np.maximum(y0, y1)
+    r0 = np.clip(np.ceil(ymin - 0.5), 0, height).astype(np.int64)
+    r1 = np.clip(np.ceil(ymax - 0.5), 0, height).astype(np.int64)
+    counts = r1 - r0
+    keep = counts > 0
+    if not keep.any():
+        return None
+    x0, y0, x1, y1 = x0[keep], y0[keep], x1[keep], y1[keep]
+    r0, counts = r0[keep], counts[keep]
+
+    # (Kante, Zeile)-Paare aufspannen
+    total = int(counts.sum())
+    edge = np.repeat(np.arange(len(counts)), counts)
+    first = np.repeat(np.cumsum(counts) - counts, counts)
+    rows = r0[edge] + (np.arange(total) - first)
+    t = (rows + 0.5 - y0[edge]) / (y1[edge] - y0[edge])
+    xs = x0[edge] + t * (x1[edge] - x0[edge])
+
+    order = np.lexsort((xs, rows))
+    rows = rows[order]
+    xs = xs[order]
+    span_rows = rows[0::2]
+    c0 = np.clip(np.ceil(xs[0::2] - 0.5), 0, width).astype(np.int64)
+    c1 = np.clip(np.ceil(xs[1::2] - 0.5), 0, width).astype(np.int64)
+    return span_rows, c0, c1
+
+
+def _fill_spans(rows, c0, c1, width, height):
+    """
+    Spannen als +1/-1 in Differenzzeilen eintragen und aufsummieren ->
+    Anzahl Spannen je Pixel (height, width). Mehrere Spannen in derselben
+    Zeile (z.B. Unterzeilen eines Pixels) addieren sich.
+    """
+    stride = width + 1
+    n = height * stride
+    diff = (np.bincount(rows * stride + c0, minlength=n)
+            - np.bincount(rows * stride + c1, minlength=n))
+    return np.cumsum(diff.reshape(height, stride), axis=1)[:, :width]
+
+
+def rasterize_geometry(geom, offset_x=0.0, offset_y=0.0):
+    """Brennt Polygon/MultiPolygon direkt in eine bool-Maske (PANEL_PX_H, PANEL_PX_W)"""
+    if geom is None or geom.is_empty:
+        return np.zeros((PANEL_PX_H, PANEL_PX_W), dtype=np.bool_)
+    edges = panel_edges_px(geom, offset_x, offset_y)
+    return scanline_fill(*edges, PANEL_PX_W, PANEL_PX_H)
+
+
+def _coverage_tile(edges, ymin, ymax, rows, cols, supersample):
+    """
+    Eine Kachel (rows, cols = Pixelbereiche) überabgetastet füllen und per
+    Blockmittel (s x s Abtastpunkte) auf 8-Bit-Abdeckung reduzieren; None,
+    wenn keine Spanne die Kachel trifft (dann ist sie leer).
+    """
+    r0, r1 = rows
+    c0, c1 = cols
+    m = (ymax > r0) & (ymin < r1)
+    if not m.any():
+        return None
+    x0, y0, x1, y1 = (e[m] for e in edges)
+    h, w = r1 - r0, c1 - c0
+    s = supersample
+    # Kanten links/rechts der Kachel bleiben drin: sie bestimmen die Parität,
+    # scanline_fill schneidet ihre Spannen auf die Kachel zu
+    spans = scanline_spans((x0 - c0) * s, (y0 - r0) * s, (x1 - c0) * s, (y1 - r0) * s, w * s, h * s)
+    if spans is None:
+        return None
+    rows, sc0, sc1 = spans
+    # Die s Unterzeilen eines Pixels landen in derselben Differenzzeile, so
+    # bleibt der Puffer nur in x überabgetastet (h, w * s)
+    count = _fill_spans(rows // s, sc0, sc1, w * s, h).reshape(h, w, s).sum(axis=2)
+    n = s * s
+    return ((count * 255 + n // 2) // n).astype(np.uint8)
+
+
+def rasterize_coverage(geom, offset_x=0.0, offset_y=0.0, supersample=RASTER_SUPERSAMPLE,
+                       tile=RASTER_TILE_PX, workers=None):
+    """
+    Kantengeglättete Belichtung: Abdeckung je Pixel als uint8-Array
+    (PANEL_PX_H, PANEL_PX_W), 255 = voll belichtet.
+
+    Gefüllt wird wie bei rasterize_geometry, aber mit supersample² Abtastpunkten
+    pro Pixel. Das Panel wird in Kacheln von tile x tile Pixeln zerlegt, die
+    im Thread-Pool gerendert werden (NumPy gibt beim Sortieren/Summieren die
+    GIL frei); im Speicher liegen nur die überabgetasteten Kacheln in Arbeit,
+    nie das ganze Panel in supersample-facher Auflösung.
+    supersample=1 ergibt genau rasterize_geometry (0/255).
+    """
+    out = np.zeros((PANEL_PX_H, PANEL_PX_W), dtype=np.uint8)
+    if geom is None or geom.is_empty:
+        return out
+    supersample = max(1, int(supersample))
+    tile = max(1, int(tile))
+    edges = panel_edges_px(geom, offset_x, offset_y)
+    ymin = np.minimum(edges[1], edges[3])
+    ymax = np.maximum(edges[1], edges[3])
+    tiles = [((r, min(r + tile, PANEL_PX_H)), (c, min(c + tile, PANEL_PX_W)))
+             for r in range(0, PANEL_PX_H, tile) for c in range(0, PANEL_PX_W, tile)]
+
+    def render(t):
+        return t, _coverage_tile(edges, ymin, ymax, t[0], t[1], supersample)
+
+    with stage("raster.coverage", supersample=supersample, tiles=len(tiles)) as s:
+        workers = workers or min(len(tiles), os.cpu_count() or 1)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(render, tiles)
+                filled = _paste_tiles(out, results)
+        else:
+            filled = _paste_tiles(out, map(render, tiles))
+        if s:
+            s["filled_tiles"] = filled
+    return out
+
+
+def _paste_tiles(out, results):
+    filled = 0
+    for ((r0, r1), (c0, c1)), cov in results:
+        if cov is not None:
+            out[r0:r1, c0:c1] = cov
+            filled += 1
+    return filled
+
+
+def coverage_to_mask(coverage, threshold=RASTER_THRESHOLD):
+    """Abdeckung (uint8) -> bool-Maske für 1-Bit-Layer (belichtet ab threshold)"""
+    return coverage >= threshold
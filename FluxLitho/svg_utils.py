@@ -1,27 +1,144 @@
-import math
 import numpy as np
-from shapely.geometry import Polygon, MultiPolygon
+import shapely
+from shapely.geometry import Polygon
 from shapely.ops import unary_union
 from shapely import affinity
-from svgpathtools import svg2paths
-from PySide6.QtCore import QPointF
-from PySide6.QtGui import QPainterPath
-
-def path_to_polyline(path, spacing=1.0):
-    length = max(path.length(), 1e-6)
-    n = max(8, int(math.ceil(length / spacing)))
-    ts = np.linspace(0.0, 1.0, n)
-    pts = [path.point(t) for t in ts]
-    coords = [(p.real, p.imag) for p in pts]
-    if abs(coords[0][0] - coords[-1][0]) > 1e-6 or abs(coords[0][1] - coords[-1][1]) > 1e-6:
-        coords.append(coords[0])
-    return coords
-
-def svg_to_polygon(svg_file, target_width_mm=None):
-    paths, _ = svg2paths(svg_file)
-    polys = []
+from backends import lazy
+from constants import CHORD_TOLERANCE_MM
+from geom_utils import arc_segments, count_vertices
+from trace_utils import stage
+
+# svgpathtools (zieht scipy nach) erst beim ersten SVG-Import laden
+svgpathtools = lazy("svgpathtools")
+
+# Segmenttypen für die gebündelte Auswertung
+_LINE, _QUAD, _CUBIC, _ARC, _OTHER = range(5)
+
+def sample_paths(paths, tolerance=CHORD_TOLERANCE_MM):
+    """
+    Tastet alle Pfade segmentweise ab -> Liste von (N, 2)-Arrays.
+
+    Linien liefern nur ihre Endpunkte, Béziers und Arcs werden je Typ in
+    einem Schritt über ein t-Array ausgewertet (Polynom bzw. Ellipse in
+    NumPy). Die Segmentanzahl folgt der Sehnentoleranz (SVG-Einheiten):
+    Béziers über die Wang-Schranke des Kontrollpolygons, Arcs über Radius
+    und Winkel. Segmentgrenzen (Ecken) bleiben exakt erhalten.
+    """
+    segs = [seg for p in paths for seg in p]
+    path_len = np.array([len(p) for p in paths], dtype=np.int64)
+    n = len(segs)
+    if n == 0:
+        return [np.zeros((0, 2)) for _ in paths]
+
+    kind = np.full(n, _OTHER, dtype=np.int8)
+    ctrl = np.zeros((n, 4), dtype=np.complex128)
+    arc = np.zeros((n, 4), dtype=np.float64)      # theta, delta (Grad), rx, ry
+    arc_c = np.zeros((n, 2), dtype=np.complex128)  # Mittelpunkt, Drehung
+    for i, seg in enumerate(segs):
+        if isinstance(seg, svgpathtools.Line):
+            kind[i] = _LINE
+            ctrl[i, :2] = seg.start, seg.end
+        elif isinstance(seg, svgpathtools.QuadraticBezier):
+            kind[i] = _QUAD
+            ctrl[i, :3] = seg.start, seg.control, seg.end
+        elif isinstance(seg, svgpathtools.CubicBezier):
+            kind[i] = _CUBIC
+            ctrl[i] = seg.start, seg.control1, seg.control2, seg.end
+        elif isinstance(seg, svgpathtools.Arc):
+            kind[i] = _ARC
+            arc[i, :4] = seg.theta, seg.delta, seg.radius.real, seg.radius.imag
+            arc_c[i] = seg.center, seg.rot_matrix
+
+    # Segmentanzahl pro Segment
+    counts = np.full(n, 8, dtype=np.int64)
+    counts[kind == _LINE] = 1
+    m = kind == _QUAD
+    if m.any():
+        d2 = np.abs(ctrl[m, 0] - 2 * ctrl[m, 1] + ctrl[m, 2])
+        counts[m] = np.maximum(1, np.ceil(np.sqrt(0.25 * d2 / tolerance)))
+    m = kind == _CUBIC
+    if m.any():
+        d2 = np.maximum(np.abs(ctrl[m, 0] - 2 * ctrl[m, 1] + ctrl[m, 2]),
+                        np.abs(ctrl[m, 1] - 2 * ctrl[m, 2] + ctrl[m, 3]))
+        counts[m] = np.maximum(1, np.ceil(np.sqrt(0.75 * d2 / tolerance)))
+    m = kind == _ARC
+    if m.any():
+        r = np.maximum(np.abs(arc[m, 2]), np.abs(arc[m, 3]))
+        counts[m] = arc_segments(r, np.radians(arc[m, 1]), tolerance)
+
+    # t-Werte in [0, 1) je Segment (Endpunkt = Start des nächsten Segments)
+    seg_of = np.repeat(np.arange(n), counts)
+    first = np.repeat(np.cumsum(counts) - counts, counts)
+    t = (np.arange(seg_of.size) - first) / counts[seg_of]
+    k = kind[seg_of]
+    pts = np.empty(seg_of.size, dtype=np.complex128)
+
+    sel = k == _LINE
+    c = ctrl[seg_of[sel]]
+    pts[sel] = c[:, 0] + t[sel] * (c[:, 1] - c[:, 0])
+    sel = k == _QUAD
+    c, u = ctrl[seg_of[sel]], t[sel]
+    pts[sel] = (1 - u) ** 2 * c[:, 0] + 2 * (1 - u) * u * c[:, 1] + u ** 2 * c[:, 2]
+    sel = k == _CUBIC
+    c, u = ctrl[seg_of[sel]], t[sel]
+    pts[sel] = ((1 - u) ** 3 * c[:, 0] + 3 * (1 - u) ** 2 * u * c[:, 1]
+                + 3 * (1 - u) * u ** 2 * c[:, 2] + u ** 3 * c[:, 3])
+    sel = k == _ARC
+    a, ac = arc[seg_of[sel]], arc_c[seg_of[sel]]
+    ang = np.radians(a[:, 0] + t[sel] * a[:, 1])
+    pts[sel] = ac[:, 0] + ac[:, 1] * (a[:, 2] * np.cos(ang) + 1j * a[:, 3] * np.sin(ang))
+    for i in np.flatnonzero(k == _OTHER):
+        pts[i] = segs[seg_of[i]].point(t[i])
+
+    # Pro Pfad aufteilen, Endpunkt anhängen und schließen
+    per_path = np.bincount(np.repeat(np.arange(len(paths)), path_len),
+                           weights=counts, minlength=len(paths)).astype(np.int64)
+    out = []
+    for p, chunk in zip(paths, np.split(pts, np.cumsum(per_path)[:-1])):
+        if not len(p):
+            out.append(np.zeros((0, 2)))
+            continue
+        chunk = np.append(chunk, p[-1].end)
+        if abs(chunk[0] - chunk[-1]) > 1e-6:
+            chunk = np.append(chunk, chunk[0])
+        out.append(np.column_stack((chunk.real, chunk.imag)))
+    return out
+
+def path_to_polyline(path, tolerance=CHORD_TOLERANCE_MM):
+    return sample_paths([path], tolerance)[0]
+
+def _segment_counts(paths):
+    """Segmente je Typ (für die Aufzeichnung)"""
+    counts = {}
     for p in paths:
-        coords = path_to_polyline(p, spacing=1.0)
+        for seg in p:
+            name = type(seg).__name__
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+def svg_to_polygon(svg_file, target_width_mm=None, tolerance=CHORD_TOLERANCE_MM):
+    with stage("svg.load", file=str(svg_file)) as s:
+        merged = _svg_to_polygon(svg_file, target_width_mm, tolerance, s)
+        if s and merged is not None:
+            s["vertices"] = count_vertices(merged)
+        return merged
+
+def _svg_to_polygon(svg_file, target_width_mm, tolerance, span):
+    with stage("svg.parse"):
+        paths, _ = svgpathtools.svg2paths(svg_file)
+    paths = [p for p in paths if len(p)]
+    if span:
+        span["paths"] = len(paths)
+        span["primitives"] = _segment_counts(paths)
+    if target_width_mm is not None and paths:
+        # Toleranz (mm) in SVG-Einheiten umrechnen, Skalierung wie unten
+        boxes = np.array([p.bbox() for p in paths])
+        width = max(boxes[:, 1].max() - boxes[:, 0].min(), 1e-6)
+        tolerance = tolerance * width / float(target_width_mm)
+    polys = []
+    with stage("svg.sample"):
+        sampled = sample_paths(paths, tolerance)
+    for coords in sampled:
         if len(coords) < 3:
             continue
         poly = Polygon(coords)
@@ -34,7 +151,8 @@ def svg_to_polygon(svg_file, target_width_mm=None):
     if not polys:
         return None
 
-    merged = unary_union(polys)
+    with stage("union", parts=len(polys)):
+        merged = unary_union(polys)
 
     if target_width_mm is not None:
         minx, miny, maxx, maxy = merged.bounds
@@ -46,25 +164,33 @@ def svg_to_polygon(svg_file, target_width_mm=None):
     return merged
 
 def shapely_to_qpath(geom):
+    """
+    Geometrie -> QPainterPath. Die Ringe werden als Block aus den
+    Koordinaten-Arrays gelesen (QDataStream-Format von QPolygonF) und per
+    addPolygon eingefügt, statt jeden Punkt einzeln mit lineTo anzuhängen.
+    """
+    # Qt erst hier laden, damit svg_to_polygon auch headless nutzbar bleibt
+    from PySide6.QtCore import QByteArray, QDataStream
+    from PySide6.QtGui import QPainterPath, QPolygonF
     path = QPainterPath()
-    def add_poly(poly: Polygon):
-        exterior = poly.exterior
-        if exterior is None: return
-        coords = list(exterior.coords)
-        if not coords: return
-        path.moveTo(QPointF(coords[0][0], coords[0][1]))
-        for (x, y) in coords[1:]:
-            path.lineTo(QPointF(x, y))
+    if geom is None or geom.is_empty:
+        return path
+    parts = shapely.get_parts(geom)
+    parts = parts[shapely.get_type_id(parts) == shapely.GeometryType.POLYGON]
+    rings = shapely.get_rings(parts)
+    coords, idx = shapely.get_coordinates(rings, return_index=True)
+    counts = np.bincount(idx, minlength=len(rings))
+    # je Ring: Punktanzahl (uint32) + x/y als float64, big endian wie QDataStream
+    coords = coords.astype(">f8")
+    ends = np.cumsum(counts)
+    buf = b"".join(
+        np.array(n, ">u4").tobytes() + coords[e - n:e].tobytes()
+        for n, e in zip(counts, ends) if n
+    )
+    stream = QDataStream(QByteArray(buf))
+    for _ in range(np.count_nonzero(counts)):
+        poly = QPolygonF()
+        stream >> poly
+        path.addPolygon(poly)
         path.closeSubpath()
-        for interior in poly.interiors:
-            icoords = list(interior.coords)
-            if not icoords: continue
-            path.moveTo(QPointF(icoords[0][0], icoords[0][1]))
-            for (x, y) in icoords[1:]:
-                path.lineTo(QPointF(x, y))
-            path.closeSubpath()
-    if isinstance(geom, Polygon):
-        add_poly(geom)
-    elif isinstance(geom, MultiPolygon):
-        for g in geom.geoms: add_poly(g)
-    return path
\ No newline at end of file
+    return path
@@ -0,0 +1,41 @@
+import io
+
+import numpy as np
+import pytest
+
+from gui.excellon_parser import parse_excellon
+from gui.gerber_parser import GerberError
+
+HEADER = "M48\nMETRIC,LZ\nT1C1.000\n%\nT1\n"
+
+
+def excellon(body):
+    return io.BytesIO((HEADER + body + "M30\n").encode("ascii"))
+
+
+def chord_ends(layer):
+    return np.vstack([layer.slot_xy[:, :2], layer.slot_xy[-1:, 2:]])
+
+
+@pytest.mark.parametrize("arc", ["G03X0.0Y10.0I-10.0J0.0", "G03X0.0Y10.0A10.0"])
+def test_route_arc(arc):
+    layer = parse_excellon(excellon(f"G00X10.0Y0.0\nM15\n{arc}\nM16\n"))
+    pts = chord_ends(layer)
+    assert len(layer.slot_xy) > 1
+    assert np.hypot(pts[:, 0], pts[:, 1]) == pytest.approx(10.0)
+    # Viertelkreis gegen den Uhrzeigersinn durch den ersten Quadranten
+    assert (pts >= -1e-9).all()
+    assert pts[-1] == pytest.approx([0.0, 10.0])
+
+
+def test_route_arc_is_modal():
+    layer = parse_excellon(excellon("G00X10.0Y0.0\nM15\nG02X0.0Y-10.0A10.0\nX-10.0Y0.0A10.0\nM16\n"))
+    pts = chord_ends(layer)
+    assert pts[-1] == pytest.approx([-10.0, 0.0])
+    assert (pts[:, 1] <= 1e-9).all()
+    assert np.hypot(pts[:, 0], pts[:, 1]) == pytest.approx(10.0)
+
+
+def test_route_arc_without_centre():
+    with pytest.raises(GerberError):
+        parse_excellon(excellon("G00X10.0Y0.0\nM15\nG02X0.0Y10.0\nM16\n"))
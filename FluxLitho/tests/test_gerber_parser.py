@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+from gui.gerber_parser import GerberError, _expr, parse_gerber
+
+HEADER = "%FSLAX26Y26*%\n%MOMM*%\n"
+
+
+def gerber(body):
+    return io.BytesIO((HEADER + body).encode("ascii"))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1+2x3", 7.0),
+    ("-(2-5)/2", 1.5),
+    ("$1x2", 8.0),
+    ("--1", 1.0),
+    ("1.5X.5", 0.75),
+])
+def test_expr(text, expected):
+    assert _expr(text, {1: 4.0}) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text", [
+    "9xx9xx9", "(2)(3)", "e", "2**3", "1/0", "__import__('os')", "(1", "", "1e999",
+    "(" * 5000 + "1" + ")" * 5000,
+])
+def test_expr_rejects(text):
+    with pytest.raises(GerberError):
+        _expr(text, {})
+
+
+def test_hostile_macro():
+    # "x" ist in Gerber die Multiplikation; früher wurde daraus 9**9**9
+    data = gerber("%AMBOOM*1,1,9xx9xx9,0,0*%\n%ADD10BOOM*%\nD10*\nX0Y0D03*\nM02*\n")
+    with pytest.raises(GerberError):
+        parse_gerber(data)
+
+
+def test_optional_stop_keeps_parsing():
+    layer = parse_gerber(gerber("%ADD10C,0.1*%\nD10*\nX0Y0D03*\nM01*\nX1000000Y0D03*\nM02*\n"))
+    assert len(layer.flash_xy) == 2
+
+
+def test_image_transform():
+    parse_gerber(gerber("%OFA0B0*%\n%SFA1B1*%\nM02*\n"))
+    for cmd in ("%OFA1.5B0*%", "%SFA2B1*%"):
+        with pytest.raises(GerberError):
+            parse_gerber(gerber(cmd + "\nM02*\n"))
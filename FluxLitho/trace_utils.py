@@ -0,0 +1,216 @@
+"""
+Instrumentierung der Pipeline: verschachtelte Stufen-Timer, Zähler und
+strukturierte Ereignisse.
+
+Standardmäßig aus; dann kostet stage()/event() nur einen Funktionsaufruf und
+eine None-Abfrage. Einschalten per Umgebungsvariable (gilt auch für den
+Prozess-Pool) oder configure() (batch/benchmark: --trace):
+
+    FLUXLITHO_TRACE=1              -> logging, Logger "fluxlitho" (INFO)
+    FLUXLITHO_TRACE=trace.jsonl    -> eine JSON-Zeile pro Ereignis (anhängen)
+
+Stufen schachteln sich pro Thread, path enthält die ganze Kette:
+
+    with stage("gerber.layer", layer=name) as s:
+        geom = ...
+        if s:   # Zählungen nur berechnen, wenn aufgezeichnet wird
+            s["vertices"] = count_vertices(geom)
+
+-> {"event": "stage", "name": "gerber.layer", "path": "gui.gerber/gerber.layer",
+    "depth": 2, "ms": 12.3, "pid": ..., "layer": ..., "vertices": ...}
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+ENV_VAR = "FLUXLITHO_TRACE"
+
+logger = logging.getLogger("fluxlitho")
+
+_sink = None  # None = aus, sonst callable(event)
+_local = threading.local()
+
+
+class Span(dict):
+    """Zusatzfelder einer laufenden Stufe (immer wahr, auch wenn leer)"""
+
+    def __bool__(self):
+        return True
+
+
+class _NullSpan:
+    """Ersatz bei abgeschalteter Aufzeichnung: falsch, schluckt alles"""
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return _NULL_SPAN
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+_NULL_STAGE = _NullStage()
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class _Stage:
+    __slots__ = ("name", "span", "t0")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.span = Span(fields)
+
+    def __enter__(self):
+        _stack().append(self.name)
+        self.t0 = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self.t0) * 1000
+        stack = _stack()
+        path = "/".join(stack)
+        stack.pop()
+        ev = {"event": "stage", "name": self.name, "path": path, "depth": len(stack) + 1,
+              "ms": round(ms, 3)}
+        ev.update(self.span)
+        if exc_type is not None:
+            ev["error"] = exc_type.__name__
+        emit(ev)
+        return False
+
+
+def enabled():
+    return _sink is not None
+
+
+def stage(name, **fields):
+    """Kontextmanager für eine (verschachtelbare) Stufe -> Span bzw. falscher Ersatz"""
+    if _sink is None:
+        return _NULL_STAGE
+    return _Stage(name, fields)
+
+
+def event(name, **fields):
+    """Einzelnes Ereignis (z.B. Cache-Treffer) aufzeichnen"""
+    if _sink is None:
+        return
+    ev = {"event": name}
+    stack = getattr(_local, "stack", None)
+    if stack:
+        ev["path"] = "/".join(stack)
+    ev.update(fields)
+    emit(ev)
+
+
+def emit(ev):
+    sink = _sink
+    if sink is None:
+        return
+    ev.setdefault("pid", os.getpid())
+    ev.setdefault("t", round(time.time(), 6))
+    sink(ev)
+
+
+def _log_sink(ev):
+    fields = " ".join(f"{k}={v}" for k, v in ev.items()
+                      if k not in ("event", "name", "path", "pid", "t"))
+    logger.info("%s %s %s", ev["event"], ev.get("path") or ev.get("name", ""), fields,
+                extra={"fluxlitho": ev})
+
+
+class _JsonlSink:
+    """Eine Zeile pro Ereignis; Zeilen werden sofort geschrieben (Prozess-Pool hängt an)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def __call__(self, ev):
+        line = json.dumps(ev, ensure_ascii=False, default=str) + "\n"
+        with self.lock:
+            self.file.write(line)
+
+
+def configure(target=None):
+    """
+    Aufzeichnung einstellen: None/""/"0" aus, "1"/"log" über logging,
+    sonst Pfad einer JSONL-Datei. Wird in die Umgebung übernommen, damit
+    Worker-Prozesse dieselbe Einstellung bekommen.
+    """
+    global _sink
+    target = str(target or "").strip()
+    if target in ("", "0"):
+        _sink = None
+        os.environ.pop(ENV_VAR, None)
+        return
+    if target in ("1", "log"):
+        if not logger.handlers and not logging.getLogger().handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+            logger.addHandler(handler)
+        if logger.level == logging.NOTSET:
+            logger.setLevel(logging.INFO)
+        _sink = _log_sink
+    else:
+        _sink = _JsonlSink(os.path.abspath(target))
+        target = _sink.path
+    os.environ[ENV_VAR] = target
+
+
+class Failures:
+    """
+    Fehlgeschlagene Einzelschritte (z.B. Primitive) nach Art und Fehlertyp
+    zählen und am Ende in einer Zeile melden, statt pro Fehler zu drucken.
+    """
+
+    def __init__(self, what):
+        self.what = what
+        self.counts = Counter()
+        self.examples = {}
+
+    def add(self, kind, exc):
+        key = (kind, type(exc).__name__)
+        self.counts[key] += 1
+        self.examples.setdefault(key, str(exc))
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def report(self, context=""):
+        """Zusammenfassung ausgeben (nichts, wenn alles geklappt hat)"""
+        if not self.counts:
+            return
+        parts = ", ".join(f"{n}× {kind} {err}: {self.examples[(kind, err)]}"
+                          for (kind, err), n in self.counts.most_common())
+        prefix = f"{context}: " if context else ""
+        print(f"⚠ {prefix}{len(self)} {self.what} fehlgeschlagen ({parts})")
+        event("failures", what=self.what, context=context, total=len(self),
+              counts={f"{kind}/{err}": n for (kind, err), n in self.counts.items()})
+
+
+configure(os.environ.get(ENV_VAR))